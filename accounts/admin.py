@@ -1,10 +1,49 @@
 #accounts/admin.py
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
+from django.db import transaction
+from django.http import HttpResponseRedirect
+from django.urls import reverse
+from .closing import PeriodLocked, ensure_open
 from .models import CustomUser, Company, Account, Transaction
 
+class ClosedPeriodAdminMixin:
+    """
+    Shows PeriodLocked as an error message instead of a server error when
+    a delete (or a delete cascading to Transactions, as deleting a user or
+    an account does) would touch a closed period.
+    """
+    def delete_view(self, request, object_id, extra_context=None):
+        try:
+            return super().delete_view(request, object_id, extra_context)
+        except PeriodLocked as e:
+            self.message_user(request, ' '.join(e.messages), messages.ERROR)
+            opts = self.model._meta
+            return HttpResponseRedirect(reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist'))
+
+    def changelist_view(self, request, extra_context=None):
+        try:
+            # Bulk deletes run here; the savepoint keeps a refused one from
+            # breaking an outer transaction.
+            with transaction.atomic():
+                return super().changelist_view(request, extra_context)
+        except PeriodLocked as e:
+            self.message_user(request, ' '.join(e.messages), messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
+class TransactionAdminForm(forms.ModelForm):
+    class Meta:
+        model = Transaction
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        ensure_open(cleaned_data.get('date'), self.instance.date if self.instance.pk else None)
+        return cleaned_data
+
 @admin.register(CustomUser)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(ClosedPeriodAdminMixin, UserAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name', 'role', 'is_staff')
     list_filter = ('role', 'is_staff', 'is_superuser')
     fieldsets = UserAdmin.fieldsets + (
@@ -15,13 +54,14 @@ class CustomUserAdmin(UserAdmin):
     )
 
 @admin.register(Account)
-class AccountAdmin(admin.ModelAdmin):
+class AccountAdmin(ClosedPeriodAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'account_type', 'balance')
     list_filter = ('account_type',)
     search_fields = ('name',)
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(ClosedPeriodAdminMixin, admin.ModelAdmin):
+    form = TransactionAdminForm
     list_display = ('date', 'account', 'amount', 'transaction_type', 'description')
     list_filter = ('date', 'transaction_type', 'account')
     search_fields = ('description', 'account__name')
@@ -0,0 +1,108 @@
+"""
+Month-end period close.
+
+Closing a month stores every account's Transaction balance at the period
+end. A balance on any other date is then the nearest closing balance plus
+(or minus) the Transactions between the two dates, so historical reports
+read at most one month of rows however long the books have run. Once a
+month is closed, Transactions and journals dated on or before its end are
+locked.
+"""
+import calendar
+from datetime import date
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q, Sum
+from .ledger import ZERO, cents, month_start, on_normal_side
+from .models import Account, PeriodClose, PeriodCloseBalance, Transaction
+
+
+class PeriodLocked(ValidationError):
+    """Raised when a change would touch a closed period."""
+
+
+def month_end(value):
+    value = month_start(value)
+    return value.replace(day=calendar.monthrange(value.year, value.month)[1])
+
+
+def locked_through():
+    """The end of the latest closed period, or None if nothing is closed."""
+    return PeriodClose.objects.order_by('-period_end').values_list('period_end', flat=True).first()
+
+
+def ensure_open(*dates):
+    """Raises PeriodLocked if any of the dates (dates or ISO strings) falls in a closed period."""
+    dates = [date.fromisoformat(value) if isinstance(value, str) else value for value in dates if value]
+    closed_through = locked_through() if dates else None
+    if closed_through and min(dates) <= closed_through:
+        raise PeriodLocked(f"The books are closed through {closed_through:%d %b %Y}; entries on or before that date cannot be changed.")
+
+
+def _net_debits(transactions):
+    """{account_id: debits minus credits} over the transactions, in one grouped query."""
+    return {
+        row['account_id']: cents(row['debit_total']) - cents(row['credit_total'])
+        for row in transactions.values('account_id').annotate(
+            debit_total=Sum('amount', filter=Q(transaction_type='debit'), default=ZERO),
+            credit_total=Sum('amount', filter=Q(transaction_type='credit'), default=ZERO),
+        ).order_by()
+    }
+
+
+def balances_as_of(as_of):
+    """
+    Returns {account_id: net debit of every Transaction dated on or before
+    ``as_of``}, starting from the nearest period close on either side.
+    """
+    as_of = date.fromisoformat(as_of) if isinstance(as_of, str) else as_of
+    close = PeriodClose.objects.filter(period_end__lte=as_of).order_by('-period_end').first()
+    sign = 1
+    if close:
+        delta = Transaction.objects.filter(date__gt=close.period_end, date__lte=as_of)
+    else:
+        close = PeriodClose.objects.filter(period_end__gt=as_of).order_by('period_end').first()
+        if not close:
+            return _net_debits(Transaction.objects.filter(date__lte=as_of))
+        # Work back from the following close instead of scanning from the beginning.
+        delta, sign = Transaction.objects.filter(date__gt=as_of, date__lte=close.period_end), -1
+
+    balances = dict(close.balances.values_list('account_id', 'net_debit'))
+    for account_id, net_debit in _net_debits(delta).items():
+        balances[account_id] = balances.get(account_id, ZERO) + sign * net_debit
+    return balances
+
+
+def close_month(month, user=None):
+    """
+    Closes the month containing ``month`` and returns the PeriodClose. Only
+    a month that has ended and is later than the last closed one can be
+    closed.
+    """
+    period_end = month_end(month)
+    if period_end >= date.today():
+        raise ValidationError(f"{period_end:%B %Y} has not ended yet.")
+    closed_through = locked_through()
+    if closed_through and period_end <= closed_through:
+        raise ValidationError(f"The books are already closed through {closed_through:%d %b %Y}.")
+
+    with transaction.atomic():
+        balances = balances_as_of(period_end)
+        account_types = dict(Account.objects.values_list('pk', 'account_type'))
+        close = PeriodClose.objects.create(period_end=period_end, closed_by=user)
+        PeriodCloseBalance.objects.bulk_create([
+            PeriodCloseBalance(
+                period_close=close, account_id=account_id, net_debit=balances.get(account_id, ZERO),
+                balance=on_normal_side(account_type, balances.get(account_id, ZERO)),
+            )
+            for account_id, account_type in account_types.items()
+        ])
+    return close
+
+
+def reopen_latest():
+    """Deletes the latest period close, unlocking its month. Returns it, or None."""
+    close = PeriodClose.objects.order_by('-period_end').first()
+    if close:
+        close.delete()
+    return close
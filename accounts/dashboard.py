@@ -0,0 +1,159 @@
+"""
+Cached dashboard snapshot.
+
+Each dashboard tile is cached on its own under a key built from the
+versions of the data sources it reads. Signals bump a source's version
+when its rows change, so a page load only recomputes the tiles whose
+data actually changed and serves the rest from the cache.
+"""
+import json
+import time
+from collections import defaultdict, namedtuple
+from datetime import date, datetime, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+
+Tile = namedtuple('Tile', ['sources', 'per_audience', 'per_day', 'compute'])
+
+SOURCES = ('accounts', 'attendance', 'invoices', 'projects', 'transactions', 'workers')
+
+
+def _version_key(source):
+    return f'dashboard:version:{source}'
+
+
+def bump_dashboard_sources(*sources):
+    """
+    Invalidates every tile that reads from the given sources. The bump runs
+    after the surrounding transaction commits, so no request can cache the
+    pre-commit data under the new version.
+    """
+    def bump():
+        cache.set_many({_version_key(source): time.time_ns() for source in sources}, None)
+    transaction.on_commit(bump)
+
+
+def _audience(user):
+    """Identifies the slice of projects a user can see through filter_for_user."""
+    if user.role in ['admin', 'owner']:
+        return 'all'
+    if user.role == 'supervisor':
+        return f'supervisor-{user.pk}'
+    return user.role or 'none'
+
+
+def _birthdays(user, today):
+    from workers.models import Worker
+    return {'birthday_workers': list(Worker.objects.filter(
+        worker_type='own', is_active=True, dob__month=today.month, dob__day=today.day
+    ))}
+
+
+def _pending_invoices(user, today):
+    from .models import Invoice
+    total = Invoice.objects.with_payment_totals().unpaid().aggregate(total_due=Sum('outstanding'))['total_due'] or 0
+    return {'pending_invoices_total': total}
+
+
+def _payables(user, today):
+    from .models import Account
+    from workers.models import WorkerAttendance
+    total_credit_due = Account.objects.filter(account_type='liability').aggregate(total=Sum('balance'))['total'] or 0
+    unpaid_wages = WorkerAttendance.objects.filter(is_paid=False, worker__worker_type='outsourced').aggregate(total=Sum('total_wage'))['total'] or 0
+    return {'total_credit_due': total_credit_due + unpaid_wages}
+
+
+def _project_counts(user, today):
+    from projects.models import Project
+    counts = Project.objects.filter_for_user(user).aggregate(
+        active=Count('id', filter=Q(status='active')),
+        completed=Count('id', filter=Q(status='completed')),
+    )
+    return {'active_projects_count': counts['active'], 'completed_projects_count': counts['completed']}
+
+
+def _worker_counts(user, today):
+    from workers.models import Worker
+    counts = Worker.objects.filter(is_active=True).aggregate(
+        total_workers=Count('id'),
+        own_workers=Count('id', filter=Q(worker_type='own')),
+        outsourced_workers=Count('id', filter=Q(worker_type='outsourced'))
+    )
+    return counts
+
+
+def _recent_transactions(user, today):
+    from .models import Transaction
+    return {'recent_transactions': list(Transaction.objects.select_related('account').order_by('-date')[:5])}
+
+
+def _chart(user, today):
+    from .models import Transaction
+    six_months_ago = today - timedelta(days=180)
+    monthly_totals = Transaction.objects.filter(date__gte=six_months_ago).annotate(
+        month=TruncMonth('date')
+    ).values('month').annotate(
+        income=Sum('amount', filter=Q(transaction_type='credit'), default=0),
+        expenses=Sum('amount', filter=Q(transaction_type='debit'), default=0),
+    ).order_by('month')
+
+    chart_data = defaultdict(lambda: {'income': 0, 'expenses': 0})
+    for item in monthly_totals:
+        label = item['month'].strftime('%b %Y')
+        chart_data[label]['income'] = float(item['income'])
+        chart_data[label]['expenses'] = float(item['expenses'])
+    sorted_chart_data = sorted(chart_data.items(), key=lambda x: datetime.strptime(x[0], '%b %Y'))
+    return {
+        'chart_labels': json.dumps([item[0] for item in sorted_chart_data]),
+        'chart_income_values': json.dumps([item[1]['income'] for item in sorted_chart_data]),
+        'chart_expense_values': json.dumps([item[1]['expenses'] for item in sorted_chart_data]),
+    }
+
+
+TILES = {
+    'birthdays': Tile(('workers',), False, True, _birthdays),
+    'pending_invoices': Tile(('invoices',), False, False, _pending_invoices),
+    'payables': Tile(('accounts', 'attendance', 'workers'), False, False, _payables),
+    'project_counts': Tile(('projects',), True, False, _project_counts),
+    'worker_counts': Tile(('workers',), False, False, _worker_counts),
+    'recent_transactions': Tile(('transactions', 'accounts'), False, False, _recent_transactions),
+    'chart': Tile(('transactions',), False, True, _chart),
+}
+
+
+def get_dashboard_snapshot(user, today=None):
+    """
+    Returns the dashboard context, reading every tile whose sources are
+    unchanged from the cache and recomputing only the rest.
+    """
+    today = today or date.today()
+    versions = cache.get_many([_version_key(source) for source in SOURCES])
+    for source in SOURCES:
+        key = _version_key(source)
+        if key not in versions:
+            # A version the cache evicted gets a fresh one, so no tile cached under the old stamp can match.
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+
+    keys = {}
+    for name, tile in TILES.items():
+        parts = [name] + [str(versions[_version_key(source)]) for source in tile.sources]
+        if tile.per_audience:
+            parts.append(_audience(user))
+        if tile.per_day:
+            parts.append(today.isoformat())
+        keys[name] = 'dashboard:tile:' + ':'.join(parts)
+
+    cached = cache.get_many(keys.values())
+    context, fresh = {}, {}
+    for name, key in keys.items():
+        if key not in cached:
+            cached[key] = fresh[key] = TILES[name].compute(user, today)
+        context.update(cached[key])
+
+    if fresh:
+        cache.set_many(fresh, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 60 * 60))
+    return context
@@ -0,0 +1,354 @@
+"""
+Near-duplicate suppliers, workers and materials.
+
+Names are normalised (case, accents, punctuation and legal suffixes such
+as "LLC" dropped), then grouped into blocks that share either the first
+letters of the name or its Soundex code, so only names that could be
+duplicates are compared. Each block is scored in one vectorised RapidFuzz
+``cdist`` call, a few thousand rows at a time. Pairs whose numbers differ
+("Crane 25 Ton" and "Crane 50 Ton") are never duplicates.
+
+Typeahead on the create forms scores only the names that share a word
+prefix or Soundex code with what is typed. Each process keeps the names
+in memory until a save or delete bumps their version in the cache.
+
+Merging keeps one record, points every foreign key at the duplicates to
+it in one UPDATE per relation, fills its blank fields from the duplicates
+and deletes them.
+"""
+import re
+import time
+import unicodedata
+import numpy as np
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count
+from django.utils.module_loading import import_string
+from rapidfuzz import fuzz, process
+
+# Checked records: kind -> (model label, fields a duplicate must share, quantities added together on merge).
+DEDUPE_MODELS = {
+    'supplier': ('accounts.Supplier', (), ()),
+    'worker': ('workers.Worker', ('worker_type',), ()),
+    'material': ('accounts.Material', ('unit',), ('initial_quantity', 'quantity_on_hand')),
+}
+
+# Rows that describe the record itself rather than use it: model label ->
+# function (kept record, duplicate pks) returning why merging is unsafe for
+# them, or None. They are never repointed; once the function finds nothing,
+# the duplicates' rows can be told nothing the kept record's do not, and go
+# with the duplicates.
+OWNED_RELATIONS = {
+    'workers.WorkerRate': 'workers.rates.merge_conflict',
+}
+
+# Rows computed from the record's data: model label -> (field naming the
+# rows, function rebuilding them). A merge deletes the duplicates' rows and
+# calls the function with the kept record and the set of that field's
+# values across every merged record's rows.
+DERIVED_RELATIONS = {
+    'accounts.Payslip': ('month', 'accounts.payslips.regenerate_payslips'),
+}
+
+# Default similarity, out of 100, for two names to count as duplicates.
+THRESHOLD = 88
+
+# Rows of a block scored per cdist call, which bounds its score matrix.
+CHUNK_ROWS = 2000
+
+LEGAL_WORDS = {
+    'llc', 'wll', 'ltd', 'limited', 'inc', 'corp', 'co', 'company', 'est', 'establishment',
+    'fze', 'fzc', 'fzco', 'llp', 'plc', 'the', 'and',
+}
+
+_PUNCTUATION = re.compile(r'[^\w\s]|_')
+_NUMBERS = re.compile(r'\d+')
+_SOUNDEX = str.maketrans('bfpvcgjkqsxzdtlmnr', '111122222222334556')
+
+
+class MergeConflict(ValidationError):
+    """Raised when merging would break a uniqueness rule, e.g. two attendances on one day."""
+
+
+def normalize(name):
+    """Lower-case ASCII words of the name without punctuation or legal suffixes."""
+    name = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode().casefold()
+    words = _PUNCTUATION.sub(' ', name.replace('.', '')).split()
+    significant = [word for word in words if word not in LEGAL_WORDS]
+    return ' '.join(significant or words)
+
+
+def soundex(text):
+    """American Soundex of the letters in ``text``, e.g. 'R163' for 'robert'."""
+    letters = [char for char in text if 'a' <= char <= 'z']
+    if not letters:
+        return ''
+    codes = ''.join(letters).translate(_SOUNDEX)
+    result, previous = letters[0].upper(), codes[0]
+    for letter, code in zip(letters[1:], codes[1:]):
+        if code.isdigit() and code != previous:
+            result += code
+            if len(result) == 4:
+                break
+        if letter not in 'hw':
+            previous = code
+    return result.ljust(4, '0')
+
+
+def blocking_keys(normalized):
+    """The blocks a normalised name falls in: its first four letters and its Soundex code."""
+    squashed = normalized.replace(' ', '')
+    return [key for key in (f'p:{squashed[:4]}', f's:{soundex(squashed)}') if len(key) > 2]
+
+
+def _numbers(normalized):
+    return sorted(_NUMBERS.findall(normalized))
+
+
+def kind_model(kind):
+    if kind not in DEDUPE_MODELS:
+        raise ValueError(f"Unknown record kind '{kind}'. Choose from: {', '.join(DEDUPE_MODELS)}.")
+    return apps.get_model(DEDUPE_MODELS[kind][0])
+
+
+def _version_key(kind):
+    return f'dedupe:version:{kind}'
+
+
+# kind -> (version, names, word index), rebuilt when the shared version changes.
+_loaded = {}
+
+
+def _load(kind):
+    """
+    The names of the kind and their word index, kept in this process until
+    a save or delete anywhere bumps the kind's version in the shared cache.
+    Only the version is read per call; unpickling thousands of names from
+    the cache on every keystroke would cost more than scoring them.
+    """
+    version = cache.get(_version_key(kind))
+    if version is None:
+        version = time.time_ns()
+        cache.add(_version_key(kind), version, None)
+    loaded = _loaded.get(kind)
+    if loaded and loaded[0] == version:
+        return loaded[1], loaded[2]
+
+    _, shared, _ = DEDUPE_MODELS[kind]
+    rows = kind_model(kind).objects.order_by('pk').values_list('pk', 'name', *shared)
+    names_list = [(row[0], row[1], normalize(row[1]), tuple(row[2:])) for row in rows]
+    index = {}
+    for position, row in enumerate(names_list):
+        for key in _name_keys(row[2]):
+            index.setdefault(key, set()).add(position)
+    _loaded[kind] = (version, names_list, index)
+    return names_list, index
+
+
+def _word_keys(word):
+    return {f'p:{word[:3]}', f's:{soundex(word)}'}
+
+
+def _name_keys(normalized):
+    """
+    Index keys of a normalised name: each word's prefix and Soundex code,
+    plus the blocking_keys of the whole name with its spaces removed, so
+    'al noor' and 'alnoor trading' meet on 'p:alno'.
+    """
+    keys = set(blocking_keys(normalized))
+    for word in normalized.split():
+        keys |= _word_keys(word)
+    return keys
+
+
+def names(kind):
+    """[(pk, name, normalised name, shared field values)] for every record of the kind."""
+    return _load(kind)[0]
+
+
+def forget_names(kind):
+    transaction.on_commit(lambda: cache.set(_version_key(kind), time.time_ns(), None))
+
+
+def similar(kind, text, limit=5, exclude=None, score_cutoff=75):
+    """
+    [(pk, name, score)] of the existing records whose name is closest to
+    ``text``. Only names sharing an index key with it (see _name_keys) are
+    scored, so a keystroke does not score the whole table.
+    """
+    query = normalize(text)
+    if not query:
+        return []
+    rows, index = _load(kind)
+    positions = set().union(*(index.get(key, ()) for key in _name_keys(query)))
+    choices = {position: rows[position][2] for position in positions if rows[position][0] != exclude}
+    matches = process.extract(query, choices, scorer=fuzz.WRatio, limit=limit, score_cutoff=score_cutoff, processor=None)
+    return [(rows[position][0], rows[position][1], round(score)) for _, score, position in matches]
+
+
+def _scored_pairs(block, threshold):
+    """(i, j, score) for every pair i < j of the block's names scoring at least ``threshold``."""
+    choices = [row[2] for row in block]
+    for start in range(0, len(choices), CHUNK_ROWS):
+        scores = process.cdist(
+            choices[start:start + CHUNK_ROWS], choices, scorer=fuzz.token_sort_ratio,
+            score_cutoff=threshold, processor=None, dtype=np.uint8, workers=-1,
+        )
+        for i, j in zip(*np.nonzero(scores)):
+            i = int(i) + start
+            if i < j:
+                yield i, int(j), int(scores[i - start, j])
+
+
+def _find(parents, pk):
+    while parents[pk] != pk:
+        parents[pk] = parents[parents[pk]]
+        pk = parents[pk]
+    return pk
+
+
+def find_duplicates(kind, threshold=THRESHOLD):
+    """
+    Groups of likely duplicates, most similar first, as dicts with the
+    best pair ``score`` and the ``records`` [(pk, name)] in the group.
+    """
+    blocks = {}
+    for row in names(kind):
+        if row[2]:
+            for key in blocking_keys(row[2]):
+                blocks.setdefault((row[3], key), []).append(row)
+
+    best = {}
+    for block in blocks.values():
+        if len(block) < 2:
+            continue
+        for i, j, score in _scored_pairs(block, threshold):
+            first, second = block[i], block[j]
+            if _numbers(first[2]) != _numbers(second[2]):
+                continue
+            pair = (first[0], second[0]) if first[0] < second[0] else (second[0], first[0])
+            best[pair] = max(score, best.get(pair, 0))
+
+    # Chain the pairs into groups with a union-find over their pks.
+    parents = {pk: pk for pair in best for pk in pair}
+    for first, second in best:
+        parents[_find(parents, first)] = _find(parents, second)
+    groups = {}
+    for (first, second), score in best.items():
+        group = groups.setdefault(_find(parents, first), {'score': 0, 'pks': set()})
+        group['score'] = max(group['score'], score)
+        group['pks'].update((first, second))
+
+    labels = {row[0]: row[1] for row in names(kind)}
+    result = [
+        {'score': group['score'], 'records': [(pk, labels[pk]) for pk in sorted(group['pks'])]}
+        for group in groups.values()
+    ]
+    return sorted(result, key=lambda group: (-group['score'], group['records'][0][1]))
+
+
+def _relations(model, labels=None):
+    """
+    The many-to-one relations pointing at the model, as (related model,
+    field name): those from the models labelled ``labels``, or by default
+    all but OWNED_RELATIONS and DERIVED_RELATIONS.
+    """
+    return [
+        (rel.related_model, rel.field.name) for rel in model._meta.related_objects
+        if rel.one_to_many and (
+            rel.related_model._meta.label in labels if labels is not None
+            else rel.related_model._meta.label not in OWNED_RELATIONS.keys() | DERIVED_RELATIONS.keys()
+        )
+    ]
+
+
+def usage(kind, pks):
+    """{pk: number of rows referencing it}, used to suggest which record to keep."""
+    counts = dict.fromkeys(pks, 0)
+    for related, field in _relations(kind_model(kind)):
+        rows = related._base_manager.filter(**{f'{field}__in': pks}).values(field).annotate(n=Count('pk')).order_by()
+        for row in rows:
+            counts[row[field]] += row['n']
+    return counts
+
+
+def _unique_sets(model, field):
+    """Every uniqueness rule on the model that includes ``field``, as field-name tuples."""
+    sets = [tuple(fields) for fields in model._meta.unique_together]
+    sets += [constraint.fields for constraint in model._meta.total_unique_constraints]
+    return [fields for fields in sets if field in fields]
+
+
+def _check_conflicts(related, field, pks):
+    for fields in _unique_sets(related, field):
+        others = [name for name in fields if name != field]
+        clash = related._base_manager.filter(**{f'{field}__in': pks}).values(*others).annotate(
+            n=Count('pk'),
+        ).filter(n__gt=1).order_by(*others).first()
+        if clash:
+            detail = ', '.join(f'{name} {clash[name]}' for name in others)
+            raise MergeConflict(
+                f"Cannot merge: more than one of these records has a {related._meta.verbose_name} with {detail}. "
+                f"Remove the extra one first."
+            )
+
+
+@transaction.atomic
+def merge(kind, keep, duplicates):
+    """
+    Merges the ``duplicates`` (pks) into the record ``keep`` (a pk) and
+    deletes them, rebuilding the kept record's DERIVED_RELATIONS rows.
+    Returns {related model verbose name: rows repointed}.
+    """
+    model = kind_model(kind)
+    _, shared, summed = DEDUPE_MODELS[kind]
+    duplicate_pks = [pk for pk in duplicates if pk != keep]
+    survivor = model.objects.select_for_update().get(pk=keep)
+    merged = list(model.objects.select_for_update().filter(pk__in=duplicate_pks))
+    if not merged:
+        return {}
+    for record in merged:
+        mismatched = [field for field in shared if getattr(record, field) != getattr(survivor, field)]
+        if mismatched:
+            raise MergeConflict(f"'{record}' has a different {model._meta.get_field(mismatched[0]).verbose_name} and cannot be merged.")
+
+    pks = [survivor.pk] + [record.pk for record in merged]
+    for related, _ in _relations(model, OWNED_RELATIONS):
+        problem = import_string(OWNED_RELATIONS[related._meta.label])(survivor, duplicate_pks)
+        if problem:
+            raise MergeConflict(f"Cannot merge: {problem}")
+    relations = _relations(model)
+    for related, field in relations:
+        _check_conflicts(related, field, pks)
+
+    rebuilds = []
+    for related, field in _relations(model, DERIVED_RELATIONS):
+        value_field, rebuild = DERIVED_RELATIONS[related._meta.label]
+        rows = related._base_manager.filter(**{f'{field}__in': pks})
+        rebuilds.append((rebuild, set(rows.values_list(value_field, flat=True))))
+        rows.filter(**{f'{field}__in': duplicate_pks}).delete()
+
+    repointed = {}
+    for related, field in relations:
+        count = related._base_manager.filter(**{f'{field}__in': duplicate_pks}).update(**{field: survivor})
+        if count:
+            repointed[str(related._meta.verbose_name_plural)] = count
+
+    for field in model._meta.concrete_fields:
+        if field.primary_key or not field.editable or field.name in summed:
+            continue
+        if getattr(survivor, field.attname) in ('', None):
+            filled = next((getattr(record, field.attname) for record in merged if getattr(record, field.attname) not in ('', None)), None)
+            if filled is not None:
+                setattr(survivor, field.attname, filled)
+    for field in summed:
+        setattr(survivor, field, getattr(survivor, field) + sum(getattr(record, field) for record in merged))
+
+    model.objects.filter(pk__in=duplicate_pks).delete()
+    survivor.save()
+    for rebuild, values in rebuilds:
+        if values:
+            import_string(rebuild)(survivor, values)
+    return repointed
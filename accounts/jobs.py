@@ -0,0 +1,55 @@
+"""
+Status tracking for background jobs.
+
+``enqueue`` records a BackgroundJob and hands its Celery task to the
+broker once the current transaction commits; the task does its work
+inside ``track``, which moves the job from queued through running to
+succeeded or failed. Jobs run on a worker or, in eager mode, inline in the
+process that queued them; either way the job page reads the same rows.
+"""
+import logging
+from contextlib import contextmanager
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(task, description, *args, user=None, **kwargs):
+    """
+    Queues ``task`` with the new job's id followed by ``args``/``kwargs``,
+    which must be JSON-serialisable (pass dates as ISO strings, amounts as
+    strings and models by primary key).
+    """
+    job = BackgroundJob.objects.create(task=task.name, description=description, requested_by=user)
+    transaction.on_commit(lambda: task.delay(job.pk, *args, **kwargs))
+    return job
+
+
+def _error_message(exc):
+    if isinstance(exc, ValidationError):
+        return ' '.join(exc.messages)
+    return str(exc) or exc.__class__.__name__
+
+
+@contextmanager
+def track(job_id):
+    """
+    Marks the job running and yields it; the body may set ``result`` or
+    ``file``. The job is marked succeeded when the body returns, or failed
+    with the error message if it raises, and the exception is re-raised.
+    """
+    BackgroundJob.objects.filter(pk=job_id).update(status='running', started_at=timezone.now())
+    job = BackgroundJob.objects.get(pk=job_id)
+    try:
+        yield job
+    except Exception as exc:
+        logger.exception("Background job #%s (%s) failed", job_id, job.task)
+        BackgroundJob.objects.filter(pk=job_id).update(
+            status='failed', error=_error_message(exc), finished_at=timezone.now(),
+        )
+        raise
+    job.status, job.finished_at = 'succeeded', timezone.now()
+    job.save(update_fields=['status', 'finished_at', 'result', 'file'])
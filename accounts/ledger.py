@@ -0,0 +1,190 @@
+"""
+Trial balance and general ledger computed from Journal/JournalEntry.
+
+Every figure is a net debit (debits minus credits) until it is shown, when
+it is turned to the account's normal side. Opening balances start from the
+latest LedgerMonthBalance row before the date and only sum the journal
+lines after it, so their cost grows with months, not with entries.
+Running balances come from a window function over the same query that
+fetches the ledger lines.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import DecimalField, F, Q, Sum, Window
+from django.db.models.functions import RowNumber, TruncMonth
+from .models import Account, JournalEntry, LedgerMonthBalance
+
+ZERO = Decimal('0.00')
+
+
+def month_start(value):
+    """First day of the month containing ``value`` (a date or ISO string)."""
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.replace(day=1)
+
+
+def next_month(value):
+    value = month_start(value)
+    return value.replace(year=value.year + 1, month=1) if value.month == 12 else value.replace(month=value.month + 1)
+
+
+def cents(value):
+    # SQLite sums decimals as floats, so round aggregates back to cents.
+    return Decimal(value).quantize(ZERO)
+
+
+def on_normal_side(account_type, net_debit):
+    return net_debit if account_type in Account.DEBIT_NORMAL_TYPES else -net_debit
+
+
+def _net_debit_sum():
+    return Sum(F('debit') - F('credit'), output_field=DecimalField(max_digits=15, decimal_places=2), default=ZERO)
+
+
+def _previous_month(value):
+    value = month_start(value)
+    return value.replace(year=value.year - 1, month=12) if value.month == 1 else value.replace(month=value.month - 1)
+
+
+def _latest_snapshots(snapshots):
+    """(account_id, month, closing_net_debit) of each account's latest snapshot, in one query."""
+    return snapshots.annotate(
+        rank=Window(RowNumber(), partition_by=[F('account_id')], order_by=F('month').desc()),
+    ).filter(rank=1).values_list('account_id', 'month', 'closing_net_debit')
+
+
+def opening_balances(as_of, account_ids=None):
+    """
+    Returns {account_id: net debit of every journal line dated before
+    ``as_of``}. Accounts with no lines are omitted.
+    """
+    as_of = date.fromisoformat(as_of) if isinstance(as_of, str) else as_of
+    snapshots = LedgerMonthBalance.objects.filter(month__lt=month_start(as_of))
+    if account_ids is not None:
+        snapshots = snapshots.filter(account_id__in=account_ids)
+    latest = _latest_snapshots(snapshots)
+
+    balances, accounts_by_cutoff = {}, defaultdict(list)
+    for account_id, month, closing in latest:
+        balances[account_id] = closing
+        accounts_by_cutoff[next_month(month)].append(account_id)
+
+    # Lines after each account's snapshot; accounts without one are summed in full.
+    snapshotted = [account_id for ids in accounts_by_cutoff.values() for account_id in ids]
+    after_snapshot = ~Q(account_id__in=snapshotted)
+    for cutoff, ids in accounts_by_cutoff.items():
+        after_snapshot |= Q(account_id__in=ids, journal__date__gte=cutoff)
+    entries = JournalEntry.objects.filter(after_snapshot, journal__date__lt=as_of)
+    if account_ids is not None:
+        entries = entries.filter(account_id__in=account_ids)
+    for row in entries.values('account_id').annotate(net_debit=_net_debit_sum()).order_by():
+        balances[row['account_id']] = balances.get(row['account_id'], ZERO) + cents(row['net_debit'])
+    return balances
+
+
+def trial_balance(start, end):
+    """
+    One row per account with its opening balance at ``start``, its debits
+    and credits from ``start`` to ``end`` inclusive and its closing balance,
+    plus the column totals. Balances are split into debit and credit columns
+    so the totals must agree.
+    """
+    opening = opening_balances(start)
+    movement = {
+        row['account_id']: row
+        for row in JournalEntry.objects.filter(journal__date__range=(start, end)).values('account_id').annotate(
+            debit_total=Sum('debit', default=ZERO), credit_total=Sum('credit', default=ZERO),
+        ).order_by()
+    }
+    rows = []
+    totals = defaultdict(lambda: ZERO)
+    for account in Account.objects.filter(pk__in=set(opening) | set(movement)).order_by('account_type', 'name'):
+        period = movement.get(account.pk, {})
+        row = {
+            'account': account,
+            'opening': opening.get(account.pk, ZERO),
+            'debit': cents(period.get('debit_total', ZERO)),
+            'credit': cents(period.get('credit_total', ZERO)),
+        }
+        row['closing'] = row['opening'] + row['debit'] - row['credit']
+        row['closing_debit'] = max(row['closing'], ZERO)
+        row['closing_credit'] = max(-row['closing'], ZERO)
+        row['balance'] = on_normal_side(account.account_type, row['closing'])
+        for column in ('debit', 'credit', 'closing_debit', 'closing_credit'):
+            totals[column] += row[column]
+        rows.append(row)
+    return rows, dict(totals)
+
+
+def general_ledger(account, start, end):
+    """
+    Returns (opening, lines, closing) for one account over ``start`` to
+    ``end`` inclusive. Each line is a JournalEntry with ``running_balance``
+    on the account's normal side, computed by a window function in the
+    query that fetches the lines.
+    """
+    opening = opening_balances(start, [account.pk]).get(account.pk, ZERO)
+    lines = list(
+        JournalEntry.objects.filter(account=account, journal__date__range=(start, end)).select_related('journal', 'journal__project').annotate(
+            running_net_debit=Window(
+                Sum(F('debit') - F('credit'), output_field=DecimalField(max_digits=15, decimal_places=2)),
+                order_by=[F('journal__date').asc(), F('journal_id').asc(), F('pk').asc()],
+            ),
+        ).order_by('journal__date', 'journal_id', 'pk')
+    )
+    for line in lines:
+        line.running_balance = on_normal_side(account.account_type, opening + cents(line.running_net_debit))
+    closing = lines[-1].running_balance if lines else on_normal_side(account.account_type, opening)
+    return on_normal_side(account.account_type, opening), lines, closing
+
+
+def invalidate_month_balances(account_ids, since):
+    """Drops the snapshots a journal change dated ``since`` makes stale."""
+    LedgerMonthBalance.objects.filter(account_id__in=account_ids, month__gte=month_start(since)).delete()
+
+
+def build_month_balances(through=None):
+    """
+    Fills in LedgerMonthBalance rows for every month up to and including
+    ``through`` (default: last month) that is missing, continuing each
+    account from its latest snapshot. Returns the number of rows created.
+    """
+    last_month = month_start(through) if through else _previous_month(date.today())
+    latest, closing = {}, {}
+    for account_id, month, closing_net_debit in _latest_snapshots(LedgerMonthBalance.objects.all()):
+        latest[account_id], closing[account_id] = month, closing_net_debit
+
+    # Monthly movement after each account's snapshot, in one grouped query.
+    accounts_by_cutoff = defaultdict(list)
+    for account_id, month in latest.items():
+        accounts_by_cutoff[next_month(month)].append(account_id)
+    after_snapshot = ~Q(account_id__in=list(latest))
+    for cutoff, ids in accounts_by_cutoff.items():
+        after_snapshot |= Q(account_id__in=ids, journal__date__gte=cutoff)
+    movement = defaultdict(dict)
+    for row in JournalEntry.objects.filter(after_snapshot, journal__date__lt=next_month(last_month)).annotate(
+        month=TruncMonth('journal__date'),
+    ).values('account_id', 'month').annotate(
+        debit_total=Sum('debit', default=ZERO), credit_total=Sum('credit', default=ZERO),
+    ).order_by():
+        movement[row['account_id']][month_start(row['month'])] = row
+
+    snapshots = []
+    for account_id in set(latest) | set(movement):
+        months = movement.get(account_id, {})
+        month = next_month(latest[account_id]) if account_id in latest else min(months, default=None)
+        running = closing.get(account_id, ZERO)
+        while month is not None and month <= last_month:
+            row = months.get(month, {})
+            debit, credit = cents(row.get('debit_total', ZERO)), cents(row.get('credit_total', ZERO))
+            running += debit - credit
+            snapshots.append(LedgerMonthBalance(
+                account_id=account_id, month=month, debit_total=debit, credit_total=credit, closing_net_debit=running,
+            ))
+            month = next_month(month)
+    with transaction.atomic():
+        LedgerMonthBalance.objects.bulk_create(snapshots, batch_size=500)
+    return len(snapshots)
@@ -0,0 +1,17 @@
+from datetime import date
+from django.core.management.base import BaseCommand
+from accounts.ledger import build_month_balances
+from accounts.models import LedgerMonthBalance
+
+class Command(BaseCommand):
+    help = "Builds the missing monthly closing-balance snapshots the trial balance and general ledger start from."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--through', type=date.fromisoformat, help="Last month to snapshot (YYYY-MM-DD, any day of it). Defaults to last month.")
+        parser.add_argument('--rebuild', action='store_true', help="Delete every snapshot and rebuild from the first journal entry.")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            LedgerMonthBalance.objects.all().delete()
+        created = build_month_balances(options['through'])
+        self.stdout.write(self.style.SUCCESS(f"Created {created} monthly ledger snapshot(s)."))
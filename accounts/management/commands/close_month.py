@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from accounts.closing import close_month, locked_through, reopen_latest
+
+class Command(BaseCommand):
+    help = "Closes an accounting month: stores every account's month-end balance and locks entries dated on or before it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('month', nargs='?', type=date.fromisoformat, help="Any date in the month to close (YYYY-MM-DD). Defaults to last month.")
+        parser.add_argument('--reopen', action='store_true', help="Reopen the latest closed month instead of closing one.")
+
+    def handle(self, *args, **options):
+        if options['reopen']:
+            close = reopen_latest()
+            if not close:
+                raise CommandError("No closed period to reopen.")
+            self.stdout.write(self.style.SUCCESS(f"Reopened {close.period_end:%B %Y}. The books are now closed through {locked_through() or 'no date'}."))
+            return
+
+        month = options['month'] or date.today().replace(day=1) - timedelta(days=1)
+        try:
+            close = close_month(month)
+        except ValidationError as e:
+            raise CommandError(e.message)
+        self.stdout.write(self.style.SUCCESS(
+            f"Closed {close.period_end:%B %Y} with {close.balances.count()} account balance(s). Entries dated on or before {close.period_end} are now locked."
+        ))
@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from accounts.dedupe import DEDUPE_MODELS, THRESHOLD, find_duplicates
+
+class Command(BaseCommand):
+    help = "Lists suppliers, workers and materials with near-identical names. Merge them from the Possible Duplicates page."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', choices=list(DEDUPE_MODELS), help="Only check this kind of record (repeatable).")
+        parser.add_argument('--threshold', type=int, default=THRESHOLD, help=f"Similarity out of 100 that counts as a duplicate (default: {THRESHOLD}).")
+
+    def handle(self, *args, **options):
+        for kind in options['kind'] or DEDUPE_MODELS:
+            started = time.perf_counter()
+            groups = find_duplicates(kind, options['threshold'])
+            elapsed = time.perf_counter() - started
+            for group in groups:
+                names = ' | '.join(f"{name} (#{pk})" for pk, name in group['records'])
+                self.stdout.write(f"{kind} {group['score']:>3}%  {names}")
+            self.stdout.write(self.style.SUCCESS(f"{kind}: {len(groups)} group(s) of possible duplicates in {elapsed:.2f}s."))
@@ -0,0 +1,30 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import CustomUser
+from accounts.payslips import generate_payslips
+
+def month(value):
+    return date.fromisoformat(f'{value}-01')
+
+class Command(BaseCommand):
+    help = "Generates every own worker's payslip for a month, replacing any generated for it before."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', type=month, default=date.today().replace(day=1), help="Month to generate (YYYY-MM). Defaults to this month.")
+        parser.add_argument('--user', help="Username recorded as generating the payslips.")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = CustomUser.objects.filter(username=options['user']).first()
+            if not user:
+                raise CommandError(f"User '{options['user']}' does not exist.")
+
+        started = time.perf_counter()
+        payslips = generate_payslips(options['month'], user)
+        elapsed = time.perf_counter() - started
+        total = sum((payslip.net_pay for payslip in payslips), 0)
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(payslips)} payslip(s) for {options['month']:%B %Y} totalling Đ{total} in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum, Q
+from accounts.dashboard import bump_dashboard_sources
+from accounts.models import Account, Transaction
+
+class Command(BaseCommand):
+    help = "Verifies each account's running balance against a full aggregate of its transactions and reports any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--account', type=int, action='append', dest='account_ids', help="Only check this account id (repeatable).")
+        parser.add_argument('--fix', action='store_true', help="Overwrite drifted balances with the recalculated value.")
+
+    def handle(self, *args, **options):
+        accounts = Account.objects.order_by('name')
+        transactions = Transaction.objects.all()
+        if options['account_ids']:
+            accounts = accounts.filter(pk__in=options['account_ids'])
+            transactions = transactions.filter(account_id__in=options['account_ids'])
+
+        # One grouped query for every account instead of two aggregates per account.
+        net_debits = {
+            row['account_id']: row['debit_total'] - row['credit_total']
+            for row in transactions.values('account_id').annotate(
+                debit_total=Sum('amount', filter=Q(transaction_type='debit'), default=0),
+                credit_total=Sum('amount', filter=Q(transaction_type='credit'), default=0),
+            ).order_by()
+        }
+
+        drifted = []
+        for account in accounts:
+            net_debit = net_debits.get(account.pk, 0)
+            expected = net_debit if account.is_debit_normal else -net_debit
+            if account.balance != expected:
+                drifted.append((account, expected))
+                self.stdout.write(self.style.WARNING(
+                    f"{account.name} (#{account.pk}): stored {account.balance}, expected {expected}, drift {account.balance - expected}"
+                ))
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS(f"All {accounts.count()} account balances reconcile."))
+            return
+
+        if options['fix']:
+            with transaction.atomic():
+                for account, expected in drifted:
+                    Account.objects.filter(pk=account.pk).update(balance=expected)
+                bump_dashboard_sources('accounts')
+            self.stdout.write(self.style.SUCCESS(f"Corrected {len(drifted)} account balance(s)."))
+        else:
+            self.stdout.write(self.style.ERROR(f"{len(drifted)} account balance(s) drifted. Re-run with --fix to correct them."))
@@ -0,0 +1,81 @@
+import os
+from collections import Counter
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from accounts.models import StoredFile
+from accounts.storage import STORED_FILE_FIELDS, delete_if_unreferenced, split_name, stored_files
+
+class Command(BaseCommand):
+    help = (
+        "Verifies the reference counts of the content-addressed file store against the documents, quotation "
+        "files and receipts that use it, and optionally imports files saved under their plain names."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--import-legacy', action='store_true', help="Move files saved under plain names into the store, storing duplicates once, then fix the counts.")
+        parser.add_argument('--fix', action='store_true', help="Correct drifted reference counts and delete unreferenced blobs.")
+
+    def handle(self, *args, **options):
+        if options['import_legacy']:
+            self.import_legacy()
+
+        references = Counter()
+        for label, field in STORED_FILE_FIELDS.items():
+            for name in apps.get_model(label).objects.exclude(**{field: ''}).values_list(field, flat=True).iterator():
+                sha256, _ = split_name(name)
+                if sha256:
+                    references[sha256] += 1
+
+        stored = dict(StoredFile.objects.values_list('sha256', 'ref_count'))
+        drifted = {sha256: count for sha256, count in references.items() if stored.get(sha256) != count}
+        drifted.update({sha256: 0 for sha256, count in stored.items() if sha256 not in references and count})
+        orphaned = [sha256 for sha256 in stored if sha256 not in references]
+        for sha256, count in drifted.items():
+            self.stdout.write(self.style.WARNING(f"{sha256[:12]}: stored {stored.get(sha256, 'no row')}, expected {count} reference(s)"))
+        for sha256 in references:
+            if not stored_files.exists(f'{sha256}/blob'):
+                self.stdout.write(self.style.ERROR(f"{sha256[:12]}: referenced but missing from the store"))
+
+        if not drifted and not orphaned:
+            self.stdout.write(self.style.SUCCESS(f"All {len(stored)} stored file reference counts reconcile."))
+            return
+
+        if options['fix'] or options['import_legacy']:
+            with transaction.atomic():
+                for sha256, count in drifted.items():
+                    if not StoredFile.objects.filter(sha256=sha256).update(ref_count=count):
+                        StoredFile.objects.create(sha256=sha256, size=stored_files.size(f'{sha256}/blob'), ref_count=count)
+            deleted = sum(delete_if_unreferenced(sha256) for sha256 in orphaned)
+            self.stdout.write(self.style.SUCCESS(f"Corrected {len(drifted)} reference count(s) and deleted {deleted} unreferenced blob(s)."))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f"{len(drifted)} reference count(s) drifted and {len(orphaned)} blob(s) are unreferenced. Re-run with --fix to correct them."
+            ))
+
+    def import_legacy(self):
+        """Stores every plain-named file by content and points its rows at the stored name."""
+        legacy = FileSystemStorage()
+        moved, skipped, imported = set(), 0, {}
+        for label, field in STORED_FILE_FIELDS.items():
+            model = apps.get_model(label)
+            max_length = model._meta.get_field(field).max_length
+            rows = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).values_list('pk', field)
+            for pk, name in rows:
+                if split_name(name)[0]:
+                    continue
+                if name not in imported:
+                    if not legacy.exists(name):
+                        self.stdout.write(self.style.WARNING(f"{label} #{pk}: {name} is missing, left as it is"))
+                        skipped += 1
+                        continue
+                    with legacy.open(name) as f:
+                        imported[name] = stored_files.save(os.path.basename(name), File(f), max_length=max_length)
+                model.objects.filter(pk=pk).update(**{field: imported[name]})
+                moved.add(name)
+        for name in moved:
+            legacy.delete(name)
+        blobs = len({split_name(name)[0] for name in imported.values()})
+        self.stdout.write(self.style.SUCCESS(f"Imported {len(imported)} file(s) into {blobs} stored blob(s); {skipped} missing file(s) skipped."))
@@ -0,0 +1,58 @@
+from datetime import date
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import Account, CustomUser
+from accounts.closing import ensure_open
+from accounts.jobs import enqueue
+from accounts.payroll import payment_account, settle_all_groups, unpaid_wage_summary
+from accounts.tasks import settle_payroll
+
+class Command(BaseCommand):
+    help = "Settles every outsourced group's unpaid wages for a period in one database transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period-start', type=date.fromisoformat, help="First attendance date to settle (YYYY-MM-DD).")
+        parser.add_argument('--period-end', type=date.fromisoformat, help="Last attendance date to settle (YYYY-MM-DD).")
+        parser.add_argument('--payment-date', type=date.fromisoformat, default=date.today(), help="Date recorded on the payments. Defaults to today.")
+        parser.add_argument('--account', type=int, help="Id of the account to pay from. Defaults to the first asset account.")
+        parser.add_argument('--user', required=True, help="Username recorded as creating the payments.")
+        parser.add_argument('--dry-run', action='store_true', help="Only show what would be paid.")
+        parser.add_argument('--background', action='store_true', help="Queue the settlement as a background job instead of running it here.")
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(username=options['user'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+
+        account = Account.objects.filter(pk=options['account']).first() if options['account'] else payment_account()
+        if not account:
+            raise CommandError("No account found to pay from.")
+
+        period = {'period_start': options['period_start'], 'period_end': options['period_end']}
+        if options['dry_run']:
+            for row in unpaid_wage_summary(**period):
+                self.stdout.write(f"{row['worker__group__name']}: Đ{row['total']} over {row['days']} attendance record(s)")
+            return
+
+        try:
+            ensure_open(options['payment_date'])
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+
+        if options['background']:
+            iso_period = {key: value.isoformat() if value else None for key, value in period.items()}
+            job = enqueue(
+                settle_payroll, "Settle all outsourced groups", options['payment_date'].isoformat(), account.pk, user.pk,
+                user=user, **iso_period,
+            )
+            self.stdout.write(self.style.SUCCESS(f"Queued background job #{job.pk}."))
+            return
+
+        try:
+            runs = settle_all_groups(options['payment_date'], account, user, **period)
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+        for run in runs:
+            self.stdout.write(f"{run.group.name}: paid Đ{run.amount_paid}")
+        self.stdout.write(self.style.SUCCESS(f"Settled {len(runs)} group(s) from {account.name}."))
@@ -0,0 +1,104 @@
+"""
+Sending protected media files.
+
+Views decide who may download a file; ``send_file`` then hands the
+transfer to the front-end server when MEDIA_SENDFILE is set
+(X-Accel-Redirect for nginx, X-Sendfile for Apache), so a large PDF or
+photo does not hold an application worker for the length of the
+download. Without one the file is streamed by Django, honouring a single
+HTTP byte range so PDF viewers can fetch pages and downloads can resume.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+CHUNK_SIZE = 64 * 1024
+
+_BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def byte_range(header, size):
+    """
+    (first, last) byte positions of a single ``Range: bytes=`` header,
+    None when the header is absent or not one we serve partially (e.g.
+    several ranges), and ``(size, size)`` when it cannot be satisfied.
+    """
+    match = _BYTE_RANGE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start:
+        first, last = int(start), min(int(end), size - 1) if end else size - 1
+    else:
+        first, last = max(0, size - int(end)), size - 1
+    if first > last or first >= size:
+        return size, size
+    return first, last
+
+
+def _read(f, length):
+    with f:
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def ranged_file_response(request, path, content_type, filename, as_attachment=False, etag=None):
+    """
+    A FileResponse for the whole file, or a 206 Partial Content response
+    for a satisfiable Range request. ``If-Range`` must match ``etag`` for
+    the range to be honoured; without an ETag the whole file is sent.
+    """
+    size = os.path.getsize(path)
+    requested = byte_range(request.headers.get('Range'), size) if request.method in ('GET', 'HEAD') else None
+    if requested and 'If-Range' in request.headers and request.headers['If-Range'] != etag:
+        requested = None
+
+    if requested == (size, size):
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif requested:
+        first, last = requested
+        f = open(path, 'rb')
+        f.seek(first)
+        response = StreamingHttpResponse(_read(f, last - first + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {first}-{last}/{size}'
+        response['Content-Length'] = str(last - first + 1)
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type, as_attachment=as_attachment, filename=filename)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def send_file(request, storage, name, filename=None, as_attachment=False, etag=None):
+    """
+    Responds with the stored file ``name`` from a filesystem storage, sent
+    by the front-end server when MEDIA_SENDFILE is 'nginx' or 'apache'.
+    """
+    path = storage.path(name)
+    if not os.path.isfile(path):
+        raise Http404("File not found.")
+    filename = filename or os.path.basename(name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    backend = getattr(settings, 'MEDIA_SENDFILE', '')
+    if backend not in ('nginx', 'apache'):
+        return ranged_file_response(request, path, content_type, filename, as_attachment, etag)
+
+    response = HttpResponse(content_type=content_type)
+    if backend == 'nginx':
+        location = getattr(settings, 'MEDIA_ACCEL_REDIRECT_LOCATION', '/protected-media/')
+        relative = os.path.relpath(path, storage.location).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = location.rstrip('/') + '/' + quote(relative)
+    else:
+        response['X-Sendfile'] = path
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    return response
@@ -0,0 +1,53 @@
+import random
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from . import querystats
+
+# Requests that match no URL pattern are pooled under one name, so 404
+# scans cannot grow the per-view statistics without bound.
+UNRESOLVED_VIEW = '<unresolved>'
+
+
+class QueryStatsMiddleware:
+    """
+    Records query count, SQL time, duplicate queries and the slowest
+    statements for a sample of requests (QUERY_STATS_SAMPLE_RATE, from 0 to
+    1), feeds the per-view statistics on the query stats page and, for
+    admins and owners only, adds them to the response as a Server-Timing
+    header. Unsampled requests pay nothing but one random() call.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample_rate = getattr(settings, 'QUERY_STATS_SAMPLE_RATE', 0)
+        if not sample_rate or random.random() >= sample_rate:
+            return self.get_response(request)
+
+        recorder = querystats.QueryRecorder(getattr(settings, 'QUERY_STATS_SLOWEST', 5))
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match.view_name if match else None) or UNRESOLVED_VIEW
+        querystats.record(view_name, recorder, total)
+
+        # Query counts and timings describe the server, so other users do not see them.
+        from .views import is_admin_or_owner
+        user = getattr(request, 'user', None)
+        if not (user and is_admin_or_owner(user)):
+            return response
+
+        duplicates = sum(recorder.duplicates.values())
+        response['Server-Timing'] = ', '.join([
+            f'db;desc="{recorder.count} queries";dur={recorder.seconds * 1000:.1f}',
+            f'dup;desc="{duplicates} repeated queries"',
+            f'total;dur={total * 1000:.1f}',
+        ])
+        return response
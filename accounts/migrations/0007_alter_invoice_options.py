@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:52
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_supplier'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='invoice',
+            options={'ordering': ['-issue_date', '-pk']},
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_payrollrun_payrollline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerMonthBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month.')),
+                ('debit_total', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('credit_total', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('closing_net_debit', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='month_balances', to='accounts.account')),
+            ],
+            options={
+                'ordering': ['account', 'month'],
+                'unique_together': {('account', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_ledgermonthbalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodClose',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_end', models.DateField(help_text='Last day of the closed month.', unique=True)),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+                ('closed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-period_end'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PeriodCloseBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('net_debit', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, help_text="On the account's normal side.", max_digits=15)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='period_balances', to='accounts.account')),
+                ('period_close', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='accounts.periodclose')),
+            ],
+            options={
+                'unique_together': {('period_close', 'account')},
+            },
+        ),
+    ]
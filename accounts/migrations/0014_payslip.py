@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_storedfile'),
+        ('workers', '0003_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Payslip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month the payslip covers.')),
+                ('days_worked', models.PositiveSmallIntegerField(default=0)),
+                ('holidays_worked', models.PositiveSmallIntegerField(default=0)),
+                ('regular_hours', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('ot1_hours', models.DecimalField(decimal_places=2, default=0, max_digits=7, verbose_name='OT1 Hours')),
+                ('ot2_hours', models.DecimalField(decimal_places=2, default=0, max_digits=7, verbose_name='OT2 Hours')),
+                ('ot1_rate', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='OT1 Rate')),
+                ('ot2_rate', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='OT2 Rate')),
+                ('basic_salary', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('ot1_pay', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='OT1 Pay')),
+                ('ot2_pay', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='OT2 Pay')),
+                ('deductions', models.DecimalField(decimal_places=2, default=0, help_text='Basic salary not earned for regular hours short of a full month.', max_digits=12)),
+                ('net_pay', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('generated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('generated_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payslips', to='workers.worker')),
+            ],
+            options={
+                'ordering': ['-month', 'worker__name'],
+                'unique_together': {('worker', 'month')},
+            },
+        ),
+    ]
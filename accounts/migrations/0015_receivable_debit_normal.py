@@ -0,0 +1,24 @@
+from django.db import migrations
+from django.db.models import F
+
+
+def flip_receivable_balances(apps, schema_editor):
+    """
+    Receivables became debit-normal; their stored balances were kept on the
+    credit side, so negate them (and their period close balances) to match.
+    """
+    Account = apps.get_model('accounts', 'Account')
+    PeriodCloseBalance = apps.get_model('accounts', 'PeriodCloseBalance')
+    Account.objects.filter(account_type='receivable').update(balance=-F('balance'))
+    PeriodCloseBalance.objects.filter(account__account_type='receivable').update(balance=-F('balance'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_payslip'),
+    ]
+
+    operations = [
+        migrations.RunPython(flip_receivable_balances, flip_receivable_balances),
+    ]
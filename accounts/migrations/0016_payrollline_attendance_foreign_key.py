@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-17 01:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_receivable_debit_normal'),
+        ('workers', '0002_worker_dob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payrollline',
+            name='attendance',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payroll_lines', to='workers.workerattendance'),
+        ),
+    ]
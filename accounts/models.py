@@ -1,5 +1,7 @@
-from django.db import models
-from django.db.models import Sum
+from django.db import models, transaction
+from django.db.models import Sum, Q, F, Case, When, Value, DecimalField, ExpressionWrapper
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 from django.urls import reverse
 from django.core.exceptions import ValidationError
@@ -27,21 +29,119 @@ class GroupPayment(models.Model):
     def __str__(self):
         return f"Payment of Đ{self.amount} to {self.group.name} on {self.payment_date}"
 
+class PayrollRun(models.Model):
+    """
+    A settlement of an outsourced group's unpaid wages: the payment made,
+    the ledger Transaction it was recorded as, and (through its lines) the
+    attendance records the payment covered.
+    """
+    group = models.ForeignKey('workers.OutsourcedGroup', on_delete=models.CASCADE, related_name='payroll_runs')
+    period_start = models.DateField(null=True, blank=True)
+    period_end = models.DateField(null=True, blank=True)
+    payment_date = models.DateField()
+    amount_paid = models.DecimalField(max_digits=12, decimal_places=2)
+    amount_settled = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Portion of the payment that cleared whole attendance records.")
+    transaction = models.ForeignKey('Transaction', on_delete=models.SET_NULL, null=True, blank=True, related_name='payroll_runs')
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-payment_date', '-created_at']
+
+    def __str__(self):
+        return f"Payroll of Đ{self.amount_paid} to {self.group.name} on {self.payment_date}"
+
+class PayrollLine(models.Model):
+    """
+    One attendance record settled by a PayrollRun. A record marked unpaid
+    again and settled by a later run gets a line in each run.
+    """
+    run = models.ForeignKey(PayrollRun, on_delete=models.CASCADE, related_name='lines')
+    attendance = models.ForeignKey('workers.WorkerAttendance', on_delete=models.CASCADE, related_name='payroll_lines')
+    worker = models.ForeignKey('workers.Worker', on_delete=models.CASCADE)
+    date = models.DateField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.worker_id} on {self.date}: {self.amount}"
+
+class Payslip(models.Model):
+    """
+    An own worker's pay for one month, computed from that month's
+    attendance by accounts.payslips. Regenerating the month replaces it.
+    """
+    worker = models.ForeignKey('workers.Worker', on_delete=models.CASCADE, related_name='payslips')
+    month = models.DateField(help_text="First day of the month the payslip covers.")
+    days_worked = models.PositiveSmallIntegerField(default=0)
+    holidays_worked = models.PositiveSmallIntegerField(default=0)
+    regular_hours = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    ot1_hours = models.DecimalField(max_digits=7, decimal_places=2, default=0, verbose_name="OT1 Hours")
+    ot2_hours = models.DecimalField(max_digits=7, decimal_places=2, default=0, verbose_name="OT2 Hours")
+    ot1_rate = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="OT1 Rate")
+    ot2_rate = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="OT2 Rate")
+    basic_salary = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    ot1_pay = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="OT1 Pay")
+    ot2_pay = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="OT2 Pay")
+    deductions = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Basic salary not earned for regular hours short of a full month.")
+    net_pay = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    generated_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
+    generated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ['worker', 'month']
+        ordering = ['-month', 'worker__name']
+
+    def __str__(self):
+        return f"Payslip of Đ{self.net_pay} for {self.worker_id} for {self.month:%B %Y}"
+
 class Account(models.Model):
     ACCOUNT_TYPES = (('asset', 'Asset'), ('liability', 'Liability'), ('equity', 'Equity'), ('income', 'Income'), ('expense', 'Expense'), ('receivable', 'Accounts Receivable'))
+    # Account types whose balance grows with debits; every other type grows with credits.
+    DEBIT_NORMAL_TYPES = ('asset', 'receivable', 'expense')
+
     name = models.CharField(max_length=100)
     account_type = models.CharField(max_length=20, choices=ACCOUNT_TYPES)
     balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     def __str__(self): return self.name
 
+    @property
+    def is_debit_normal(self):
+        return self.account_type in self.DEBIT_NORMAL_TYPES
+
+    def calculate_balance(self):
+        """
+        Recalculates the balance from the full transaction history in a single
+        aggregate query. Used for reconciliation, not on the hot path.
+        """
+        totals = self.transaction_set.aggregate(
+            debit_total=Sum('amount', filter=Q(transaction_type='debit'), default=0),
+            credit_total=Sum('amount', filter=Q(transaction_type='credit'), default=0),
+        )
+        net_debit = totals['debit_total'] - totals['credit_total']
+        return net_debit if self.is_debit_normal else -net_debit
+
     def update_balance(self):
-        credit_total = self.transaction_set.filter(transaction_type='credit').aggregate(total=Sum('amount'))['total'] or 0
-        debit_total = self.transaction_set.filter(transaction_type='debit').aggregate(total=Sum('amount'))['total'] or 0
-        if self.account_type in ['asset', 'expense']:
-            self.balance = debit_total - credit_total
-        else:
-            self.balance = credit_total - debit_total
-        self.save()
+        """Overwrites the stored balance with a full recalculation."""
+        self.balance = self.calculate_balance()
+        self.save(update_fields=['balance'])
+
+    @classmethod
+    def apply_net_debit(cls, account_id, net_debit):
+        """
+        Shifts an account's running balance by a net debit amount (debits
+        positive, credits negative) with a single UPDATE, so the row stays
+        locked for the rest of the surrounding transaction and concurrent
+        payments cannot overwrite each other.
+        """
+        if not account_id or not net_debit:
+            return
+        cls.objects.filter(pk=account_id).update(
+            balance=F('balance') + Case(
+                When(account_type__in=cls.DEBIT_NORMAL_TYPES, then=Value(net_debit)),
+                default=Value(-net_debit),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
 
 class Transaction(models.Model):
     TRANSACTION_TYPES = (('debit', 'Debit'), ('credit', 'Credit'))
@@ -52,8 +152,35 @@ class Transaction(models.Model):
     description = models.TextField()
     project = models.ForeignKey('projects.Project', on_delete=models.SET_NULL, null=True, blank=True)
     created_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'transaction_type', 'amount'], name='transaction_date_type_idx'),
+            models.Index(fields=['account', 'date'], name='transaction_account_date_idx'),
+        ]
+
     def __str__(self): return f"{self.date} - {self.description}"
 
+    def save(self, *args, **kwargs):
+        # The balance signals (accounts.signals) lock the stored row, read it
+        # and shift the account balances; the row write and the balance shift
+        # must commit or roll back together.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+    @staticmethod
+    def signed_amount(transaction_type, amount):
+        """Returns the amount as a net debit: positive for debits, negative for credits."""
+        return amount if transaction_type == 'debit' else -amount
+
+    @property
+    def net_debit(self):
+        return self.signed_amount(self.transaction_type, self.amount)
+
 
 class Company(models.Model):
     name = models.CharField(max_length=100, default="uForce")
@@ -100,6 +227,29 @@ class Material(models.Model):
             return self.quantity_on_hand <= self.low_stock_threshold
         return False
     
+class InvoiceQuerySet(models.QuerySet):
+    def with_payment_totals(self):
+        """
+        Annotates each invoice with ``payments_total`` and ``outstanding`` in
+        SQL, so amount_received, balance_due and is_paid need no extra query.
+        """
+        money = DecimalField(max_digits=12, decimal_places=2)
+        return self.annotate(
+            payments_total=Coalesce(Sum('payments__amount'), Value(0), output_field=money),
+        ).annotate(
+            outstanding=ExpressionWrapper(F('total_amount') - F('payments_total'), output_field=money),
+        )
+
+    # The filters below expect a queryset already annotated by with_payment_totals().
+    def paid(self):
+        return self.filter(outstanding__lte=0)
+
+    def unpaid(self):
+        return self.filter(outstanding__gt=0)
+
+    def overdue(self, on_date=None):
+        return self.unpaid().filter(due_date__lt=on_date or timezone.localdate())
+
 class Invoice(models.Model):
     """
     Represents an invoice sent to a client for a project.
@@ -111,8 +261,10 @@ class Invoice(models.Model):
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Total Amount to be Received")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = InvoiceQuerySet.as_manager()
+
     class Meta:
-        ordering = ['-issue_date']
+        ordering = ['-issue_date', '-pk']
 
     def __str__(self):
         return f"Invoice for {self.project.name} - {self.title}"
@@ -122,12 +274,19 @@ class Invoice(models.Model):
 
     @property
     def amount_received(self):
-        """Calculates the total amount received from all related payments."""
+        """
+        Calculates the total amount received from all related payments,
+        using the with_payment_totals() annotation when it is present.
+        """
+        if hasattr(self, 'payments_total'):
+            return self.payments_total
         return self.payments.aggregate(total=Sum('amount'))['total'] or 0
 
     @property
     def balance_due(self):
         """Calculates the outstanding balance."""
+        if hasattr(self, 'outstanding'):
+            return self.outstanding
         return self.total_amount - self.amount_received
 
     @property
@@ -187,6 +346,57 @@ class JournalEntry(models.Model):
         if self.debit == 0 and self.credit == 0:
             raise ValidationError("An entry must have either a debit or a credit.")
         
+class LedgerMonthBalance(models.Model):
+    """
+    An account's journal movement for one month and its closing position
+    (cumulative debits minus credits) at the end of that month. Opening
+    balances for any date start from the latest of these rows instead of
+    summing every JournalEntry since the beginning. Rows from the month of
+    any journal change onward are deleted and later rebuilt, so a stored
+    row is always valid.
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='month_balances')
+    month = models.DateField(help_text="First day of the month.")
+    debit_total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    credit_total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    closing_net_debit = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ['account', 'month']
+        ordering = ['account', 'month']
+
+    def __str__(self):
+        return f"{self.account.name} {self.month:%b %Y}: {self.closing_net_debit}"
+
+class PeriodClose(models.Model):
+    """
+    A closed accounting month. Closing stores every account's balance at
+    the period end, and no Transaction or journal entry dated on or before
+    the latest period end can be added, edited or deleted.
+    """
+    period_end = models.DateField(unique=True, help_text="Last day of the closed month.")
+    closed_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
+    closed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-period_end']
+
+    def __str__(self):
+        return f"Period closed {self.period_end:%b %Y}"
+
+class PeriodCloseBalance(models.Model):
+    """An account's balance, from its Transactions, at the end of a closed period."""
+    period_close = models.ForeignKey(PeriodClose, on_delete=models.CASCADE, related_name='balances')
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='period_balances')
+    net_debit = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=15, decimal_places=2, default=0, help_text="On the account's normal side.")
+
+    class Meta:
+        unique_together = ['period_close', 'account']
+
+    def __str__(self):
+        return f"{self.account.name} at {self.period_close.period_end}: {self.balance}"
+
 class Supplier(models.Model):
     """
     A central table to store all suppliers, vendors, rental shops, etc.
@@ -209,4 +419,49 @@ class Supplier(models.Model):
         ordering = ['name']
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class BackgroundJob(models.Model):
+    """
+    A heavy operation (an export, a payroll settlement, a rebuild) handed to
+    the Celery task queue, and how it went. See accounts.jobs.
+    """
+    STATUS_CHOICES = (('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed'))
+
+    task = models.CharField(max_length=200)
+    description = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='background_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    result = models.CharField(max_length=255, blank=True, help_text="Summary of what the job did.")
+    error = models.TextField(blank=True)
+    file = models.FileField(upload_to='exports/', blank=True, help_text="Output of export jobs.")
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.description} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    @property
+    def duration(self):
+        if self.started_at and self.finished_at:
+            return self.finished_at - self.started_at
+        return None
+
+
+class StoredFile(models.Model):
+    """A blob in the content-addressed file store (accounts.storage) and how many file fields refer to it."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} reference(s))"
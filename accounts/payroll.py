@@ -0,0 +1,118 @@
+"""
+Payroll settlement for outsourced groups.
+
+Unpaid wages are summarised with grouped SQL, and a payment is allocated
+to a group's oldest attendance records with a running-total window
+function, so settling a group never walks its attendance in Python.
+The candidate rows are locked first, so two concurrent settlements cannot
+pay the same attendance twice.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, Window
+from workers.models import WorkerAttendance
+from .closing import ensure_open
+from .dashboard import bump_dashboard_sources
+from .models import Account, PayrollLine, PayrollRun, Transaction
+
+
+def unpaid_attendances(group=None, period_start=None, period_end=None):
+    """Unpaid outsourced attendance, optionally limited to a group and period."""
+    attendances = WorkerAttendance.objects.filter(is_paid=False, worker__worker_type='outsourced', worker__group__isnull=False)
+    if group is not None:
+        attendances = attendances.filter(worker__group=group)
+    if period_start:
+        attendances = attendances.filter(date__gte=period_start)
+    if period_end:
+        attendances = attendances.filter(date__lte=period_end)
+    return attendances
+
+
+def unpaid_wage_summary(group_by=('worker__group_id', 'worker__group__name'), **filters):
+    """
+    Totals unpaid wages in one grouped query. Group by group (the default),
+    by worker (e.g. ``('worker__group_id', 'worker_id', 'worker__name')``)
+    or by any other attendance field (e.g. ``('date',)``).
+    """
+    return unpaid_attendances(**filters).values(*group_by).annotate(
+        total=Sum('total_wage'), days=Count('id'),
+    ).order_by(*group_by)
+
+
+def allocate_payment(group, amount, period_start=None, period_end=None):
+    """
+    Returns the oldest unpaid attendance records the amount fully covers,
+    as (pk, worker_id, date, total_wage) tuples, selected in one query by
+    keeping the rows whose running total stays within the amount. The
+    group's unpaid rows are locked until the surrounding transaction ends;
+    they are locked by a query of their own because PostgreSQL does not
+    allow FOR UPDATE with a window function.
+    """
+    unpaid = unpaid_attendances(group, period_start, period_end)
+    locked = list(unpaid.select_for_update(of=('self',)).order_by('pk').values_list('pk', flat=True))
+    return list(
+        WorkerAttendance.objects.filter(pk__in=locked, is_paid=False).annotate(
+            running_total=Window(Sum('total_wage'), order_by=[F('date').asc(), F('pk').asc()]),
+        ).filter(running_total__lte=amount).order_by('date', 'pk').values_list('pk', 'worker_id', 'date', 'total_wage')
+    )
+
+
+def payment_account():
+    """The account wages are paid from: the first asset account, else the first income account."""
+    return Account.objects.filter(Q(account_type='asset') | Q(account_type='income')).order_by('account_type').first()
+
+
+def settle_group(group, amount, payment_date, account, user=None, period_start=None, period_end=None):
+    """
+    Records a payment to a group as a Transaction that decreases the paying
+    account, marks the oldest attendance records it fully covers as paid,
+    and returns the PayrollRun with one PayrollLine per settled record.
+    """
+    with transaction.atomic():
+        ledger_entry = Transaction.objects.create(
+            account=account,
+            # Credit an asset (or debit an income account) to DECREASE its balance.
+            transaction_type='credit' if account.account_type == 'asset' else 'debit',
+            amount=amount,
+            date=payment_date,
+            description=f"Payment to outsourced group: {group.name}",
+            created_by=user,
+        )
+        allocation = allocate_payment(group, amount, period_start, period_end)
+        run = PayrollRun.objects.create(
+            group=group,
+            period_start=period_start,
+            period_end=period_end,
+            payment_date=payment_date,
+            amount_paid=amount,
+            amount_settled=sum((wage for _, _, _, wage in allocation), 0),
+            transaction=ledger_entry,
+            created_by=user,
+        )
+        if allocation:
+            PayrollLine.objects.bulk_create([
+                PayrollLine(run=run, attendance_id=pk, worker_id=worker_id, date=day, amount=wage)
+                for pk, worker_id, day, wage in allocation
+            ])
+            paid = WorkerAttendance.objects.filter(pk__in=[pk for pk, _, _, _ in allocation], is_paid=False).update(is_paid=True)
+            if paid != len(allocation):
+                raise ValidationError(f"Some of {group.name}'s wages were paid by another payment meanwhile. Please try again.")
+            bump_dashboard_sources('attendance')
+    return run
+
+
+def settle_all_groups(payment_date, account, user=None, period_start=None, period_end=None):
+    """
+    Pays every group its full unpaid total for the period in one database
+    transaction and returns the PayrollRuns created. Raises PeriodLocked
+    before paying anyone if the payment date falls in a closed period.
+    """
+    from workers.models import OutsourcedGroup
+    ensure_open(payment_date)
+    totals = unpaid_wage_summary(group_by=('worker__group_id',), period_start=period_start, period_end=period_end)
+    groups = OutsourcedGroup.objects.in_bulk([row['worker__group_id'] for row in totals])
+    with transaction.atomic():
+        return [
+            settle_group(groups[row['worker__group_id']], row['total'], payment_date, account, user, period_start, period_end)
+            for row in totals if row['total'] > 0
+        ]
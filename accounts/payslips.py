@@ -0,0 +1,177 @@
+"""
+Monthly payslips for own workers.
+
+Own workers earn a monthly ``fixed_wage``. A month's payslips are computed
+for every own worker from one query over the month's attendance, whose
+worked minutes are split and totalled per worker exactly as workers.wages
+splits them, so each hour total and amount below is rounded only once:
+
+- the basic salary is the fixed wage in force at the end of the month
+  (see workers.rates), and so are the OT rates;
+- OT1 pay is overtime on normal days at the worker's OT1 rate, and OT2
+  pay is every hour worked on a holiday at the OT2 rate;
+- the deduction is the basic salary not earned for regular hours short of
+  WORK_DAYS_PER_MONTH standard days, at the hourly rate the attendance
+  wages use (fixed wage / work days / standard hours).
+
+There is one payslip per worker and month, so generating a month again
+updates its payslips in place and removes those no longer due.
+"""
+from calendar import monthrange
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from workers.models import Worker, WorkerAttendance
+from workers.rates import Rate, RateBook
+from workers.wages import MINUTES_PER_HOUR, WageRules, from_hundredths, minutes_of, round_div, split_minutes, to_cents
+from .models import Payslip
+
+# Everything generate_payslips writes, refreshed when a month is regenerated.
+COMPUTED_FIELDS = (
+    'days_worked', 'holidays_worked', 'regular_hours', 'ot1_hours', 'ot2_hours', 'ot1_rate', 'ot2_rate',
+    'basic_salary', 'ot1_pay', 'ot2_pay', 'deductions', 'net_pay', 'generated_by', 'generated_at',
+)
+
+
+def month_bounds(month):
+    """The first and last day of the month containing ``month``."""
+    start = month.replace(day=1)
+    return start, start.replace(day=monthrange(start.year, start.month)[1])
+
+
+def attendance_totals(start, end, rules=None, worker_ids=None):
+    """
+    {worker id: days, holidays and regular, OT1 and OT2 minutes} of own
+    workers' (or only ``worker_ids``') attendance between the dates. OT1 is
+    overtime on normal days; OT2 is every minute worked on a holiday.
+    """
+    rules = rules or WageRules.from_settings()
+    attendances = WorkerAttendance.objects.filter(worker__worker_type='own', date__range=(start, end))
+    if worker_ids is not None:
+        attendances = attendances.filter(worker_id__in=worker_ids)
+    rows = list(attendances.values_list('worker_id', 'in_time', 'out_time', 'is_holiday').order_by())
+    if not rows:
+        return {}
+    worker_ids, positions = np.unique(np.array([row[0] for row in rows], dtype=np.int64), return_inverse=True)
+    holiday = np.array([row[3] for row in rows], dtype=bool)
+    _, regular, overtime = split_minutes(
+        np.array([minutes_of(row[1]) for row in rows], dtype=np.int64),
+        np.array([minutes_of(row[2]) for row in rows], dtype=np.int64),
+        holiday, rules,
+    )
+
+    def per_worker(values):
+        totals = np.zeros(len(worker_ids), dtype=np.int64)
+        np.add.at(totals, positions, values)
+        return totals
+
+    columns = {
+        'days_worked': per_worker(~holiday), 'holidays_worked': per_worker(holiday),
+        'regular_minutes': per_worker(regular), 'ot1_minutes': per_worker(np.where(holiday, 0, overtime)),
+        'ot2_minutes': per_worker(np.where(holiday, overtime, 0)),
+    }
+    return {int(worker_id): {name: int(values[index]) for name, values in columns.items()} for index, worker_id in enumerate(worker_ids)}
+
+
+def _hours(minutes):
+    return from_hundredths(round_div(minutes * 100, MINUTES_PER_HOUR))
+
+
+def _pay(rate, minutes):
+    """An hourly ``rate`` for ``minutes``, to the cent."""
+    return from_hundredths(round_div(to_cents(rate) * minutes, MINUTES_PER_HOUR))
+
+
+def build_payslip(worker, month, totals=None, rules=None, rate=None):
+    """
+    An unsaved Payslip of ``worker`` for ``month`` from its attendance_totals
+    row, at ``rate`` (default the worker's current rates).
+    """
+    totals = totals or {}
+    rules = rules or WageRules.from_settings()
+    rate = rate or Rate.of(worker)
+    regular_minutes, ot1_minutes, ot2_minutes = (totals.get(name, 0) for name in ('regular_minutes', 'ot1_minutes', 'ot2_minutes'))
+
+    month_minutes = rules.work_days * rules.standard_minutes
+    shortfall = max(month_minutes - regular_minutes, 0)
+    basic_cents = to_cents(rate.fixed_wage)
+    deductions = from_hundredths(min(round_div(basic_cents * shortfall, month_minutes), basic_cents))
+
+    payslip = Payslip(
+        worker=worker,
+        month=month,
+        days_worked=totals.get('days_worked', 0),
+        holidays_worked=totals.get('holidays_worked', 0),
+        regular_hours=_hours(regular_minutes),
+        ot1_hours=_hours(ot1_minutes),
+        ot2_hours=_hours(ot2_minutes),
+        ot1_rate=rate.ot1_rate,
+        ot2_rate=rate.ot2_rate,
+        basic_salary=rate.fixed_wage,
+        ot1_pay=_pay(rate.ot1_rate, ot1_minutes),
+        ot2_pay=_pay(rate.ot2_rate, ot2_minutes),
+        deductions=deductions,
+    )
+    payslip.net_pay = payslip.basic_salary - payslip.deductions + payslip.ot1_pay + payslip.ot2_pay
+    return payslip
+
+
+def compute_payslips(month):
+    """
+    Unsaved payslips for ``month`` of every active own worker and every
+    inactive one who still has attendance in it.
+    """
+    start, end = month_bounds(month)
+    rules = WageRules.from_settings()
+    totals = attendance_totals(start, end, rules)
+    attended = WorkerAttendance.objects.filter(date__range=(start, end)).values('worker_id')
+    workers = Worker.objects.filter(worker_type='own').filter(Q(is_active=True) | Q(pk__in=attended)).only(
+        'name', 'fixed_wage', 'daily_wage', 'ot1_rate', 'ot2_rate',
+    ).order_by('name', 'pk')
+    rates = RateBook.for_workers(workers)
+    return [build_payslip(worker, start, totals.get(worker.pk), rules, rates.rate(worker.pk, end)) for worker in workers]
+
+
+@transaction.atomic
+def generate_payslips(month, user=None):
+    """
+    Computes and saves the payslips of the month containing ``month`` and
+    deletes any earlier payslip of that month that is no longer due.
+    Returns the payslips, ordered by worker name.
+    """
+    payslips = compute_payslips(month)
+    start, _ = month_bounds(month)
+    now = timezone.now()
+    for payslip in payslips:
+        payslip.generated_by, payslip.generated_at = user, now
+
+    Payslip.objects.filter(month=start).exclude(worker_id__in=[payslip.worker_id for payslip in payslips]).delete()
+    Payslip.objects.bulk_create(
+        payslips, batch_size=500,
+        update_conflicts=True, unique_fields=['worker', 'month'], update_fields=COMPUTED_FIELDS,
+    )
+    return payslips
+
+
+@transaction.atomic
+def regenerate_payslips(worker, months, user=None):
+    """
+    Recomputes and saves one worker's payslips for the months (first days)
+    given, e.g. after merging duplicate workers moved attendance onto them.
+    Returns the payslips, by month.
+    """
+    rules = WageRules.from_settings()
+    rates = RateBook.for_workers([worker])
+    now = timezone.now()
+    payslips = []
+    for month in sorted(months):
+        start, end = month_bounds(month)
+        totals = attendance_totals(start, end, rules, worker_ids=[worker.pk])
+        payslip = build_payslip(worker, start, totals.get(worker.pk), rules, rates.rate(worker.pk, end))
+        payslip.generated_by, payslip.generated_at = user, now
+        payslips.append(payslip)
+    Payslip.objects.bulk_create(
+        payslips, update_conflicts=True, unique_fields=['worker', 'month'], update_fields=COMPUTED_FIELDS,
+    )
+    return payslips
@@ -0,0 +1,263 @@
+"""
+PDF rendering of invoices, pay statements and reports.
+
+Templates under templates/pdf/ are rendered from plain data (dicts,
+lists, numbers and dates, never model instances) and converted with
+WeasyPrint, or with xhtml2pdf where WeasyPrint's Pango libraries are not
+installed. The print stylesheet and font configuration are loaded once
+per process, so a stylesheet change takes effect after a restart.
+
+A rendered PDF is cached under a SHA-256 of its data, its template
+sources (re-read whenever a template file's modification time changes)
+and the loaded stylesheet. Anything the document shows is in its data,
+so an unchanged invoice is served from the cache without rendering, and
+any edit or template change yields a new hash. The hash is also the
+response's ETag. PDFs are kept in their own cache (the ``pdf`` alias when
+configured), so a month of invoices cannot cull the dashboard's entries.
+``render_many`` renders the cache misses of a batch in a process pool.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from decimal import Decimal
+from io import BytesIO
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.cache import cache, caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.http import HttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils.cache import get_conditional_response
+
+logger = logging.getLogger(__name__)
+
+STYLESHEET = 'css/pdf.css'
+BASE_TEMPLATE = 'pdf/base.html'
+
+
+@lru_cache(maxsize=None)
+def _stylesheet_source():
+    with open(finders.find(STYLESHEET), encoding='utf-8') as f:
+        return f.read()
+
+
+@lru_cache(maxsize=None)
+def _engine():
+    """
+    (name, convert) for the first PDF library that loads. WeasyPrint
+    raises OSError on import when its native libraries are missing.
+    """
+    try:
+        from weasyprint import CSS, HTML
+        from weasyprint.text.fonts import FontConfiguration
+    except (ImportError, OSError) as e:
+        logger.info("WeasyPrint unavailable (%s); rendering PDFs with xhtml2pdf.", e)
+        from xhtml2pdf import pisa
+
+        def convert(html):
+            output = BytesIO()
+            result = pisa.CreatePDF(html, dest=output, default_css=_stylesheet_source(), encoding='utf-8')
+            if result.err:
+                raise ValueError(f"xhtml2pdf could not render the document ({result.err} error(s)).")
+            return output.getvalue()
+        return 'xhtml2pdf', convert
+
+    font_config = FontConfiguration()
+    stylesheet = CSS(string=_stylesheet_source(), font_config=font_config)
+
+    def convert(html):
+        return HTML(string=html, base_url=str(settings.BASE_DIR)).write_pdf(stylesheets=[stylesheet], font_config=font_config)
+    return 'weasyprint', convert
+
+
+def warm_up():
+    """Loads the PDF library, stylesheet and fonts; the process pool runs it once per worker."""
+    if not apps.ready:
+        django.setup()
+    _engine()
+
+
+def render_pdf(template_name, data):
+    """Renders ``templates/<template_name>`` with ``data`` to PDF bytes."""
+    return _engine()[1](render_to_string(template_name, data))
+
+
+@lru_cache(maxsize=64)
+def _sources_digest(files):
+    """SHA-256 of the (path, modification time) files' contents and the loaded stylesheet."""
+    sources = []
+    for path, _ in files:
+        with open(path, encoding='utf-8') as f:
+            sources.append(f.read())
+    return hashlib.sha256('\0'.join(sources + [_stylesheet_source()]).encode()).hexdigest()
+
+
+def _template_digest(template_name):
+    paths = [get_template(name).origin.name for name in (template_name, BASE_TEMPLATE)]
+    return _sources_digest(tuple((path, os.path.getmtime(path)) for path in paths))
+
+
+def fingerprint(template_name, data):
+    """SHA-256 of the data and the template, stylesheet and engine it is rendered with."""
+    payload = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    return hashlib.sha256(f'{_engine()[0]}\0{_template_digest(template_name)}\0{payload}'.encode()).hexdigest()
+
+
+def _pdf_cache():
+    return caches['pdf'] if 'pdf' in settings.CACHES else cache
+
+
+def _cache_key(digest):
+    return f'pdf:{digest}'
+
+
+def _timeout():
+    return getattr(settings, 'PDF_CACHE_TIMEOUT', 60 * 60 * 24 * 7)
+
+
+def _cached_or_rendered(template_name, data, digest):
+    pdf = _pdf_cache().get(_cache_key(digest))
+    if pdf is None:
+        pdf = render_pdf(template_name, data)
+        _pdf_cache().set(_cache_key(digest), pdf, _timeout())
+    return pdf
+
+
+def pdf_response(request, template_name, data, filename, as_attachment=False):
+    """
+    The document as an application/pdf response with its fingerprint as a
+    strong ETag, or a 304 if the browser already has this version.
+    """
+    digest = fingerprint(template_name, data)
+    etag = f'"{digest}"'
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+    response = HttpResponse(_cached_or_rendered(template_name, data, digest), content_type='application/pdf')
+    response['Content-Disposition'] = f'{"attachment" if as_attachment else "inline"}; filename="{filename}"'
+    response['ETag'] = etag
+    return response
+
+
+def _render_item(item):
+    template_name, data = item
+    return render_pdf(template_name, data)
+
+
+def render_many(documents, workers=None):
+    """
+    Yields (name, pdf bytes) for each (name, template name, data) in
+    ``documents``. Cached PDFs are reused; the rest are rendered in a pool
+    of ``workers`` processes (PDF_RENDER_WORKERS, default the CPU count)
+    and cached. Inside a daemonic process, such as a Celery prefork
+    worker, which may not start children, they are rendered one by one.
+    """
+    documents = list(documents)
+    digests = [fingerprint(template_name, data) for _, template_name, data in documents]
+    found = _pdf_cache().get_many([_cache_key(digest) for digest in digests])
+    missing = [index for index, digest in enumerate(digests) if _cache_key(digest) not in found]
+
+    rendered = {}
+    if missing:
+        items = [(documents[index][1], documents[index][2]) for index in missing]
+        workers = workers or getattr(settings, 'PDF_RENDER_WORKERS', None) or os.cpu_count() or 1
+        if workers > 1 and len(items) > 1 and not multiprocessing.current_process().daemon:
+            # Forked workers must not share the parent's database connections.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=min(workers, len(items)), initializer=warm_up) as pool:
+                results = list(pool.map(_render_item, items, chunksize=max(1, len(items) // (workers * 4))))
+        else:
+            results = [_render_item(item) for item in items]
+        rendered = dict(zip(missing, results))
+        _pdf_cache().set_many({_cache_key(digests[index]): pdf for index, pdf in rendered.items()}, _timeout())
+
+    for index, (name, _, _) in enumerate(documents):
+        yield name, rendered[index] if index in rendered else found[_cache_key(digests[index])]
+
+
+def company_data():
+    from .models import Company
+    company = Company.objects.first()
+    if not company:
+        return {'name': 'uForce', 'address': '', 'phone': '', 'email': ''}
+    return {'name': company.name, 'address': company.address, 'phone': company.phone, 'email': company.email}
+
+
+def invoice_document(invoice, company=None):
+    """(filename, template, data) of an invoice's PDF."""
+    payments = [
+        {'date': payment.payment_date, 'amount': payment.amount}
+        for payment in sorted(invoice.payments.all(), key=lambda payment: (payment.payment_date, payment.pk))
+    ]
+    received = sum((payment['amount'] for payment in payments), Decimal('0'))
+    data = {
+        'company': company or company_data(),
+        'invoice': {
+            'number': invoice.pk,
+            'title': invoice.title,
+            'project': invoice.project.name,
+            'client': invoice.project.client_company,
+            'issue_date': invoice.issue_date,
+            'due_date': invoice.due_date,
+            'total_amount': invoice.total_amount,
+        },
+        'payments': payments,
+        'amount_received': received,
+        'balance_due': invoice.total_amount - received,
+    }
+    return f'invoice-{invoice.pk}.pdf', 'pdf/invoice.html', data
+
+
+def payroll_run_document(run, company=None):
+    """(filename, template, data) of the pay statement for a PayrollRun."""
+    lines = [
+        {'date': line.date, 'worker': line.worker.name, 'project': line.attendance.project.name, 'amount': line.amount}
+        for line in run.lines.select_related('worker', 'attendance__project').order_by('date', 'worker__name', 'pk')
+    ]
+    data = {
+        'company': company or company_data(),
+        'run': {
+            'number': run.pk,
+            'group': run.group.name,
+            'leader': run.group.leader.name if run.group.leader else '',
+            'period_start': run.period_start,
+            'period_end': run.period_end,
+            'payment_date': run.payment_date,
+            'amount_paid': run.amount_paid,
+            'amount_settled': run.amount_settled,
+        },
+        'lines': lines,
+    }
+    return f'pay-statement-{run.pk}.pdf', 'pdf/payroll_run.html', data
+
+
+def payslip_document(payslip, company=None):
+    """(filename, template, data) of an own worker's monthly payslip."""
+    data = {
+        'company': company or company_data(),
+        'payslip': {
+            'number': payslip.pk,
+            'worker': payslip.worker.name,
+            'month': payslip.month,
+            'days_worked': payslip.days_worked,
+            'holidays_worked': payslip.holidays_worked,
+            'regular_hours': payslip.regular_hours,
+            'ot1_hours': payslip.ot1_hours,
+            'ot1_rate': payslip.ot1_rate,
+            'ot2_hours': payslip.ot2_hours,
+            'ot2_rate': payslip.ot2_rate,
+            'basic_salary': payslip.basic_salary,
+            'ot1_pay': payslip.ot1_pay,
+            'ot2_pay': payslip.ot2_pay,
+            'deductions': payslip.deductions,
+            'net_pay': payslip.net_pay,
+        },
+    }
+    return f'payslip-{payslip.month:%Y-%m}-{payslip.worker_id}.pdf', 'pdf/payslip.html', data
@@ -0,0 +1,121 @@
+"""
+Per-request query instrumentation.
+
+A sampled request runs with a ``connection.execute_wrapper`` that counts
+every query, adds up its time, fingerprints its SQL to spot repeats and
+keeps the slowest statements. The totals go into rolling in-process
+statistics per view name and, on admins' and owners' responses, into a
+``Server-Timing`` header; both are only shown to admins and owners. Each worker process keeps
+its own statistics; they reset on restart.
+"""
+import heapq
+import re
+import threading
+import time
+from collections import Counter, deque
+from django.conf import settings
+
+_SPACES = re.compile(r'\s+')
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def fingerprint(sql):
+    """SQL with literals and IN-list lengths normalised, so repeats of one query compare equal."""
+    sql = _LITERALS.sub('%s', _SPACES.sub(' ', sql).strip())
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class QueryRecorder:
+    """An execute_wrapper that records the queries of one request."""
+
+    def __init__(self, keep_slowest=5):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+        self.slowest = []
+        self.keep_slowest = keep_slowest
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            self.fingerprints[fingerprint(sql)] += 1
+            entry = (elapsed, self.count, sql)
+            if len(self.slowest) < self.keep_slowest:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+    @property
+    def duplicates(self):
+        """{fingerprint: times run} for every query run more than once."""
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+
+class ViewStats:
+    """Rolling statistics for one view: the last ``window`` requests, plus its worst duplicates and slowest SQL."""
+
+    def __init__(self, window, keep_slowest):
+        self.requests = deque(maxlen=window)
+        self.duplicates = Counter()
+        self.slowest = []
+        self.keep_slowest = keep_slowest
+
+    def add(self, recorder, total_seconds):
+        self.requests.append((recorder.count, recorder.seconds * 1000, total_seconds * 1000, sum(recorder.duplicates.values())))
+        self.duplicates.update(recorder.duplicates)
+        # Keep the counter bounded on views with many distinct queries.
+        if len(self.duplicates) > 50:
+            self.duplicates = Counter(dict(self.duplicates.most_common(20)))
+        for entry in recorder.slowest:
+            if len(self.slowest) < self.keep_slowest:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+    def summary(self, name):
+        counts = [count for count, _, _, _ in self.requests]
+        sql_ms = [ms for _, ms, _, _ in self.requests]
+        total_ms = sorted(ms for _, _, ms, _ in self.requests)
+        return {
+            'view': name,
+            'requests': len(self.requests),
+            'avg_queries': sum(counts) / len(counts),
+            'max_queries': max(counts),
+            'avg_sql_ms': sum(sql_ms) / len(sql_ms),
+            'avg_total_ms': sum(total_ms) / len(total_ms),
+            'p95_total_ms': total_ms[min(len(total_ms) - 1, int(len(total_ms) * 0.95))],
+            'avg_duplicates': sum(dups for _, _, _, dups in self.requests) / len(self.requests),
+            'top_duplicates': self.duplicates.most_common(3),
+            'slowest': [(elapsed * 1000, sql) for elapsed, _, sql in sorted(self.slowest, reverse=True)],
+        }
+
+
+_lock = threading.Lock()
+_stats = {}
+
+
+def record(view_name, recorder, total_seconds):
+    window = getattr(settings, 'QUERY_STATS_WINDOW', 200)
+    keep_slowest = getattr(settings, 'QUERY_STATS_SLOWEST', 5)
+    with _lock:
+        if view_name not in _stats:
+            _stats[view_name] = ViewStats(window, keep_slowest)
+        _stats[view_name].add(recorder, total_seconds)
+
+
+def summaries():
+    """One summary per recorded view, the most SQL time per request first."""
+    with _lock:
+        rows = [stats.summary(name) for name, stats in _stats.items() if stats.requests]
+    return sorted(rows, key=lambda row: row['avg_sql_ms'], reverse=True)
+
+
+def reset():
+    with _lock:
+        _stats.clear()
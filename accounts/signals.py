@@ -1,12 +1,194 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
-from .models import Transaction
+from .models import Account, Transaction, Invoice, InvoicePayment, Journal, JournalEntry
+from .ledger import invalidate_month_balances, month_start
+from .closing import ensure_open
+from .dashboard import bump_dashboard_sources
+from .storage import STORED_FILE_FIELDS, retain, release
+from .dedupe import DEDUPE_MODELS, forget_names
+from projects.models import Project
+from workers.models import Worker, WorkerAttendance
 
-@receiver([post_save, post_delete], sender=Transaction)
-def update_account_balance_on_transaction_change(sender, instance, **kwargs):
+@receiver(pre_save, sender=Transaction)
+def snapshot_transaction_before_save(sender, instance, raw=False, **kwargs):
     """
-    When a Transaction is saved or deleted, trigger the balance update
-    on its related Account.
+    Remembers the stored account, amount and type of an existing Transaction
+    so the post_save handler can reverse exactly what was applied before.
+    The row stays locked until Transaction.save()'s atomic block ends, so a
+    concurrent edit cannot change it between this read and the post_save.
     """
-    if instance.account:
-        instance.account.update_balance()
+    instance._balance_snapshot = None
+    if instance.pk and not raw:
+        instance._balance_snapshot = Transaction.objects.select_for_update().filter(pk=instance.pk).values(
+            'account_id', 'amount', 'transaction_type'
+        ).first()
+
+@receiver(post_save, sender=Transaction)
+def apply_transaction_to_account_balance(sender, instance, raw=False, **kwargs):
+    """
+    Applies the change in the Transaction's signed amount to the running
+    balance instead of re-aggregating the account's whole history. Edits,
+    debit/credit flips and moves to another account are handled by
+    reversing the pre-save snapshot first.
+    """
+    if raw:
+        return
+    deltas = {instance.account_id: instance.net_debit}
+    previous = getattr(instance, '_balance_snapshot', None)
+    if previous:
+        previous_net_debit = Transaction.signed_amount(previous['transaction_type'], previous['amount'])
+        deltas[previous['account_id']] = deltas.get(previous['account_id'], 0) - previous_net_debit
+    for account_id, net_debit in deltas.items():
+        Account.apply_net_debit(account_id, net_debit)
+    instance._balance_snapshot = None
+
+@receiver(post_delete, sender=Transaction)
+def reverse_transaction_on_delete(sender, instance, **kwargs):
+    """
+    Removes a deleted Transaction's signed amount from its account's balance.
+    """
+    Account.apply_net_debit(instance.account_id, -instance.net_debit)
+
+@receiver(pre_save, sender=Account)
+def flip_balance_on_account_type_change(sender, instance, raw=False, **kwargs):
+    """
+    Balances are stored on the account's normal side, so moving an account
+    between a debit-normal and a credit-normal type negates its balance,
+    unless the balance itself was edited in the same save.
+    """
+    if not instance.pk or raw:
+        return
+    stored = Account.objects.filter(pk=instance.pk).values('account_type', 'balance').first()
+    if not stored or stored['balance'] != instance.balance:
+        return
+    was_debit_normal = stored['account_type'] in Account.DEBIT_NORMAL_TYPES
+    if was_debit_normal != instance.is_debit_normal:
+        instance.balance = -instance.balance
+
+@receiver(pre_save, sender=JournalEntry)
+def snapshot_journal_entry_before_save(sender, instance, raw=False, **kwargs):
+    """
+    Remembers the stored account and journal of an existing line, so moving
+    it also invalidates the ledger snapshots it was counted in before.
+    """
+    instance._ledger_snapshot = None
+    if instance.pk and not raw:
+        instance._ledger_snapshot = JournalEntry.objects.filter(pk=instance.pk).values(
+            'account_id', 'journal__date'
+        ).first()
+
+@receiver(post_save, sender=JournalEntry)
+@receiver(post_delete, sender=JournalEntry)
+def invalidate_ledger_on_entry_change(sender, instance, raw=False, **kwargs):
+    """
+    Drops the monthly ledger snapshots from the line's month onward for
+    every account it touched; build_month_balances recreates them.
+    """
+    if raw:
+        return
+    journal_date = Journal.objects.filter(pk=instance.journal_id).values_list('date', flat=True).first()
+    if journal_date:
+        invalidate_month_balances([instance.account_id], journal_date)
+    previous = getattr(instance, '_ledger_snapshot', None)
+    if previous:
+        invalidate_month_balances([previous['account_id']], previous['journal__date'])
+    instance._ledger_snapshot = None
+
+@receiver(pre_save, sender=Journal)
+def invalidate_ledger_on_journal_date_change(sender, instance, raw=False, **kwargs):
+    """
+    Re-dating a journal moves all of its lines, so the snapshots of their
+    accounts are dropped from the earlier of the two dates onward.
+    """
+    if not instance.pk or raw:
+        return
+    stored_date = Journal.objects.filter(pk=instance.pk).values_list('date', flat=True).first()
+    if stored_date and str(stored_date) != str(instance.date):
+        account_ids = list(JournalEntry.objects.filter(journal_id=instance.pk).values_list('account_id', flat=True).distinct())
+        invalidate_month_balances(account_ids, min(stored_date, month_start(instance.date)))
+
+@receiver(pre_save, sender=Transaction, dispatch_uid='period_lock_transaction_save')
+@receiver(pre_save, sender=Journal, dispatch_uid='period_lock_journal_save')
+def lock_closed_period_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Refuses to add a Transaction or journal in a closed period, or to move
+    an existing one into or out of it.
+    """
+    if raw:
+        return
+    stored_date = sender.objects.filter(pk=instance.pk).values_list('date', flat=True).first() if instance.pk else None
+    ensure_open(instance.date, stored_date)
+
+@receiver(pre_delete, sender=Transaction, dispatch_uid='period_lock_transaction_delete')
+@receiver(pre_delete, sender=Journal, dispatch_uid='period_lock_journal_delete')
+def lock_closed_period_on_delete(sender, instance, **kwargs):
+    ensure_open(instance.date)
+
+@receiver(pre_save, sender=JournalEntry, dispatch_uid='period_lock_entry_save')
+@receiver(pre_delete, sender=JournalEntry, dispatch_uid='period_lock_entry_delete')
+def lock_closed_period_for_entry(sender, instance, raw=False, **kwargs):
+    """Journal lines take their date from the journal, old and new."""
+    if raw:
+        return
+    journal_ids = {instance.journal_id}
+    if instance.pk:
+        journal_ids.add(JournalEntry.objects.filter(pk=instance.pk).values_list('journal_id', flat=True).first())
+    ensure_open(*Journal.objects.filter(pk__in=journal_ids).values_list('date', flat=True))
+
+# Dashboard tile sources invalidated by each model's saves and deletes
+DASHBOARD_SOURCES = {
+    Account: ('accounts',),
+    Transaction: ('transactions', 'accounts'),
+    Invoice: ('invoices',),
+    InvoicePayment: ('invoices',),
+    WorkerAttendance: ('attendance',),
+    Worker: ('workers',),
+    Project: ('projects',),
+}
+
+def invalidate_dashboard_on_change(sender, **kwargs):
+    """
+    Bumps the dashboard sources a model feeds, so the next dashboard load
+    recomputes only the tiles built from them.
+    """
+    bump_dashboard_sources(*DASHBOARD_SOURCES[sender])
+
+for model in DASHBOARD_SOURCES:
+    post_save.connect(invalidate_dashboard_on_change, sender=model, dispatch_uid=f'dashboard_{model.__name__}_save')
+    post_delete.connect(invalidate_dashboard_on_change, sender=model, dispatch_uid=f'dashboard_{model.__name__}_delete')
+
+def snapshot_stored_file(sender, instance, raw=False, **kwargs):
+    """Remembers the stored name of the file field, so a replaced file's reference can be released."""
+    instance._stored_file_snapshot = None
+    if instance.pk and not raw:
+        field = STORED_FILE_FIELDS[sender._meta.label]
+        instance._stored_file_snapshot = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+def count_stored_file_reference(sender, instance, raw=False, **kwargs):
+    """Counts a reference to the new file and releases the one it replaced."""
+    if raw:
+        return
+    new_file = getattr(instance, STORED_FILE_FIELDS[sender._meta.label])
+    new_name = new_file.name or ''
+    old_name = getattr(instance, '_stored_file_snapshot', None) or ''
+    if new_name != old_name:
+        retain(new_name, new_file)
+        release(old_name)
+
+def release_stored_file_reference(sender, instance, **kwargs):
+    release(getattr(instance, STORED_FILE_FIELDS[sender._meta.label]).name)
+
+for label in STORED_FILE_FIELDS:
+    pre_save.connect(snapshot_stored_file, sender=label, dispatch_uid=f'stored_file_{label}_snapshot')
+    post_save.connect(count_stored_file_reference, sender=label, dispatch_uid=f'stored_file_{label}_save')
+    post_delete.connect(release_stored_file_reference, sender=label, dispatch_uid=f'stored_file_{label}_delete')
+
+def forget_dedupe_names(sender, **kwargs):
+    """Bumps the version of the names duplicate checks compare against, so the next check reloads them."""
+    for kind, (label, _, _) in DEDUPE_MODELS.items():
+        if label == sender._meta.label:
+            forget_names(kind)
+
+for kind, (label, _, _) in DEDUPE_MODELS.items():
+    post_save.connect(forget_dedupe_names, sender=label, dispatch_uid=f'dedupe_{kind}_save')
+    post_delete.connect(forget_dedupe_names, sender=label, dispatch_uid=f'dedupe_{kind}_delete')
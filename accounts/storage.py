@@ -0,0 +1,179 @@
+"""
+Content-addressed storage for project documents, quotation files and
+expense receipts.
+
+An upload is hashed with SHA-256 while it is streamed to a temporary file
+and then kept once, under ``blobs/<aa>/<bb>/<sha256>``, however many
+times and under whatever names it is uploaded. The name saved on the
+model is ``<sha256>/<original file name>``, so links and downloads keep
+the name the user uploaded. A StoredFile row per blob counts the model
+fields that refer to it (kept up to date by accounts.signals), and the
+blob is deleted when the last of them goes. Files are served by
+``stored_file_view`` with the hash as a strong ETag: the bytes behind a
+URL never change, so browsers cache them and revalidate with a 304.
+
+Names saved before this storage was introduced (e.g.
+``project_documents/a.pdf``) are still read from MEDIA_ROOT until
+``reconcile_stored_files --import-legacy`` moves them into the store.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils.deconstruct import deconstructible
+
+# Model file fields kept in the store, by model label.
+STORED_FILE_FIELDS = {
+    'projects.ProjectDocument': 'file',
+    'projects.ProjectExpense': 'receipt',
+    'quotations.QuotationFile': 'file',
+}
+
+HASHED_NAME = re.compile(r'^(?P<sha256>[0-9a-f]{64})/(?P<filename>[^/]+)$')
+BLOB_DIR = 'blobs'
+
+
+def split_name(name):
+    """(sha256, file name) of a stored name, or (None, None) for a legacy name."""
+    match = HASHED_NAME.match(name or '')
+    return (match['sha256'], match['filename']) if match else (None, None)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def blob_name(self, sha256):
+        return f'{BLOB_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+    def path(self, name):
+        sha256, _ = split_name(name)
+        return super().path(self.blob_name(sha256) if sha256 else name)
+
+    def url(self, name):
+        sha256, filename = split_name(name)
+        if sha256:
+            return reverse('stored_file', args=[sha256, filename])
+        return super().url(name)
+
+    def get_available_name(self, name, max_length=None):
+        """
+        Only the file name is kept, as names never clash; it is shortened
+        so that ``<sha256>/<file name>`` fits within max_length.
+        """
+        filename = os.path.basename(name)
+        if max_length and len(filename) > max_length - 65:
+            root, ext = os.path.splitext(filename)
+            filename = root[:max(1, max_length - 65 - len(ext))] + ext
+        return filename
+
+    def _save(self, name, content):
+        from .models import StoredFile
+        temp_dir = super().path(f'{BLOB_DIR}/tmp')
+        os.makedirs(temp_dir, exist_ok=True)
+        digest, size = hashlib.sha256(), 0
+        with tempfile.NamedTemporaryFile(dir=temp_dir, delete=False) as temp:
+            for chunk in content.chunks():
+                digest.update(chunk)
+                temp.write(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+
+        # The row lock keeps delete_if_unreferenced from removing the blob
+        # between the existence check and the row being found or created.
+        with transaction.atomic():
+            StoredFile.objects.select_for_update().get_or_create(sha256=sha256, defaults={'size': size})
+            self._keep_blob(sha256, temp.name)
+        return f'{sha256}/{name}'
+
+    def _keep_blob(self, sha256, temp_path):
+        """Moves a temporary file into place as the blob, or drops it if the blob already exists."""
+        blob_path = super().path(self.blob_name(sha256))
+        if os.path.exists(blob_path):
+            os.unlink(temp_path)
+            return
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(temp_path, blob_path)
+        if self.file_permissions_mode is not None:
+            os.chmod(blob_path, self.file_permissions_mode)
+
+    def restore_blob(self, sha256, content):
+        """
+        Writes the blob again from ``content`` (e.g. the upload it came from)
+        if it is missing. Returns False if it is missing and ``content``
+        cannot be read either, e.g. a file field that only holds the name.
+        """
+        if os.path.exists(super().path(self.blob_name(sha256))):
+            return True
+        temp_dir = super().path(f'{BLOB_DIR}/tmp')
+        os.makedirs(temp_dir, exist_ok=True)
+        temp = tempfile.NamedTemporaryFile(dir=temp_dir, delete=False)
+        try:
+            with temp:
+                for chunk in content.chunks():
+                    temp.write(chunk)
+        except FileNotFoundError:
+            os.unlink(temp.name)
+            return False
+        self._keep_blob(sha256, temp.name)
+        return True
+
+    def delete(self, name):
+        """Blobs may be shared, so they are only removed by ``release`` when unreferenced."""
+        sha256, _ = split_name(name)
+        if not sha256:
+            super().delete(name)
+
+
+stored_files = ContentAddressedStorage()
+
+
+def retain(name, content=None):
+    """
+    Counts a new reference to the blob behind a stored name. ``content`` is
+    the file the name was saved from; if a release deleted the blob after
+    the upload was stored but before this reference was counted, the blob
+    is written again from it.
+    """
+    from .models import StoredFile
+    sha256, _ = split_name(name)
+    if not sha256:
+        return
+    with transaction.atomic():
+        stored = StoredFile.objects.select_for_update().filter(sha256=sha256).first()
+        if content is not None:
+            stored_files.restore_blob(sha256, content)
+        if stored:
+            StoredFile.objects.filter(pk=stored.pk).update(ref_count=F('ref_count') + 1)
+        else:
+            StoredFile.objects.create(sha256=sha256, size=stored_files.size(name), ref_count=1)
+
+
+def release(name):
+    """Drops a reference to the blob behind a stored name; the last one deletes it once the transaction commits."""
+    from .models import StoredFile
+    sha256, _ = split_name(name)
+    if sha256:
+        StoredFile.objects.filter(sha256=sha256, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        transaction.on_commit(lambda: delete_if_unreferenced(sha256))
+
+
+def delete_if_unreferenced(sha256):
+    """
+    Deletes a blob and its StoredFile row if nothing refers to it. Both go
+    while the row is locked, so an upload or reference of the same content
+    (which lock the row too) either finds them both or neither.
+    """
+    from .models import StoredFile
+    with transaction.atomic():
+        stored = StoredFile.objects.select_for_update().filter(sha256=sha256, ref_count=0).first()
+        if not stored:
+            return False
+        blob_path = stored_files.path(f'{sha256}/blob')
+        if os.path.exists(blob_path):
+            os.remove(blob_path)
+        stored.delete()
+    return True
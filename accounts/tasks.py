@@ -0,0 +1,67 @@
+import tempfile
+import zipfile
+from datetime import date
+from celery import shared_task
+from django.core.files import File
+from .jobs import track
+from .ledger import build_month_balances
+from .models import Account, CustomUser, Invoice, LedgerMonthBalance
+from .payroll import settle_all_groups
+from .payslips import generate_payslips
+from .pdf import company_data, invoice_document, render_many
+
+
+def _parse_date(value):
+    return date.fromisoformat(value) if value else None
+
+
+@shared_task
+def settle_payroll(job_id, payment_date, account_id, user_id=None, period_start=None, period_end=None):
+    """Pays every outsourced group its unpaid wages for the period (see payroll.settle_all_groups)."""
+    with track(job_id) as job:
+        runs = settle_all_groups(
+            date.fromisoformat(payment_date),
+            Account.objects.get(pk=account_id),
+            CustomUser.objects.filter(pk=user_id).first(),
+            _parse_date(period_start),
+            _parse_date(period_end),
+        )
+        total = sum((run.amount_paid for run in runs), 0)
+        job.result = f"Settled {len(runs)} group(s) for Đ{total}."
+
+
+@shared_task
+def build_ledger_snapshots(job_id, rebuild=False):
+    """Builds missing monthly ledger snapshots, or all of them again with ``rebuild``."""
+    with track(job_id) as job:
+        if rebuild:
+            LedgerMonthBalance.objects.all().delete()
+        job.result = f"Created {build_month_balances()} monthly ledger snapshot(s)."
+
+
+@shared_task
+def build_invoice_pdfs(job_id, month):
+    """Renders every invoice issued in ``month`` (YYYY-MM) to PDF and attaches them to the job as one zip."""
+    with track(job_id) as job:
+        start = date.fromisoformat(f'{month}-01')
+        invoices = Invoice.objects.filter(
+            issue_date__year=start.year, issue_date__month=start.month,
+        ).select_related('project').prefetch_related('payments').order_by('issue_date', 'pk')
+        company = company_data()
+        documents = [invoice_document(invoice, company) for invoice in invoices]
+        with tempfile.TemporaryFile() as output:
+            with zipfile.ZipFile(output, 'w') as archive:
+                for filename, pdf in render_many(documents):
+                    archive.writestr(filename, pdf)
+            output.seek(0)
+            job.file.save(f'invoices-{month}.zip', File(output), save=False)
+        job.result = f"Rendered {len(documents)} invoice PDF(s)."
+
+
+@shared_task
+def build_payslips(job_id, month, user_id=None):
+    """Generates (or regenerates) every own worker's payslip for ``month`` (YYYY-MM)."""
+    with track(job_id) as job:
+        payslips = generate_payslips(date.fromisoformat(f'{month}-01'), CustomUser.objects.filter(pk=user_id).first())
+        total = sum((payslip.net_pay for payslip in payslips), 0)
+        job.result = f"Generated {len(payslips)} payslip(s) for {month} totalling Đ{total}."
@@ -1,3 +1,152 @@
-from django.test import TestCase
+from datetime import date, time
+from decimal import Decimal
+from django.test import SimpleTestCase, TestCase, override_settings
+from projects.models import Project
+from workers.models import Worker, WorkerAttendance
+from workers.rates import Rate
+from workers.wages import WageRules
+from .dedupe import MergeConflict, merge
+from .models import CustomUser, Payslip
+from .payslips import attendance_totals, build_payslip, generate_payslips
 
-# Create your tests here.
+# 8-hour days and 26 work days: a month is 12,480 standard minutes.
+RULES = WageRules(standard_minutes=480, work_days=26)
+RATE = Rate(fixed_wage=Decimal('2600.00'), daily_wage=Decimal('0.00'), ot1_rate=Decimal('15.00'), ot2_rate=Decimal('20.00'))
+FULL_MONTH = 26 * 480
+
+
+class BuildPayslipTests(SimpleTestCase):
+    def payslip(self, rate=RATE, **totals):
+        return build_payslip(Worker(pk=1, name="Ravi", worker_type='own'), date(2025, 1, 1), totals, RULES, rate)
+
+    def test_full_month_has_no_deduction(self):
+        payslip = self.payslip(days_worked=26, regular_minutes=FULL_MONTH)
+        self.assertEqual((payslip.regular_hours, payslip.deductions, payslip.net_pay), (Decimal('208.00'), 0, Decimal('2600.00')))
+
+    def test_shortfall_is_deducted_at_the_attendance_rate(self):
+        # 7 minutes short: 260000 x 7 / 12480 = 145.83 cents, rounded once.
+        payslip = self.payslip(regular_minutes=FULL_MONTH - 7)
+        self.assertEqual(payslip.deductions, Decimal('1.46'))
+        self.assertEqual(payslip.net_pay, Decimal('2598.54'))
+
+    def test_deduction_never_exceeds_the_basic_salary(self):
+        payslip = self.payslip(ot1_minutes=60)
+        self.assertEqual((payslip.deductions, payslip.ot1_pay, payslip.net_pay), (Decimal('2600.00'), Decimal('15.00'), Decimal('15.00')))
+
+    def test_hours_and_overtime_pay_round_half_up(self):
+        payslip = self.payslip(regular_minutes=FULL_MONTH, ot1_minutes=7, ot2_minutes=1)
+        self.assertEqual((payslip.ot1_hours, payslip.ot2_hours), (Decimal('0.12'), Decimal('0.02')))
+        # 7 minutes at 15.00 an hour are 1.75; 1 minute at 20.00 is 0.333...
+        self.assertEqual((payslip.ot1_pay, payslip.ot2_pay), (Decimal('1.75'), Decimal('0.33')))
+        half_cent = self.payslip(rate=RATE._replace(ot1_rate=Decimal('0.01')), regular_minutes=FULL_MONTH, ot1_minutes=30)
+        self.assertEqual(half_cent.ot1_pay, Decimal('0.01'))
+
+    def test_holiday_hours_are_paid_at_ot2(self):
+        payslip = self.payslip(regular_minutes=FULL_MONTH, holidays_worked=1, ot2_minutes=240)
+        self.assertEqual((payslip.ot2_hours, payslip.ot2_pay, payslip.net_pay), (Decimal('4.00'), Decimal('80.00'), Decimal('2680.00')))
+
+
+@override_settings(STANDARD_WORK_HOURS_PER_DAY=8, WORK_DAYS_PER_MONTH=26)
+class AttendanceTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username='supervisor', role='supervisor')
+        cls.project = Project.objects.create(name="Tower", start_date=date(2025, 1, 1))
+        cls.worker = Worker.objects.create(name="Ravi", worker_type='own', fixed_wage=Decimal('2600.00'))
+        cls.outsourced = Worker.objects.create(name="Sami", worker_type='outsourced', daily_wage=Decimal('120.00'))
+
+    def attend(self, worker, day, in_time, out_time, is_holiday=False):
+        WorkerAttendance.objects.create(
+            worker=worker, project=self.project, date=day, in_time=in_time, out_time=out_time,
+            is_holiday=is_holiday, recorded_by=self.user,
+        )
+
+    def test_minutes_are_split_as_the_wages_split_them(self):
+        self.attend(self.worker, date(2025, 1, 6), time(8, 0), time(18, 7))
+        self.attend(self.worker, date(2025, 1, 7), time(8, 0), time(12, 0), is_holiday=True)
+        # An overnight shift counts as a day worked with no minutes.
+        self.attend(self.worker, date(2025, 1, 8), time(22, 0), time(6, 0))
+        self.attend(self.worker, date(2025, 2, 3), time(8, 0), time(16, 0))
+        self.attend(self.outsourced, date(2025, 1, 6), time(8, 0), time(16, 0))
+
+        totals = attendance_totals(date(2025, 1, 1), date(2025, 1, 31), RULES)
+        self.assertEqual(totals, {self.worker.pk: {
+            'days_worked': 2, 'holidays_worked': 1, 'regular_minutes': 480, 'ot1_minutes': 127, 'ot2_minutes': 240,
+        }})
+
+
+@override_settings(STANDARD_WORK_HOURS_PER_DAY=8, WORK_DAYS_PER_MONTH=26)
+class GeneratePayslipsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username='owner', role='owner')
+        cls.project = Project.objects.create(name="Tower", start_date=date(2025, 1, 1))
+
+    def own_worker(self, name, fixed_wage='2600.00'):
+        return Worker.objects.create(
+            name=name, worker_type='own', fixed_wage=Decimal(fixed_wage), ot1_rate=Decimal('15.00'), ot2_rate=Decimal('20.00'),
+        )
+
+    def attend(self, worker, day, out_time=time(18, 0)):
+        WorkerAttendance.objects.create(
+            worker=worker, project=self.project, date=day, in_time=time(8, 0), out_time=out_time, recorded_by=self.user,
+        )
+
+    def test_running_a_month_again_updates_its_payslips_in_place(self):
+        worker = self.own_worker("Ravi")
+        self.attend(worker, date(2025, 1, 6))
+        first = generate_payslips(date(2025, 1, 15), self.user)
+        self.assertEqual(first[0].ot1_hours, Decimal('2.00'))
+
+        self.attend(worker, date(2025, 1, 7))
+        generate_payslips(date(2025, 1, 1), self.user)
+        payslip = Payslip.objects.get()
+        self.assertEqual(payslip.pk, Payslip.objects.get(worker=worker, month=date(2025, 1, 1)).pk)
+        self.assertEqual((payslip.days_worked, payslip.ot1_hours, payslip.ot1_pay), (2, Decimal('4.00'), Decimal('60.00')))
+
+        generate_payslips(date(2025, 1, 1), self.user)
+        self.assertEqual(Payslip.objects.count(), 1)
+        self.assertEqual(Payslip.objects.get().net_pay, payslip.net_pay)
+
+    def test_payslips_no_longer_due_are_removed(self):
+        staying, leaving, moved = self.own_worker("Ravi"), self.own_worker("Anil"), self.own_worker("Joy")
+        generate_payslips(date(2025, 1, 1))
+        self.assertEqual(Payslip.objects.count(), 3)
+
+        Worker.objects.filter(pk=leaving.pk).update(is_active=False)
+        Worker.objects.filter(pk=moved.pk).update(worker_type='outsourced')
+        generate_payslips(date(2025, 1, 1))
+        self.assertEqual(list(Payslip.objects.values_list('worker', flat=True)), [staying.pk])
+
+    def test_inactive_worker_with_attendance_keeps_the_payslip(self):
+        worker = self.own_worker("Ravi")
+        self.attend(worker, date(2025, 1, 6))
+        Worker.objects.filter(pk=worker.pk).update(is_active=False)
+        generate_payslips(date(2025, 1, 1))
+        self.assertEqual(Payslip.objects.get().days_worked, 1)
+
+    def test_merge_regenerates_the_kept_workers_payslips(self):
+        kept, duplicate = self.own_worker("Ravi Kumar"), self.own_worker("Ravi Kumar.")
+        self.attend(kept, date(2025, 1, 6))
+        self.attend(duplicate, date(2025, 1, 7), out_time=time(19, 0))
+        self.attend(duplicate, date(2025, 2, 3))
+        generate_payslips(date(2025, 1, 1))
+        generate_payslips(date(2025, 2, 1))
+
+        merge('worker', kept.pk, [duplicate.pk])
+
+        payslips = Payslip.objects.order_by('month')
+        self.assertEqual([(payslip.worker_id, payslip.month) for payslip in payslips], [(kept.pk, date(2025, 1, 1)), (kept.pk, date(2025, 2, 1))])
+        january = payslips[0]
+        self.assertEqual((january.days_worked, january.ot1_hours, january.ot1_pay), (2, Decimal('5.00'), Decimal('75.00')))
+        self.assertEqual(payslips[1].days_worked, 1)
+
+    def test_merge_refuses_workers_with_different_rates(self):
+        kept, duplicate = self.own_worker("Ravi Kumar"), self.own_worker("Ravi Kumar.", fixed_wage='3000.00')
+        self.attend(duplicate, date(2025, 1, 7))
+        generate_payslips(date(2025, 1, 1))
+
+        with self.assertRaises(MergeConflict):
+            merge('worker', kept.pk, [duplicate.pk])
+        self.assertEqual(Payslip.objects.filter(worker=duplicate).count(), 1)
+        self.assertTrue(WorkerAttendance.objects.filter(worker=duplicate).exists())
@@ -15,6 +15,7 @@ urlpatterns = [
     
     # This is the URL for the selected view function
     path('payables/group/<int:group_id>/pay/', views.group_pay_all_view, name='group_pay_all'),
+    path('payables/settle-all/', views.settle_all_groups_view, name='settle_all_groups'),
     path('materials/', views.material_list_view, name='material_list'),
     path('materials/create/', views.material_create_view, name='material_create'),
     path('materials/<int:pk>/update/', views.material_update_view, name='material_update'),
@@ -23,10 +24,23 @@ urlpatterns = [
     path('invoices/', views.invoice_list_view, name='invoice_list'),
     path('invoices/create/', views.invoice_create_view, name='invoice_create'),
     path('invoices/<int:pk>/', views.invoice_detail_view, name='invoice_detail'),
+    path('invoices/pdfs/', views.invoice_pdfs_view, name='invoice_pdfs'),
     path('invoices/<int:pk>/update/', views.invoice_update_view, name='invoice_update'),
     # URLs for the Accounting Journal
     path('journal/', views.journal_list_view, name='journal_list'),
     path('journal/create/', views.journal_create_view, name='journal_create'),
     path('journal/<int:pk>/update/', views.journal_update_view, name='journal_update'),
     path('journal/<int:pk>/delete/', views.journal_delete_view, name='journal_delete'),
+    path('ledger/trial-balance/', views.trial_balance_view, name='trial_balance'),
+    path('ledger/<int:pk>/', views.general_ledger_view, name='general_ledger'),
+    path('query-stats/', views.query_stats_view, name='query_stats'),
+    path('payroll-runs/<int:pk>/pdf/', views.payroll_run_pdf_view, name='payroll_run_pdf'),
+    path('payslips/', views.payslip_list_view, name='payslip_list'),
+    path('payslips/<int:pk>/pdf/', views.payslip_pdf_view, name='payslip_pdf'),
+    path('jobs/', views.job_list_view, name='job_list'),
+    path('jobs/<int:pk>/file/', views.job_file_view, name='job_file'),
+    path('files/<str:sha256>/<str:filename>', views.stored_file_view, name='stored_file'),
+    path('duplicates/<str:kind>/', views.duplicate_list_view, name='duplicate_list'),
+    path('duplicates/<str:kind>/merge/', views.duplicate_merge_view, name='duplicate_merge'),
+    path('duplicates/<str:kind>/similar/', views.similar_names_view, name='similar_names'),
 ]
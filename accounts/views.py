@@ -3,9 +3,11 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from .models import CustomUser,Account,Transaction,GroupPayment, Material
 from workers.models import Worker, WorkerAttendance, OutsourcedGroup
-from projects.models import Project, ProjectExpense
+from projects.models import Project, ProjectExpense, ProjectDocument, ProjectPhoto, TaskPhoto
+from projects.thumbnails import source_root
+from quotations.models import QuotationFile
 from .forms import CustomUserCreationForm, CustomUserChangeForm, AccountForm, MaterialForm
-from django.db.models import Sum, Count, Case, When, DecimalField, Q, F
+from django.db.models import Sum, Count, Case, When, DecimalField, Q, F, Max
 from datetime import timedelta
 from django.utils import timezone
 from django.contrib.auth import login, logout
@@ -15,10 +17,31 @@ from django.db.models.functions import TruncMonth
 from datetime import date, datetime
 from decimal import Decimal
 from django.db import transaction
+from django.conf import settings
 from .models import Invoice, InvoicePayment, Account, Transaction
 from .forms import InvoiceForm, InvoicePaymentForm
 from .models import Journal, JournalEntry
 from .forms import JournalEntryFormSet, ContraVoucherForm
+from .dashboard import get_dashboard_snapshot, bump_dashboard_sources
+from .payroll import unpaid_wage_summary, unpaid_attendances, payment_account, settle_group
+from .ledger import trial_balance, general_ledger
+from .closing import PeriodLocked
+from . import querystats
+from .models import BackgroundJob, PayrollRun, Payslip
+from .jobs import enqueue
+from .tasks import settle_payroll, build_ledger_snapshots, build_invoice_pdfs, build_payslips
+from .pdf import invoice_document, payroll_run_document, payslip_document, pdf_response
+from reports.tasks import rebuild_daily_costs
+from projects.tasks import rebuild_project_rollups
+from django.http import Http404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from .storage import stored_files, split_name
+from .media import send_file
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.urls import reverse
+from . import dedupe
 
 # --- Reusable Permission Checker ---
 def is_admin_or_owner(user):
@@ -47,87 +70,26 @@ def role_check(role_list):
 # --- Views ---
 @login_required
 def dashboard_view(request):
-    today = date.today()
-    
-    # --- New Birthday Alert Logic ---
-    birthday_workers = Worker.objects.filter(
-        worker_type='own', 
-        is_active=True, 
-        dob__month=today.month, 
-        dob__day=today.day
-    )
-    
-    # Financial Summaries (including Pending Invoices)
-    pending_invoices = Invoice.objects.annotate(
-        amount_received=Sum('payments__amount', default=0, output_field=DecimalField())
-    ).filter(total_amount__gt=F('amount_received'))
-    
-    pending_invoices_total = pending_invoices.aggregate(
-        total_due=Sum(F('total_amount') - F('amount_received'))
-    )['total_due'] or 0
-    total_credit_due = Account.objects.filter(account_type='liability').aggregate(total=Sum('balance'))['total'] or 0
-    unpaid_wages = WorkerAttendance.objects.filter(is_paid=False, worker__worker_type='outsourced').aggregate(total=Sum('total_wage'))['total'] or 0
-    total_payable = total_credit_due + unpaid_wages
-
-    # Project and Worker Counts
-    projects_qs = Project.objects.filter_for_user(request.user)
-    active_projects_count = projects_qs.filter(status='active').count()
-    completed_projects_count = projects_qs.filter(status='completed').count()
-    worker_counts = Worker.objects.filter(is_active=True).aggregate(
-        total_workers=Count('id'),
-        own_workers=Count('id', filter=Q(worker_type='own')),
-        outsourced_workers=Count('id', filter=Q(worker_type='outsourced'))
-    )
-
-    # Recent Transactions & Chart Data
-    recent_transactions = Transaction.objects.select_related('account').order_by('-date')[:5]
-    six_months_ago = today - timedelta(days=180)
-    monthly_income = Transaction.objects.filter(date__gte=six_months_ago, transaction_type='credit').annotate(month=TruncMonth('date')).values('month').annotate(total=Sum('amount')).order_by('month')
-    monthly_expenses = Transaction.objects.filter(date__gte=six_months_ago, transaction_type='debit').annotate(month=TruncMonth('date')).values('month').annotate(total=Sum('amount')).order_by('month')
-    
-    chart_data = defaultdict(lambda: {'income': 0, 'expenses': 0})
-    for item in monthly_income: chart_data[item['month'].strftime('%b %Y')]['income'] = float(item['total'])
-    for item in monthly_expenses: chart_data[item['month'].strftime('%b %Y')]['expenses'] = float(item['total'])
-    sorted_chart_data = sorted(chart_data.items(), key=lambda x: datetime.strptime(x[0], '%b %Y'))
-
-    context = {
-        'birthday_workers': birthday_workers, # Added the birthday list to the context
-        'pending_invoices_total': pending_invoices_total,
-        'total_credit_due': total_payable,
-        'active_projects_count': active_projects_count,
-        'completed_projects_count': completed_projects_count,
-        'total_workers': worker_counts['total_workers'],
-        'own_workers': worker_counts['own_workers'],
-        'outsourced_workers': worker_counts['outsourced_workers'],
-        'recent_transactions': recent_transactions,
-        'chart_labels': json.dumps([item[0] for item in sorted_chart_data]),
-        'chart_income_values': json.dumps([item[1]['income'] for item in sorted_chart_data]),
-        'chart_expense_values': json.dumps([item[1]['expenses'] for item in sorted_chart_data]),
-    }
+    """
+    Renders the landing dashboard from the cached tile snapshot; only tiles
+    whose underlying data changed since they were cached are recomputed.
+    """
+    context = get_dashboard_snapshot(request.user)
     return render(request, 'dashboard.html', context)
 
 @login_required
 @user_passes_test(is_admin_or_owner)
 def payable_list_view(request):
     """
-    Groups unpaid wages by OutsourcedGroup and calculates the total for each.
-    This version is corrected to use 'is_paid=False'.
+    Groups unpaid wages by OutsourcedGroup and calculates the total for each
+    in a single grouped query.
     """
-    unpaid_attendances = WorkerAttendance.objects.filter(
-        is_paid=False,  # Corrected from payment__isnull=True
-        worker__worker_type='outsourced'
-    ).select_related('worker__group')
-
-    grouped_totals = defaultdict(Decimal)
-    for att in unpaid_attendances:
-        if att.worker.group:
-            grouped_totals[att.worker.group] += att.total_wage
-
-    sorted_grouped_totals = dict(sorted(grouped_totals.items(), key=lambda item: item[0].name))
+    totals = {row['worker__group_id']: row['total'] for row in unpaid_wage_summary(group_by=('worker__group_id',))}
+    groups = OutsourcedGroup.objects.select_related('leader').filter(pk__in=totals).order_by('name')
 
     context = {
-        'grouped_totals': sorted_grouped_totals,
-        'total_unpaid': sum(grouped_totals.values()),
+        'grouped_totals': {group: totals[group.pk] for group in groups},
+        'total_unpaid': sum(totals.values()),
     }
     return render(request, 'accounts/payable_list.html', context)
 
@@ -186,8 +148,12 @@ def user_delete_view(request, pk):
         if user == request.user:
             messages.error(request, "You cannot delete your own account.")
             return redirect('user_list')
-        user.delete()
-        messages.success(request, 'User deleted successfully.')
+        try:
+            user.delete()
+        except PeriodLocked as e:
+            messages.error(request, f"This user's transactions cannot be deleted. {e.message}")
+        else:
+            messages.success(request, 'User deleted successfully.')
         return redirect('user_list')
     # For GET request, you would typically show a confirmation page
     # But for simplicity here we redirect. A modal is better (implemented in templates).
@@ -233,43 +199,22 @@ def group_payment_detail_view(request, group_id):
             amount_paid = Decimal(amount_paid_str)
             payment_date = date.fromisoformat(payment_date_str)
 
-            bank_account = Account.objects.filter(Q(account_type='asset') | Q(account_type='income')).order_by('account_type').first()
+            bank_account = payment_account()
             if not bank_account:
                 messages.error(request, "Payment failed: No 'Asset' or 'Income' type account found to pay from. Please create one.")
                 return redirect('group_payment_detail', group_id=group.id)
 
-            with transaction.atomic():
-                # Determine the correct transaction type to DECREASE the account's balance.
-                transaction_type = 'credit' if bank_account.account_type == 'asset' else 'debit'
-
-                # 1. ALWAYS create the financial transaction for the amount paid.
-                Transaction.objects.create(
-                    account=bank_account,
-                    transaction_type=transaction_type,
-                    amount=amount_paid,
-                    date=payment_date,
-                    description=f"Payment to outsourced group: {group.name}",
-                    created_by=request.user
-                )
-                
-                # 2. Identify which full attendance records this payment can cover.
-                unpaid_for_group = WorkerAttendance.objects.filter(worker__group=group, is_paid=False).order_by('date')
-                
-                pks_to_pay = []
-                amount_covered = Decimal(0)
-                for att in unpaid_for_group:
-                    if (amount_covered + att.total_wage) <= amount_paid:
-                        pks_to_pay.append(att.pk)
-                        amount_covered += att.total_wage
-                    else:
-                        break
-                
-                if pks_to_pay:
-                    # 3. Perform a bulk update on the records that were fully covered.
-                    WorkerAttendance.objects.filter(pk__in=pks_to_pay).update(is_paid=True)
-                    messages.success(request, f"Payment of Đ{amount_paid} recorded. Đ{amount_covered} of this was applied to clear the oldest unpaid wages.")
-                else:
-                    messages.info(request, f"Payment of Đ{amount_paid} recorded. This amount was not enough to clear any specific daily wages, but your bank balance has been updated.")
+            # Records the payment and clears the oldest unpaid wages it fully covers
+            try:
+                run = settle_group(group, amount_paid, payment_date, bank_account, request.user)
+            except ValidationError as e:
+                messages.error(request, ' '.join(e.messages))
+                return redirect('group_payment_detail', group_id=group.id)
+
+            if run.amount_settled:
+                messages.success(request, f"Payment of Đ{amount_paid} recorded. Đ{run.amount_settled} of this was applied to clear the oldest unpaid wages.")
+            else:
+                messages.info(request, f"Payment of Đ{amount_paid} recorded. This amount was not enough to clear any specific daily wages, but your bank balance has been updated.")
 
             return redirect('group_payment_detail', group_id=group.id)
 
@@ -278,14 +223,16 @@ def group_payment_detail_view(request, group_id):
         worker__group=group
     ).select_related('worker', 'project').order_by('date')
 
-    unpaid_attendances = all_attendances.filter(is_paid=False)
-    paid_attendances = all_attendances.filter(is_paid=True)
+    unpaid_for_group = all_attendances.filter(is_paid=False)
 
-    total_owed = unpaid_attendances.aggregate(total=Sum('total_wage'))['total'] or 0
-    total_paid = paid_attendances.aggregate(total=Sum('total_wage'))['total'] or 0
+    totals = all_attendances.aggregate(
+        total_owed=Sum('total_wage', filter=Q(is_paid=False), default=0),
+        total_paid=Sum('total_wage', filter=Q(is_paid=True), default=0),
+    )
+    total_owed, total_paid = totals['total_owed'], totals['total_paid']
 
     unpaid_by_date = defaultdict(list)
-    for att in unpaid_attendances:
+    for att in unpaid_for_group:
         unpaid_by_date[att.date].append(att)
 
     context = {
@@ -293,6 +240,7 @@ def group_payment_detail_view(request, group_id):
         'unpaid_by_date': dict(sorted(unpaid_by_date.items())),
         'total_owed': total_owed,
         'total_paid': total_paid,
+        'payment_history': group.payroll_runs.all()[:10],
     }
     return render(request, 'accounts/group_payment_detail.html', context)
 
@@ -304,32 +252,40 @@ def group_pay_all_view(request, group_id):
     """
     group = get_object_or_404(OutsourcedGroup, pk=group_id)
     if request.method == 'POST':
-        with transaction.atomic():
-            unpaid_for_group = WorkerAttendance.objects.filter(worker__group=group, is_paid=False)
-            
-            # Create a single debit transaction for the total amount being paid
-            total_payment = unpaid_for_group.aggregate(total=Sum('total_wage'))['total'] or 0
-            bank_account = Account.objects.filter(account_type='asset').first()
-
-            if bank_account and total_payment > 0:
-                Transaction.objects.create(
-                    account=bank_account,
-                    transaction_type='debit',
-                    amount=total_payment,
-                    date=date.today(),
-                    description=f"Bulk payment for outsourced group: {group.name}",
-                    created_by=request.user
-                )
-                # Now, update the records
-                unpaid_for_group.update(is_paid=True)
-                messages.success(request, f"All unpaid wages for group '{group.name}' have been marked as paid and debited from {bank_account.name}.")
-            elif not bank_account:
-                 messages.error(request, "Payment failed: No 'Asset' account found.")
+        total_payment = unpaid_attendances(group).aggregate(total=Sum('total_wage'))['total'] or 0
+        bank_account = payment_account()
+
+        if bank_account and total_payment > 0:
+            try:
+                settle_group(group, total_payment, date.today(), bank_account, request.user)
+            except ValidationError as e:
+                messages.error(request, ' '.join(e.messages))
             else:
-                 messages.info(request, "No unpaid wages to process.")
+                messages.success(request, f"All unpaid wages for group '{group.name}' have been marked as paid and paid from {bank_account.name}.")
+        elif not bank_account:
+             messages.error(request, "Payment failed: No 'Asset' or 'Income' type account found to pay from. Please create one.")
+        else:
+             messages.info(request, "No unpaid wages to process.")
 
     return redirect('group_payment_detail', group_id=group_id)
 
+@login_required
+@user_passes_test(is_admin_or_owner)
+def settle_all_groups_view(request):
+    """
+    Queues a background job that pays every outsourced group its full
+    unpaid wages today, then shows the job's progress.
+    """
+    if request.method == 'POST':
+        bank_account = payment_account()
+        if not bank_account:
+            messages.error(request, "Payment failed: No 'Asset' or 'Income' type account found to pay from. Please create one.")
+            return redirect('payable_list')
+        enqueue(settle_payroll, "Settle all outsourced groups", date.today().isoformat(), bank_account.pk, request.user.pk, user=request.user)
+        messages.success(request, f"Payment of every group's unpaid wages from {bank_account.name} has been queued.")
+        return redirect('job_list')
+    return redirect('payable_list')
+
 @login_required
 @user_passes_test(is_admin_or_owner)
 def account_list_view(request):
@@ -441,9 +397,56 @@ def material_delete_view(request, pk):
 @login_required
 @user_passes_test(is_admin_or_owner)
 def invoice_list_view(request):
-    """ Displays a list of all invoices. """
-    invoices = Invoice.objects.select_related('project').all()
-    return render(request, 'accounts/invoice_list.html', {'invoices': invoices})
+    """
+    Displays invoices with their payment totals annotated in SQL, filtered
+    by payment status and paginated by keyset on (issue_date, pk).
+    """
+    page_size = 50
+    status_filter = request.GET.get('status')
+    invoices = Invoice.objects.select_related('project').with_payment_totals()
+
+    counts = Invoice.objects.with_payment_totals().aggregate(
+        all=Count('id'),
+        paid=Count('id', filter=Q(outstanding__lte=0)),
+        unpaid=Count('id', filter=Q(outstanding__gt=0)),
+        overdue=Count('id', filter=Q(outstanding__gt=0, due_date__lt=date.today())),
+    )
+
+    if status_filter == 'paid':
+        invoices = invoices.paid()
+    elif status_filter == 'unpaid':
+        invoices = invoices.unpaid()
+    elif status_filter == 'overdue':
+        invoices = invoices.overdue()
+    else:
+        status_filter = None
+
+    # Keyset pagination: "after" holds the issue date and pk of the last row shown
+    after = request.GET.get('after')
+    if after:
+        try:
+            after_date_str, after_pk_str = after.split('_')
+            after_date, after_pk = date.fromisoformat(after_date_str), int(after_pk_str)
+        except ValueError:
+            after = None
+        else:
+            invoices = invoices.filter(Q(issue_date__lt=after_date) | Q(issue_date=after_date, pk__lt=after_pk))
+
+    page = list(invoices.order_by('-issue_date', '-pk')[:page_size + 1])
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = f"{page[-1].issue_date.isoformat()}_{page[-1].pk}"
+
+    context = {
+        'invoices': page,
+        'counts': counts,
+        'current_filter': status_filter,
+        'is_first_page': not after,
+        'next_cursor': next_cursor,
+        'today': date.today(),
+    }
+    return render(request, 'accounts/invoice_list.html', context)
 
 @login_required
 @user_passes_test(is_admin_or_owner)
@@ -466,8 +469,12 @@ def invoice_create_view(request):
 def invoice_detail_view(request, pk):
     """
     Displays details for a single invoice and handles recording new payments.
+    ?format=pdf returns the invoice as a PDF instead.
     """
-    invoice = get_object_or_404(Invoice.objects.select_related('project'), pk=pk)
+    invoice = get_object_or_404(Invoice.objects.select_related('project').with_payment_totals(), pk=pk)
+    if request.method == 'GET' and request.GET.get('format') == 'pdf':
+        filename, template_name, data = invoice_document(invoice)
+        return pdf_response(request, template_name, data, filename)
     
     if request.method == 'POST':
         payment_form = InvoicePaymentForm(request.POST)
@@ -478,24 +485,28 @@ def invoice_detail_view(request, pk):
                 messages.error(request, "Payment failed: No 'Asset' account found to receive the payment. Please create one.")
                 return redirect('invoice_detail', pk=invoice.pk)
 
-            with transaction.atomic():
-                # 1. Save the payment record for the invoice
-                payment = payment_form.save(commit=False)
-                payment.invoice = invoice
-                payment.created_by = request.user
-                payment.save()
-
-                # 2. Create a financial transaction to increase the bank balance
-                # A payment RECEIVED into an Asset account is a DEBIT.
-                Transaction.objects.create(
-                    account=bank_account,
-                    transaction_type='debit',
-                    amount=payment.amount,
-                    date=payment.payment_date,
-                    description=f"Payment received for invoice: {invoice.title}",
-                    created_by=request.user
-                )
-            
+            try:
+                with transaction.atomic():
+                    # 1. Save the payment record for the invoice
+                    payment = payment_form.save(commit=False)
+                    payment.invoice = invoice
+                    payment.created_by = request.user
+                    payment.save()
+
+                    # 2. Create a financial transaction to increase the bank balance
+                    # A payment RECEIVED into an Asset account is a DEBIT.
+                    Transaction.objects.create(
+                        account=bank_account,
+                        transaction_type='debit',
+                        amount=payment.amount,
+                        date=payment.payment_date,
+                        description=f"Payment received for invoice: {invoice.title}",
+                        created_by=request.user
+                    )
+            except PeriodLocked as e:
+                messages.error(request, e.message)
+                return redirect('invoice_detail', pk=invoice.pk)
+
             messages.success(request, 'Payment recorded and bank balance updated.')
             return redirect('invoice_detail', pk=invoice.pk)
         else:
@@ -544,17 +555,21 @@ def journal_create_view(request):
         form = ContraVoucherForm(request.POST or None)
         if request.method == 'POST' and form.is_valid():
             data = form.cleaned_data
-            with transaction.atomic():
-                journal = Journal.objects.create(
-                    date=data['date'],
-                    description=data['description'],
-                    voucher_type='contra',
-                    created_by=request.user
-                )
-                JournalEntry.objects.create(journal=journal, account=data['from_account'], credit=data['amount'])
-                JournalEntry.objects.create(journal=journal, account=data['to_account'], debit=data['amount'])
-            messages.success(request, 'Contra entry recorded successfully.')
-            return redirect('journal_list')
+            try:
+                with transaction.atomic():
+                    journal = Journal.objects.create(
+                        date=data['date'],
+                        description=data['description'],
+                        voucher_type='contra',
+                        created_by=request.user
+                    )
+                    JournalEntry.objects.create(journal=journal, account=data['from_account'], credit=data['amount'])
+                    JournalEntry.objects.create(journal=journal, account=data['to_account'], debit=data['amount'])
+            except PeriodLocked as e:
+                form.add_error('date', e.message)
+            else:
+                messages.success(request, 'Contra entry recorded successfully.')
+                return redirect('journal_list')
         
         context = {'form': form, 'voucher_type': voucher_type, 'title': 'Create Contra Voucher'}
         return render(request, 'accounts/journal_form.html', context)
@@ -564,13 +579,17 @@ def journal_create_view(request):
         if request.method == 'POST':
             formset = JournalEntryFormSet(request.POST, instance=journal)
             if formset.is_valid():
-                with transaction.atomic():
-                    journal.date = request.POST.get('date')
-                    journal.description = request.POST.get('description')
-                    journal.save()
-                    formset.save()
-                messages.success(request, f'{voucher_type.title()} voucher recorded successfully.')
-                return redirect('journal_list')
+                try:
+                    with transaction.atomic():
+                        journal.date = request.POST.get('date')
+                        journal.description = request.POST.get('description')
+                        journal.save()
+                        formset.save()
+                except PeriodLocked as e:
+                    messages.error(request, e.message)
+                else:
+                    messages.success(request, f'{voucher_type.title()} voucher recorded successfully.')
+                    return redirect('journal_list')
         else:
             formset = JournalEntryFormSet(instance=journal)
             
@@ -591,13 +610,17 @@ def journal_update_view(request, pk):
     if request.method == 'POST':
         formset = JournalEntryFormSet(request.POST, instance=journal)
         if formset.is_valid():
-            with transaction.atomic():
-                journal.date = request.POST.get('date')
-                journal.description = request.POST.get('description')
-                journal.save()
-                formset.save()
-            messages.success(request, 'Journal entry updated successfully.')
-            return redirect('journal_list')
+            try:
+                with transaction.atomic():
+                    journal.date = request.POST.get('date')
+                    journal.description = request.POST.get('description')
+                    journal.save()
+                    formset.save()
+            except PeriodLocked as e:
+                messages.error(request, e.message)
+            else:
+                messages.success(request, 'Journal entry updated successfully.')
+                return redirect('journal_list')
     else:
         formset = JournalEntryFormSet(instance=journal)
 
@@ -616,6 +639,303 @@ def journal_delete_view(request, pk):
     journal = get_object_or_404(Journal, pk=pk)
     if request.method == 'POST':
         journal_desc = str(journal)
-        journal.delete()
-        messages.success(request, f'Journal entry "{journal_desc}" has been deleted.')
+        try:
+            journal.delete()
+        except PeriodLocked as e:
+            messages.error(request, e.message)
+        else:
+            messages.success(request, f'Journal entry "{journal_desc}" has been deleted.')
     return redirect('journal_list')
+
+def _ledger_period(request):
+    """ Reads start_date/end_date from the query string, defaulting to the year to date. """
+    today = date.today()
+    try:
+        start = date.fromisoformat(request.GET.get('start_date') or today.replace(month=1, day=1).isoformat())
+        end = date.fromisoformat(request.GET.get('end_date') or today.isoformat())
+    except ValueError:
+        messages.error(request, 'Dates must be in YYYY-MM-DD format.')
+        start, end = today.replace(month=1, day=1), today
+    return start, end
+
+@login_required
+@user_passes_test(is_admin_or_owner)
+def trial_balance_view(request):
+    """ Trial balance of the journal for a period, with opening and closing balances per account. """
+    start, end = _ledger_period(request)
+    rows, totals = trial_balance(start, end)
+    context = {'rows': rows, 'totals': totals, 'start_date': start, 'end_date': end}
+    return render(request, 'accounts/trial_balance.html', context)
+
+@login_required
+@user_passes_test(is_admin_or_owner)
+def general_ledger_view(request, pk):
+    """ The journal lines of one account for a period, with a running balance. """
+    account = get_object_or_404(Account, pk=pk)
+    start, end = _ledger_period(request)
+    opening, lines, closing = general_ledger(account, start, end)
+    context = {
+        'account': account,
+        'opening': opening, 'lines': lines, 'closing': closing,
+        'start_date': start, 'end_date': end,
+    }
+    return render(request, 'accounts/general_ledger.html', context)
+
+@login_required
+@user_passes_test(is_admin_or_owner)
+def query_stats_view(request):
+    """ Per-view query counts and SQL time recorded by QueryStatsMiddleware in this process. """
+    if request.method == 'POST':
+        querystats.reset()
+        messages.success(request, 'Query statistics have been cleared.')
+        return redirect('query_stats')
+    context = {
+        'views': querystats.summaries(),
+        'sample_rate': getattr(settings, 'QUERY_STATS_SAMPLE_RATE', 0),
+        'window': getattr(settings, 'QUERY_STATS_WINDOW', 200),
+    }
+    return render(request, 'accounts/query_stats.html', context)
+
+@login_required
+@user_passes_test(is_admin_or_owner)
+def invoice_pdfs_view(request):
+    """ Queues a zip of the PDFs of every invoice issued in the posted month (YYYY-MM). """
+    if request.method == 'POST':
+        month = request.POST.get('month', '')
+        try:
+            date.fromisoformat(f'{month}-01')
+        except ValueError:
+            messages.error(request, 'Choose a month to download invoices for.')
+            return redirect('invoice_list')
+        enqueue(build_invoice_pdfs, f"Invoice PDFs for {month}", month, user=request.user)
+        messages.success(request, f"The invoice PDFs for {month} are being prepared. Download them here when they are ready.")
+        return redirect('job_list')
+    return redirect('invoice_list')
+
+@login_required
+@user_passes_test(is_admin_or_owner)
+def payroll_run_pdf_view(request, pk):
+    """ The pay statement of a group settlement as a PDF. """
+    run = get_object_or_404(PayrollRun.objects.select_related('group__leader'), pk=pk)
+    filename, template_name, data = payroll_run_document(run)
+    return pdf_response(request, template_name, data, filename)
+
+@login_required
+@user_passes_test(is_admin_or_owner)
+def payslip_list_view(request):
+    """
+    Own workers' payslips for a month (?month=YYYY-MM, default this month).
+    A POST queues generating the posted month's payslips, replacing any
+    generated before.
+    """
+    if request.method == 'POST':
+        month = request.POST.get('month', '')
+        try:
+            date.fromisoformat(f'{month}-01')
+        except ValueError:
+            messages.error(request, 'Choose a month to generate payslips for.')
+            return redirect('payslip_list')
+        enqueue(build_payslips, f"Payslips for {month}", month, user_id=request.user.pk, user=request.user)
+        messages.success(request, f"Payslips for {month} are being generated. Their progress is shown on the Background Jobs page.")
+        return redirect(f"{reverse('payslip_list')}?month={month}")
+
+    month = request.GET.get('month')
+    try:
+        start = date.fromisoformat(f'{month}-01') if month else date.today().replace(day=1)
+    except ValueError:
+        start = date.today().replace(day=1)
+    payslips = Payslip.objects.filter(month=start).select_related('worker').order_by('worker__name', 'pk')
+    totals = payslips.aggregate(
+        basic_salary=Sum('basic_salary'), ot1_pay=Sum('ot1_pay'), ot2_pay=Sum('ot2_pay'),
+        deductions=Sum('deductions'), net_pay=Sum('net_pay'), generated_at=Max('generated_at'),
+    )
+    context = {
+        'payslips': payslips,
+        'totals': totals,
+        'month': f'{start:%Y-%m}',
+        'month_start': start,
+    }
+    return render(request, 'accounts/payslip_list.html', context)
+
+@login_required
+@user_passes_test(is_admin_or_owner)
+def payslip_pdf_view(request, pk):
+    """ An own worker's payslip as a PDF. """
+    payslip = get_object_or_404(Payslip.objects.select_related('worker'), pk=pk)
+    filename, template_name, data = payslip_document(payslip)
+    return pdf_response(request, template_name, data, filename)
+
+# Rebuilds that can be started from the job page: key -> (task, description, task kwargs).
+REBUILD_JOBS = {
+    'daily_costs': (rebuild_daily_costs, "Rebuild daily project costs", {}),
+    'ledger_snapshots': (build_ledger_snapshots, "Rebuild monthly ledger snapshots", {'rebuild': True}),
+    'project_rollups': (rebuild_project_rollups, "Recalculate project costs and progress", {}),
+}
+
+@login_required
+@user_passes_test(is_admin_or_owner)
+def job_list_view(request):
+    """ The latest background jobs and their status; a POST queues one of the REBUILD_JOBS. """
+    if request.method == 'POST':
+        if request.POST.get('rebuild') in REBUILD_JOBS:
+            task, description, kwargs = REBUILD_JOBS[request.POST['rebuild']]
+            enqueue(task, description, user=request.user, **kwargs)
+            messages.success(request, f"'{description}' has been queued.")
+        return redirect('job_list')
+
+    jobs = list(BackgroundJob.objects.select_related('requested_by')[:50])
+    context = {
+        'jobs': jobs,
+        'rebuilds': {key: description for key, (_, description, _) in REBUILD_JOBS.items()},
+        'has_active_jobs': any(not job.is_finished for job in jobs),
+    }
+    return render(request, 'accounts/job_list.html', context)
+
+@login_required
+@user_passes_test(is_admin_or_owner)
+def job_file_view(request, pk):
+    """ Downloads the file an export job produced. """
+    job = get_object_or_404(BackgroundJob, pk=pk, status='succeeded')
+    if not job.file:
+        raise Http404("This job produced no file.")
+    return send_file(request, job.file.storage, job.file.name, as_attachment=True)
+
+# Models whose files are served by media_view and stored_file_view: (model,
+# file field, lookup from the model to its Project or None, role check).
+PROTECTED_MEDIA = [
+    (ProjectDocument, 'file', 'project', can_manage_projects),
+    (ProjectExpense, 'receipt', 'project', can_manage_projects),
+    (QuotationFile, 'file', None, is_admin_or_owner),
+    (ProjectPhoto, 'image', 'project', can_add_attendance),
+    (TaskPhoto, 'image', 'task__project', can_add_attendance),
+    (BackgroundJob, 'file', None, is_admin_or_owner),
+]
+
+def can_download_media(user, name):
+    """
+    Whether a row holding the file passes its role check and, where it has
+    one, belongs to a project in Project.objects.filter_for_user(user).
+    Only the models whose storage or upload directory the name fits are
+    queried, and photo thumbnails are authorised through their photo.
+    """
+    hashed, root = split_name(name)[0], source_root(name)
+    for model, field, project_lookup, role_check in PROTECTED_MEDIA:
+        file_field = model._meta.get_field(field)
+        owns_name = file_field.storage is stored_files if hashed else (root or name).startswith(file_field.upload_to)
+        if not owns_name or not role_check(user):
+            continue
+        if root:
+            # Every name starting "<root>." sorts from "<root>." up to "<root>/", so this stays an index range scan.
+            rows = model.objects.filter(**{f'{field}__gte': f'{root}.', f'{field}__lt': f'{root}/'})
+        else:
+            rows = model.objects.filter(**{field: name})
+        if project_lookup:
+            rows = rows.filter(**{f'{project_lookup}__in': Project.objects.filter_for_user(user)})
+        if rows.exists():
+            return True
+    return False
+
+@login_required
+def media_view(request, path):
+    """ Serves an uploaded file to users allowed to see the project, quotation or job it belongs to. """
+    if not can_download_media(request.user, path):
+        raise PermissionDenied
+    response = send_file(request, default_storage, path)
+    patch_cache_control(response, private=True)
+    return response
+
+@login_required
+def stored_file_view(request, sha256, filename):
+    """
+    Serves a document, quotation file or receipt from the content-addressed
+    store. Its hash is a strong ETag and the bytes behind the URL never
+    change, so browsers keep it for a year and a revalidation gets a 304,
+    but only once the file is found and the user may still download it.
+    """
+    name = f'{sha256}/{filename}'
+    if not split_name(name)[0] or not stored_files.exists(name):
+        raise Http404("File not found.")
+    if not can_download_media(request.user, name):
+        raise PermissionDenied
+    etag = f'"{sha256}"'
+    response = get_conditional_response(request, etag=etag) or send_file(request, stored_files, name, filename=filename, etag=etag)
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=60 * 60 * 24 * 365, immutable=True)
+    return response
+
+# Who may look up names of each kind while filling in a form, and the page
+# that edits a record of that kind (suppliers have none).
+DEDUPE_KINDS = {
+    'supplier': (can_manage_projects, None),
+    'worker': (can_manage_projects, 'worker_update'),
+    'material': (is_admin_or_owner, 'material_update'),
+}
+
+@login_required
+@user_passes_test(is_admin_or_owner)
+def duplicate_list_view(request, kind):
+    """
+    Groups of suppliers, workers or materials with near-identical names,
+    each with the record used most preselected as the one to keep.
+    """
+    if kind not in DEDUPE_KINDS:
+        raise Http404("Unknown record kind.")
+    try:
+        threshold = min(max(int(request.GET.get('threshold', dedupe.THRESHOLD)), 50), 100)
+    except ValueError:
+        threshold = dedupe.THRESHOLD
+    groups = dedupe.find_duplicates(kind, threshold)
+    counts = dedupe.usage(kind, [pk for group in groups for pk, _ in group['records']])
+    edit_url = DEDUPE_KINDS[kind][1]
+    for group in groups:
+        group['records'] = [
+            {'pk': pk, 'name': name, 'usage': counts[pk], 'url': reverse(edit_url, args=[pk]) if edit_url else ''}
+            for pk, name in group['records']
+        ]
+        group['keep'] = max(group['records'], key=lambda record: (record['usage'], -record['pk']))['pk']
+    context = {
+        'kind': kind,
+        'kinds': list(DEDUPE_KINDS),
+        'groups': groups,
+        'threshold': threshold,
+    }
+    return render(request, 'accounts/duplicate_list.html', context)
+
+@login_required
+@user_passes_test(is_admin_or_owner)
+def duplicate_merge_view(request, kind):
+    """ Merges the checked duplicates into the record chosen to keep. """
+    if kind not in DEDUPE_KINDS:
+        raise Http404("Unknown record kind.")
+    if request.method == 'POST':
+        try:
+            keep = int(request.POST['keep'])
+            duplicates = [int(pk) for pk in request.POST.getlist('merge')]
+        except (KeyError, ValueError):
+            messages.error(request, 'Choose the record to keep and at least one duplicate.')
+            return redirect('duplicate_list', kind=kind)
+        try:
+            repointed = dedupe.merge(kind, keep, duplicates)
+        except dedupe.MergeConflict as e:
+            messages.error(request, e.message)
+        except dedupe.kind_model(kind).DoesNotExist:
+            messages.error(request, 'That record no longer exists.')
+        else:
+            moved = ', '.join(f'{count} {name}' for name, count in repointed.items())
+            messages.success(request, f"Merged {len([pk for pk in duplicates if pk != keep])} duplicate(s){f'; moved {moved}' if moved else ''}.")
+    return redirect('duplicate_list', kind=kind)
+
+@login_required
+def similar_names_view(request, kind):
+    """ Existing records named like ?q=, as JSON for the typeahead on create and edit forms. """
+    if kind not in DEDUPE_KINDS:
+        raise Http404("Unknown record kind.")
+    can_view, edit_url = DEDUPE_KINDS[kind]
+    if not can_view(request.user):
+        raise PermissionDenied
+    exclude = request.GET.get('exclude')
+    matches = dedupe.similar(kind, request.GET.get('q', '')[:200], exclude=int(exclude) if exclude and exclude.isdigit() else None)
+    return JsonResponse({'matches': [
+        {'id': pk, 'name': name, 'score': score, 'url': reverse(edit_url, args=[pk]) if edit_url else ''}
+        for pk, name, score in matches
+    ]})
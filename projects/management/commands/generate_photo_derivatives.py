@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from projects.models import ProjectPhoto, TaskPhoto
+from projects.thumbnails import SIZES, derivative_name, generate_derivatives
+
+class Command(BaseCommand):
+    help = "Generates the thumbnail and preview of every project and task photo that is missing one."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate every photo's derivatives, not just missing ones.")
+
+    def handle(self, *args, **options):
+        generated = failed = 0
+        for model in (ProjectPhoto, TaskPhoto):
+            for photo in model.objects.exclude(image='').iterator():
+                storage = photo.image.storage
+                missing = photo.width is None or not all(storage.exists(derivative_name(photo.image.name, size)) for size in SIZES)
+                if not (missing or options['force']):
+                    continue
+                try:
+                    generate_derivatives(photo)
+                    generated += 1
+                except (OSError, ValueError) as e:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f"{model.__name__} #{photo.pk} ({photo.image.name}): {e}"))
+        self.stdout.write(self.style.SUCCESS(f"Generated derivatives for {generated} photo(s); {failed} failed."))
@@ -0,0 +1,15 @@
+from .rollups import deferred_project_rollups
+
+
+class ProjectRollupMiddleware:
+    """
+    Coalesces project rollups for the whole request: every expense,
+    attendance or task written while handling it marks its project dirty,
+    and each dirty project is recalculated once before the response is sent.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with deferred_project_rollups():
+            return self.get_response(request)
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_projectexpense_supplier_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='projectexpense',
+            index=models.Index(fields=['project', 'date', 'amount'], name='expense_project_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectexpense',
+            index=models.Index(fields=['date', 'expense_type', 'amount'], name='expense_date_type_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_photo_dimensions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='projectphoto',
+            index=models.Index(fields=['project', '-date', '-created_at', '-id'], name='projectphoto_gallery_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:14
+
+import accounts.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_projectphoto_gallery_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='projectdocument',
+            name='file',
+            field=models.FileField(max_length=255, storage=accounts.storage.ContentAddressedStorage(), upload_to='project_documents/'),
+        ),
+        migrations.AlterField(
+            model_name='projectexpense',
+            name='receipt',
+            field=models.FileField(blank=True, max_length=255, null=True, storage=accounts.storage.ContentAddressedStorage(), upload_to='receipts/'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:16
+
+import accounts.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0008_stored_file_storage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='projectdocument',
+            name='file',
+            field=models.FileField(db_index=True, max_length=255, storage=accounts.storage.ContentAddressedStorage(), upload_to='project_documents/'),
+        ),
+        migrations.AlterField(
+            model_name='projectexpense',
+            name='receipt',
+            field=models.FileField(blank=True, db_index=True, max_length=255, null=True, storage=accounts.storage.ContentAddressedStorage(), upload_to='receipts/'),
+        ),
+        migrations.AlterField(
+            model_name='projectphoto',
+            name='image',
+            field=models.ImageField(db_index=True, upload_to='project_photos/'),
+        ),
+        migrations.AlterField(
+            model_name='taskphoto',
+            name='image',
+            field=models.ImageField(db_index=True, upload_to='task_photos/'),
+        ),
+    ]
@@ -5,6 +5,7 @@ from django.utils import timezone
 from django.urls import reverse 
 from workers.models import WorkerAttendance
 from accounts.models import Supplier
+from accounts.storage import stored_files
 
 class ProjectManager(models.Manager):
     """
@@ -115,12 +116,28 @@ class Task(models.Model):
             return True
         return False
 
-class TaskPhoto(models.Model):
+class PhotoDerivatives(models.Model):
+    """
+    Fields shared by uploaded photos: their dimensions once EXIF orientation
+    is applied, filled in with the resized copies made by projects.thumbnails.
+    """
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def derivative_url(self, size):
+        """URL of the resized copy, or of the original while the copy is being made."""
+        from .thumbnails import derivative_url
+        return derivative_url(self, size)
+
+class TaskPhoto(PhotoDerivatives):
     """
     Represents a single photo uploaded for a specific task.
     """
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='photos')
-    image = models.ImageField(upload_to='task_photos/')
+    image = models.ImageField(upload_to='task_photos/', db_index=True)
     caption = models.CharField(max_length=255, blank=True)
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -137,7 +154,7 @@ class ProjectDocument(models.Model):
     """
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='documents')
     title = models.CharField(max_length=255)
-    file = models.FileField(upload_to='project_documents/')
+    file = models.FileField(upload_to='project_documents/', storage=stored_files, max_length=255, db_index=True)
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -172,21 +189,27 @@ class ProjectExpense(models.Model):
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     date = models.DateField()
     description = models.TextField(blank=True)
-    receipt = models.FileField(upload_to='receipts/', null=True, blank=True)
+    receipt = models.FileField(upload_to='receipts/', storage=stored_files, max_length=255, null=True, blank=True, db_index=True)
     recorded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['project', 'date', 'amount'], name='expense_project_date_idx'),
+            models.Index(fields=['date', 'expense_type', 'amount'], name='expense_date_type_idx'),
+        ]
+
     def __str__(self):
         return f"{self.get_expense_type_display()} for {self.project.name}"
 
 
 
 
-class ProjectPhoto(models.Model):
+class ProjectPhoto(PhotoDerivatives):
     """
     Represents a single photo uploaded for a project on a specific day.
     """
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='photos')
-    image = models.ImageField(upload_to='project_photos/')
+    image = models.ImageField(upload_to='project_photos/', db_index=True)
     caption = models.CharField(max_length=255, blank=True)
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -194,6 +217,9 @@ class ProjectPhoto(models.Model):
 
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['project', '-date', '-created_at', '-id'], name='projectphoto_gallery_idx'),
+        ]
 
     def __str__(self):
         return f"Photo for {self.project.name} on {self.date}"
\ No newline at end of file
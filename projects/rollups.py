@@ -0,0 +1,119 @@
+"""
+Deferred, coalesced recalculation of the Project rollup fields
+(``actual_cost`` and ``progress``).
+
+Signals only mark a project as dirty. The recalculation runs once per
+project when the surrounding database transaction commits (or straight
+away in autocommit mode), and can be suspended entirely for bulk imports
+with ``deferred_project_rollups()``. ``rebuild_project_rollups()``
+recalculates every project from scratch, e.g. after a bulk fix-up made
+with ``update()`` or raw SQL, which sends no signals.
+"""
+import threading
+from contextlib import contextmanager
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+_state = threading.local()
+
+COST = 'cost'
+PROGRESS = 'progress'
+
+
+def _dirty():
+    if not hasattr(_state, 'dirty'):
+        _state.dirty = {}
+        _state.suspended = 0
+    return _state.dirty
+
+
+def mark_project_dirty(project_id, *rollups):
+    """
+    Marks a project's rollups (COST and/or PROGRESS, both by default) as
+    needing recalculation and schedules a flush for when it is safe to run.
+    """
+    if not project_id:
+        return
+    _dirty().setdefault(project_id, set()).update(rollups or (COST, PROGRESS))
+    if not _state.suspended:
+        transaction.on_commit(flush_project_rollups)
+
+
+def flush_project_rollups():
+    """
+    Recalculates every dirty project with one grouped query per source
+    table, then writes each project's new values.
+    """
+    dirty = _dirty()
+    if not dirty:
+        return
+    pending, _state.dirty = dirty, {}
+
+    from projects.models import Project, ProjectExpense, Task
+    from workers.models import WorkerAttendance
+
+    cost_ids = [pk for pk, rollups in pending.items() if COST in rollups]
+    progress_ids = [pk for pk, rollups in pending.items() if PROGRESS in rollups]
+    updates = {pk: {} for pk in pending}
+
+    if cost_ids:
+        expense_totals = dict(
+            ProjectExpense.objects.filter(project_id__in=cost_ids)
+            .values('project_id').annotate(total=Sum('amount')).order_by()
+            .values_list('project_id', 'total')
+        )
+        wage_totals = dict(
+            WorkerAttendance.objects.filter(project_id__in=cost_ids)
+            .values('project_id').annotate(total=Sum('total_wage')).order_by()
+            .values_list('project_id', 'total')
+        )
+        for pk in cost_ids:
+            updates[pk]['actual_cost'] = (expense_totals.get(pk) or 0) + (wage_totals.get(pk) or 0)
+
+    if progress_ids:
+        task_counts = {
+            row['project_id']: row
+            for row in Task.objects.filter(project_id__in=progress_ids)
+            .values('project_id').annotate(
+                total=Count('id'),
+                completed=Count('id', filter=Q(status='completed')),
+            ).order_by()
+        }
+        for pk in progress_ids:
+            counts = task_counts.get(pk)
+            updates[pk]['progress'] = int((counts['completed'] / counts['total']) * 100) if counts else 0
+
+    with transaction.atomic():
+        for pk, fields in updates.items():
+            Project.objects.filter(pk=pk).update(**fields)
+
+
+@contextmanager
+def deferred_project_rollups():
+    """
+    Suspends rollup recalculation for the duration of the block (e.g. a bulk
+    attendance import) and flushes every project touched once it exits.
+    Nested blocks flush only when the outermost one exits.
+    """
+    _dirty()
+    _state.suspended += 1
+    try:
+        yield
+    finally:
+        _state.suspended -= 1
+        if not _state.suspended and _state.dirty:
+            transaction.on_commit(flush_project_rollups)
+
+
+def rebuild_project_rollups(batch_size=500):
+    """
+    Recalculates both rollups of every project, ``batch_size`` projects per
+    flush. Returns the number of projects recalculated.
+    """
+    from projects.models import Project
+
+    ids = list(Project.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), batch_size):
+        _dirty().update({pk: {COST, PROGRESS} for pk in ids[start:start + batch_size]})
+        flush_project_rollups()
+    return len(ids)
@@ -1,52 +1,55 @@
-from django.apps import AppConfig
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import ProjectExpense,Task
+from .models import ProjectExpense, ProjectPhoto, Task, TaskPhoto
+from .rollups import mark_project_dirty, COST, PROGRESS
+from .thumbnails import delete_derivatives, schedule_derivatives
 from workers.models import WorkerAttendance
 
 
+@receiver(pre_save, sender=ProjectExpense)
+@receiver(pre_save, sender=WorkerAttendance)
+def snapshot_cost_cell_before_save(sender, instance, raw=False, **kwargs):
+    """
+    Remembers which project and date an existing row belonged to, so moving
+    an expense or attendance to another project or day also refreshes the
+    totals it was previously counted in.
+    """
+    instance._previous_cost_cell = None
+    if instance.pk and not raw:
+        instance._previous_cost_cell = sender.objects.filter(pk=instance.pk).values_list('project_id', 'date').first()
+
 @receiver([post_save, post_delete], sender=Task)
 def update_project_progress_on_task_change(sender, instance, **kwargs):
     """
-    When a Task is saved or deleted, this signal triggers the progress
+    When a Task is saved or deleted, this signal schedules the progress
     recalculation on its parent Project.
     """
-    if instance.project:
-        instance.project.update_progress()
+    mark_project_dirty(instance.project_id, PROGRESS)
 
 @receiver([post_save, post_delete], sender=ProjectExpense)
-def update_project_cost_on_expense_change(sender, instance, **kwargs):
-    """
-    When a ProjectExpense is saved or deleted, this signal triggers the
-    actual_cost recalculation on its parent Project.
-    """
-    if instance.project:
-        instance.project.update_actual_cost()
-
 @receiver([post_save, post_delete], sender=WorkerAttendance)
-def update_project_cost_on_attendance_change(sender, instance, **kwargs):
+def update_project_cost_on_cost_change(sender, instance, **kwargs):
     """
-    When a WorkerAttendance record is saved or deleted, this signal triggers
-    the actual_cost recalculation on its related Project.
+    When a ProjectExpense or WorkerAttendance record is saved or deleted,
+    this signal schedules the actual_cost recalculation on its Project.
+    Repeated changes to the same project are coalesced into one rollup.
     """
-    if instance.project:
-        instance.project.update_actual_cost()
-
+    mark_project_dirty(instance.project_id, COST)
+    previous_cell = getattr(instance, '_previous_cost_cell', None)
+    if previous_cell and previous_cell[0] != instance.project_id:
+        mark_project_dirty(previous_cell[0], COST)
 
-
-class ProjectsConfig(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'projects'
-
-    def ready(self):
-        import projects.signals
-
-
-
-@receiver([post_save, post_delete], sender=ProjectExpense)
-def update_project_cost_on_expense_change(sender, instance, **kwargs):
+@receiver(post_save, sender=ProjectPhoto)
+@receiver(post_save, sender=TaskPhoto)
+def queue_photo_derivatives(sender, instance, created, raw=False, **kwargs):
     """
-    Updates the project's actual_cost whenever an expense is saved or deleted.
+    Queues the thumbnail and preview of a new (or not yet processed) photo
+    for the background pool, so the upload request returns straight away.
     """
-    if instance.project:
-        instance.project.update_actual_cost()
+    if not raw and instance.image and (created or instance.width is None):
+        schedule_derivatives(instance)
+
+@receiver(post_delete, sender=ProjectPhoto)
+@receiver(post_delete, sender=TaskPhoto)
+def remove_photo_derivatives(sender, instance, **kwargs):
+    delete_derivatives(instance)
@@ -0,0 +1,16 @@
+from celery import shared_task
+from accounts.jobs import track
+from . import rollups, thumbnails
+
+
+@shared_task
+def generate_photo_derivatives(model_label, pk):
+    """Writes the thumbnail and preview of a ProjectPhoto or TaskPhoto."""
+    thumbnails.generate_for(model_label, pk)
+
+
+@shared_task
+def rebuild_project_rollups(job_id):
+    """Recalculates every project's actual cost and progress."""
+    with track(job_id) as job:
+        job.result = f"Recalculated {rollups.rebuild_project_rollups()} project(s)."
@@ -0,0 +1,11 @@
+from django import template
+
+register = template.Library()
+
+@register.filter(name='photo_url')
+def photo_url(photo, size='thumb'):
+    """
+    URL of a resized copy of a ProjectPhoto or TaskPhoto ('thumb' or 'medium').
+    Usage in template: <img src="{{ photo|photo_url:'thumb' }}">
+    """
+    return photo.derivative_url(size)
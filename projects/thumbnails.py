@@ -0,0 +1,147 @@
+"""
+Resized copies of project and task photos.
+
+Each photo gets a small thumbnail for gallery grids and a medium preview
+for viewing, saved next to the original under ``derivatives/`` as WebP
+(JPEG when Pillow lacks WebP support). EXIF orientation is applied first,
+so phone photos are the right way up, and the oriented dimensions are
+stored on the photo; they are only stored once every size has been
+written, so a photo with a width has its derivatives and pages build their
+URLs without asking the storage. Uploads queue a background job
+(projects.tasks.generate_photo_derivatives) once the upload commits; a
+photo without a width when a page asks for it is queued again and the
+original is served meanwhile. The shared cache remembers which photos are
+queued, so a busy gallery does not queue the same photo repeatedly, and
+for a while which failed, so a broken original is not retried on every view.
+Pages never generate copies inline: in eager mode (no worker) they are
+left to the upload and to ``manage.py generate_photo_derivatives``, which
+also replaces copies deleted from the storage.
+"""
+import logging
+import os
+import re
+from io import BytesIO
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+# Longest edge, in pixels, of each derivative size.
+SIZES = {'thumb': 400, 'medium': 1280}
+
+FORMAT, EXTENSION = ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+_DERIVATIVE_NAME = re.compile(rf'^derivatives/(?P<root>.+)_(?:{"|".join(SIZES)})\.{EXTENSION}$')
+
+# How long a photo counts as queued; a lost job is queued again after this.
+QUEUED_TIMEOUT = 10 * 60
+
+# How long a photo whose derivatives could not be made stays marked as
+# queued, so galleries do not retry a broken or missing original on every view.
+FAILED_TIMEOUT = 60 * 60
+
+
+def derivative_name(image_name, size):
+    root, _ = os.path.splitext(image_name)
+    return f'derivatives/{root}_{size}.{EXTENSION}'
+
+
+def source_root(name):
+    """The original's name without its extension, if ``name`` is a derivative name, else None."""
+    match = _DERIVATIVE_NAME.match(name)
+    return match['root'] if match else None
+
+
+def derivative_url(photo, size):
+    """
+    URL of the photo's resized copy. If the copies have not been made yet
+    they are queued for generation and the original's URL is returned
+    instead.
+    """
+    if size not in SIZES:
+        raise ValueError(f"Unknown photo size '{size}'. Choose from: {', '.join(SIZES)}.")
+    if not photo.image:
+        return ''
+    if photo.width is not None:
+        return photo.image.storage.url(derivative_name(photo.image.name, size))
+    if not settings.CELERY_TASK_ALWAYS_EAGER:
+        schedule_derivatives(photo)
+    return photo.image.url
+
+
+def generate_derivatives(photo):
+    """Writes every size of the photo's derivatives and stores its oriented dimensions."""
+    storage = photo.image.storage
+    with photo.image.open('rb') as f:
+        with Image.open(f) as original:
+            image = ImageOps.exif_transpose(original)
+            image.load()
+    width, height = image.size
+    if FORMAT == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    for size, edge in SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        resized.save(buffer, FORMAT, quality=80)
+        name = derivative_name(photo.image.name, size)
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(buffer.getvalue()))
+
+    # update() skips the post_save handler that queues this work.
+    type(photo).objects.filter(pk=photo.pk).update(width=width, height=height)
+    photo.width, photo.height = width, height
+
+
+def delete_derivatives(photo):
+    if not photo.image:
+        return
+    for size in SIZES:
+        name = derivative_name(photo.image.name, size)
+        if photo.image.storage.exists(name):
+            photo.image.storage.delete(name)
+
+
+def _queued_key(model_label, pk):
+    return f'photo-derivatives:{model_label}:{pk}'
+
+
+def generate_for(model_label, pk):
+    """
+    Generates the derivatives of a photo by model label and pk; used by the
+    background task. A photo that fails, or whose original is missing,
+    stays marked as queued for FAILED_TIMEOUT.
+    """
+    key = _queued_key(model_label, pk)
+    try:
+        photo = apps.get_model(model_label).objects.filter(pk=pk).first()
+        if not (photo and photo.image):
+            cache.set(key, True, FAILED_TIMEOUT)
+            return
+        generate_derivatives(photo)
+    except Exception:
+        logger.exception("Could not generate derivatives for %s #%s", model_label, pk)
+        cache.set(key, True, FAILED_TIMEOUT)
+    else:
+        cache.delete(key)
+
+
+def _submit(model_label, pk):
+    from .tasks import generate_photo_derivatives
+    if cache.add(_queued_key(model_label, pk), True, QUEUED_TIMEOUT):
+        generate_photo_derivatives.delay(model_label, pk)
+
+
+def schedule_derivatives(photo):
+    """
+    Queues derivative generation for the photo once the current transaction
+    commits, unless it is already queued.
+    """
+    key = (photo._meta.label, photo.pk)
+    transaction.on_commit(lambda: _submit(*key))
@@ -13,6 +13,7 @@ urlpatterns = [
     path('tasks/<int:pk>/', views.task_detail_view, name='task_detail'),
     path('<int:project_id>/expenses/create/', views.expense_create_view, name='expense_create_for_project'),
     path('<int:pk>/photos/', views.project_photos_view, name='project_photos'),
+    path('<int:pk>/photos/page/', views.project_photos_page_view, name='project_photos_page'),
     path('tasks/<int:pk>/update-notes/', views.task_update_notes_view, name='task_update_notes'),
     path('documents/<int:pk>/delete/', views.document_delete_view, name='document_delete'),
     path('<int:project_pk>/expenses/', views.expense_list_view, name='expense_list'),
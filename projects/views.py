@@ -4,7 +4,9 @@ from django.contrib import messages
 from .models import Project, ProjectExpense, Task, ProjectDocument
 from .forms import ProjectForm, ProjectExpenseForm, TaskForm,TaskPhotoForm, TaskUpdateForm, ProjectPhotoForm, ProjectDocumentForm
 from accounts.views import is_admin_or_owner, can_manage_projects, can_add_attendance
-from django.db.models import Sum, Count
+from django.db.models import Sum, Count, Q
+from django.http import JsonResponse
+from datetime import date, datetime
 from django.urls import reverse 
 
 @login_required
@@ -268,11 +270,38 @@ def expense_list_view(request, project_pk):
     }
     return render(request, 'projects/expense_list.html', context)
 
+PHOTO_PAGE_SIZE = 48
+
+def _photo_page(project, after=None):
+    """
+    One page of a project's photos, newest day first, by keyset on
+    (date, created_at, pk). ``after`` is the cursor returned with the
+    previous page; returns (photos, next cursor or None).
+    """
+    photos = project.photos.select_related('uploaded_by')
+    if after:
+        after_date, after_created, after_pk = after.split('_')
+        after_date, after_created, after_pk = date.fromisoformat(after_date), datetime.fromisoformat(after_created), int(after_pk)
+        photos = photos.filter(
+            Q(date__lt=after_date)
+            | Q(date=after_date, created_at__lt=after_created)
+            | Q(date=after_date, created_at=after_created, pk__lt=after_pk)
+        )
+    page = list(photos.order_by('-date', '-created_at', '-pk')[:PHOTO_PAGE_SIZE + 1])
+    next_cursor = None
+    if len(page) > PHOTO_PAGE_SIZE:
+        page = page[:PHOTO_PAGE_SIZE]
+        last = page[-1]
+        next_cursor = f"{last.date.isoformat()}_{last.created_at.isoformat()}_{last.pk}"
+    return page, next_cursor
+
 @login_required
 @user_passes_test(can_add_attendance)
 def project_photos_view(request, pk):
     """
-    Displays a gallery of photos for a project and handles new uploads.
+    Displays the first page of a project's photo gallery, grouped by day,
+    and handles new uploads. Later pages load from project_photos_page_view
+    as the user scrolls.
     """
     project = get_object_or_404(Project, pk=pk)
     
@@ -288,14 +317,44 @@ def project_photos_view(request, pk):
     else:
         form = ProjectPhotoForm()
 
-    photos = project.photos.all()
+    photos, next_cursor = _photo_page(project)
     context = {
         'project': project,
         'photos': photos,
+        'next_cursor': next_cursor,
         'form': form,
     }
     return render(request, 'projects/project_photos.html', context)
 
+@login_required
+@user_passes_test(can_add_attendance)
+def project_photos_page_view(request, pk):
+    """
+    JSON page of a project's gallery: photos grouped by day with their
+    thumbnail and preview URLs, and the cursor for the next page.
+    """
+    project = get_object_or_404(Project, pk=pk)
+    try:
+        photos, next_cursor = _photo_page(project, request.GET.get('after'))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+
+    days = []
+    for photo in photos:
+        if not days or days[-1]['date'] != photo.date.isoformat():
+            days.append({'date': photo.date.isoformat(), 'label': photo.date.strftime('%d %b %Y'), 'photos': []})
+        days[-1]['photos'].append({
+            'id': photo.pk,
+            'thumb': photo.derivative_url('thumb'),
+            'medium': photo.derivative_url('medium'),
+            'original': photo.image.url,
+            'caption': photo.caption,
+            'uploaded_by': photo.uploaded_by.username if photo.uploaded_by else '',
+            'width': photo.width,
+            'height': photo.height,
+        })
+    return JsonResponse({'days': days, 'next': next_cursor})
+
 @login_required
 @user_passes_test(is_admin_or_owner)
 def document_delete_view(request, pk):
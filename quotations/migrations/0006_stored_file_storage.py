@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:14
+
+import accounts.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotations', '0005_alter_quotation_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='quotationfile',
+            name='file',
+            field=models.FileField(max_length=255, storage=accounts.storage.ContentAddressedStorage(), upload_to='quotations/'),
+        ),
+    ]
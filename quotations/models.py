@@ -1,6 +1,8 @@
+import os
 from django.db import models
 from django.conf import settings
 from django.urls import reverse
+from accounts.storage import stored_files
 
 class Quotation(models.Model):
     """
@@ -50,7 +52,7 @@ class QuotationFile(models.Model):
     A file (original or revision) associated with a Quotation.
     """
     quotation = models.ForeignKey(Quotation, on_delete=models.CASCADE, related_name='files')
-    file = models.FileField(upload_to='quotations/')
+    file = models.FileField(upload_to='quotations/', storage=stored_files, max_length=255, db_index=True)
     caption = models.CharField(max_length=255, blank=True, help_text="e.g., 'Revision 1', 'Original Quote'")
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -61,3 +63,7 @@ class QuotationFile(models.Model):
     def __str__(self):
         return f"File for {self.quotation.title} ({self.id})"
 
+    @property
+    def filename(self):
+        return os.path.basename(self.file.name)
+
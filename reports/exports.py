@@ -0,0 +1,170 @@
+"""
+Streaming spreadsheet exports for attendance, expenses and the ledger.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` so a
+multi-year export never holds the whole queryset in memory. CSV is
+streamed straight to the response; XLSX is written by xlsxwriter in
+constant-memory mode to a temporary file, which is then streamed out.
+Large exports can instead be written to a file by a background job
+(reports.tasks.build_export) and downloaded from the job page.
+"""
+import csv
+import io
+import tempfile
+from collections import namedtuple
+from datetime import date, datetime, time
+from decimal import Decimal
+from django.http import FileResponse, StreamingHttpResponse
+import xlsxwriter
+from accounts.models import JournalEntry, Transaction
+from projects.models import ProjectExpense
+from workers.models import WorkerAttendance
+
+CHUNK_SIZE = 2000
+
+# ``date_field`` is the lookup used for the start/end date filters and the
+# export order; ``filters`` maps accepted GET parameters to lookups.
+Dataset = namedtuple('Dataset', ['title', 'queryset', 'date_field', 'filters', 'columns'])
+
+DATASETS = {
+    'attendance': Dataset(
+        'Attendance', WorkerAttendance.objects, 'date',
+        {'worker': 'worker_id', 'project': 'project_id', 'group': 'worker__group_id'},
+        [
+            ('Date', 'date'), ('Worker', 'worker__name'), ('Worker Type', 'worker__worker_type'),
+            ('Group', 'worker__group__name'), ('Project', 'project__name'), ('In Time', 'in_time'),
+            ('Out Time', 'out_time'), ('Holiday', 'is_holiday'), ('Hours Worked', 'hours_worked'),
+            ('Overtime Hours', 'overtime_hours'), ('Total Wage', 'total_wage'), ('Paid', 'is_paid'),
+            ('Notes', 'notes'),
+        ],
+    ),
+    'expenses': Dataset(
+        'Expenses', ProjectExpense.objects, 'date',
+        {'project': 'project_id', 'supplier': 'supplier_id', 'type': 'expense_type'},
+        [
+            ('Date', 'date'), ('Project', 'project__name'), ('Expense Type', 'expense_type'),
+            ('Supplier', 'supplier__name'), ('Amount', 'amount'), ('Description', 'description'),
+            ('Recorded By', 'recorded_by__username'),
+        ],
+    ),
+    'transactions': Dataset(
+        'Transactions', Transaction.objects, 'date',
+        {'account': 'account_id', 'project': 'project_id', 'type': 'transaction_type'},
+        [
+            ('Date', 'date'), ('Account', 'account__name'), ('Type', 'transaction_type'),
+            ('Amount', 'amount'), ('Description', 'description'), ('Project', 'project__name'),
+            ('Created By', 'created_by__username'),
+        ],
+    ),
+    'journal': Dataset(
+        'Journal Entries', JournalEntry.objects, 'journal__date',
+        {'account': 'account_id', 'project': 'journal__project_id', 'voucher_type': 'journal__voucher_type'},
+        [
+            ('Date', 'journal__date'), ('Journal #', 'journal_id'), ('Voucher Type', 'journal__voucher_type'),
+            ('Description', 'journal__description'), ('Account', 'account__name'),
+            ('Debit', 'debit'), ('Credit', 'credit'), ('Project', 'journal__project__name'),
+        ],
+    ),
+}
+
+
+def _param(params, name, parse, expected):
+    """Parses a GET parameter, raising a ValueError that names it if it is malformed."""
+    try:
+        return parse(params[name])
+    except ValueError:
+        raise ValueError(f"'{name}' must be {expected}, not '{params[name]}'.") from None
+
+
+def export_rows(dataset, params):
+    """
+    Returns a lazy iterator of value tuples for the dataset, filtered by the
+    ``start_date``/``end_date`` and dataset-specific GET parameters. Raises
+    ValueError naming the parameter if a date or record id is malformed.
+    """
+    queryset = dataset.queryset.all()
+    if params.get('start_date'):
+        start = _param(params, 'start_date', date.fromisoformat, 'a date in YYYY-MM-DD format')
+        queryset = queryset.filter(**{f'{dataset.date_field}__gte': start})
+    if params.get('end_date'):
+        end = _param(params, 'end_date', date.fromisoformat, 'a date in YYYY-MM-DD format')
+        queryset = queryset.filter(**{f'{dataset.date_field}__lte': end})
+    for param, lookup in dataset.filters.items():
+        if params.get(param):
+            value = _param(params, param, int, 'a record id') if lookup.endswith('_id') else params[param]
+            queryset = queryset.filter(**{lookup: value})
+    fields = [field for _, field in dataset.columns]
+    return queryset.order_by(dataset.date_field, 'pk').values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+def export_filename(dataset_name):
+    return f"uForce_{dataset_name}_{date.today().isoformat()}"
+
+
+class _Echo:
+    """A file-like object whose write() hands the line back to the caller."""
+    def write(self, value):
+        return value
+
+
+def csv_response(dataset, rows, filename):
+    writer = csv.writer(_Echo())
+
+    def stream():
+        yield writer.writerow([header for header, _ in dataset.columns])
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def write_csv(dataset, rows, output):
+    """Writes the header and rows as UTF-8 CSV to a binary file and returns the row count."""
+    text = io.TextIOWrapper(output, encoding='utf-8', newline='')
+    writer = csv.writer(text)
+    writer.writerow([header for header, _ in dataset.columns])
+    count = 0
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+    text.flush()
+    text.detach()
+    return count
+
+
+def write_xlsx(dataset, rows, output):
+    """Writes the header and rows as a worksheet to a binary file and returns the row count."""
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'in_memory': False})
+    worksheet = workbook.add_worksheet(dataset.title[:31])
+    bold = workbook.add_format({'bold': True})
+    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+    time_format = workbook.add_format({'num_format': 'hh:mm'})
+
+    # constant_memory mode requires writing strictly row by row
+    worksheet.write_row(0, 0, [header for header, _ in dataset.columns], bold)
+    row_index = 0
+    for row_index, row in enumerate(rows, start=1):
+        for col_index, value in enumerate(row):
+            if isinstance(value, Decimal):
+                worksheet.write_number(row_index, col_index, float(value))
+            elif isinstance(value, date):
+                worksheet.write_datetime(row_index, col_index, datetime.combine(value, time()), date_format)
+            elif isinstance(value, time):
+                worksheet.write_datetime(row_index, col_index, value, time_format)
+            elif value is None:
+                worksheet.write_blank(row_index, col_index, None)
+            else:
+                worksheet.write(row_index, col_index, value)
+    workbook.close()
+    return row_index
+
+
+def xlsx_response(dataset, rows, filename):
+    output = tempfile.TemporaryFile()
+    write_xlsx(dataset, rows, output)
+    output.seek(0)
+    return FileResponse(
+        output, as_attachment=True, filename=f'{filename}.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
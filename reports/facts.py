@@ -0,0 +1,108 @@
+"""
+Maintenance of the DailyProjectCost fact table.
+
+Writes to ProjectExpense and WorkerAttendance mark the (project, date)
+cells they touch; each dirty cell is re-aggregated from the source tables
+once the surrounding transaction commits. ``rebuild_daily_costs`` does the
+same for a whole date range. Both bump the versions of the days they
+rewrite, which invalidates the cached period summaries in reports.periods.
+"""
+import threading
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Q, Sum
+from .models import DailyProjectCost
+from .periods import bump_days
+
+_state = threading.local()
+
+
+def _dirty():
+    if not hasattr(_state, 'cells'):
+        _state.cells = set()
+    return _state.cells
+
+
+def mark_cost_cell_dirty(project_id, day):
+    """Schedules the (project, day) cell for re-aggregation at commit."""
+    if not project_id or not day:
+        return
+    _dirty().add((project_id, day))
+    transaction.on_commit(flush_daily_costs)
+
+
+def aggregate_daily_costs(expenses, attendances, model=DailyProjectCost):
+    """
+    Groups the given ProjectExpense and WorkerAttendance querysets into
+    unsaved DailyProjectCost rows keyed by (project_id, date, category).
+    ``model`` lets migrations pass their historical model class.
+    """
+    rows = {}
+    for item in expenses.values('project_id', 'date', 'expense_type').annotate(total=Sum('amount')).order_by():
+        key = (item['project_id'], item['date'], item['expense_type'])
+        rows[key] = model(
+            project_id=item['project_id'], date=item['date'], category=item['expense_type'],
+            expense_total=item['total'] or 0,
+        )
+    for item in attendances.values('project_id', 'date').annotate(
+        wages=Sum('total_wage'), hours=Sum('hours_worked'), overtime=Sum('overtime_hours')
+    ).order_by():
+        key = (item['project_id'], item['date'], DailyProjectCost.WAGES)
+        rows[key] = model(
+            project_id=item['project_id'], date=item['date'], category=DailyProjectCost.WAGES,
+            wage_total=item['wages'] or 0, hours_worked=item['hours'] or 0, overtime_hours=item['overtime'] or 0,
+        )
+    return rows
+
+
+def flush_daily_costs(chunk_size=200):
+    """
+    Re-aggregates every dirty cell with one grouped query per source table
+    for each chunk of cells.
+    """
+    cells = _dirty()
+    if not cells:
+        return
+    pending, _state.cells = sorted(cells), set()
+
+    from projects.models import ProjectExpense
+    from workers.models import WorkerAttendance
+
+    with transaction.atomic():
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            cell_filter = reduce(or_, (Q(project_id=project_id, date=day) for project_id, day in chunk))
+            rows = aggregate_daily_costs(
+                ProjectExpense.objects.filter(cell_filter),
+                WorkerAttendance.objects.filter(cell_filter),
+            )
+            DailyProjectCost.objects.filter(cell_filter).delete()
+            DailyProjectCost.objects.bulk_create(rows.values())
+    bump_days({day for _, day in pending})
+
+
+def rebuild_daily_costs(start=None, end=None, batch_size=1000):
+    """
+    Replaces the fact rows between ``start`` and ``end`` (inclusive, either
+    may be open) with fresh aggregates and returns (deleted, created).
+    """
+    from projects.models import ProjectExpense
+    from workers.models import WorkerAttendance
+
+    date_filter = {}
+    if start:
+        date_filter['date__gte'] = start
+    if end:
+        date_filter['date__lte'] = end
+
+    rows = aggregate_daily_costs(
+        ProjectExpense.objects.filter(**date_filter),
+        WorkerAttendance.objects.filter(**date_filter),
+    )
+    with transaction.atomic():
+        days = set(DailyProjectCost.objects.filter(**date_filter).values_list('date', flat=True).distinct())
+        deleted, _ = DailyProjectCost.objects.filter(**date_filter).delete()
+        DailyProjectCost.objects.bulk_create(rows.values(), batch_size=batch_size)
+        bump_days(days | {day for _, day, _ in rows})
+    return deleted, len(rows)
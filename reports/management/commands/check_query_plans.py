@@ -0,0 +1,81 @@
+import re
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth
+from accounts.models import Transaction
+from projects.models import ProjectExpense
+from workers.models import WorkerAttendance
+
+# Tables that must be reached through an index by every query below.
+WATCHED_TABLES = {
+    WorkerAttendance._meta.db_table, ProjectExpense._meta.db_table, Transaction._meta.db_table,
+}
+
+# SQLite prints "SCAN <table>" without "USING ... INDEX" for a full scan; PostgreSQL prints "Seq Scan on <table>".
+FULL_SCAN_PATTERNS = [re.compile(r'\bSCAN (\w+)(?! USING)(?:\s|$)'), re.compile(r'Seq Scan on (\w+)')]
+
+
+def hot_queries(today):
+    """The report, payable and dashboard queries the indexes were designed for."""
+    month_ago, year_ago = today - timedelta(days=30), today - timedelta(days=365)
+    return {
+        'unpaid outsourced wages': WorkerAttendance.objects.filter(
+            is_paid=False, worker__worker_type='outsourced',
+        ).values('worker__group_id').annotate(total=Sum('total_wage')),
+        'worker attendance range': WorkerAttendance.objects.filter(worker_id=1, date__range=(month_ago, today)),
+        'project wages by date': WorkerAttendance.objects.filter(
+            project_id=1, date__range=(month_ago, today),
+        ).values('date').annotate(total=Sum('total_wage')),
+        'daily wages': WorkerAttendance.objects.filter(date__range=(month_ago, today)).values('date').annotate(total=Sum('total_wage')),
+        'project expenses by date': ProjectExpense.objects.filter(
+            project_id=1, date__range=(month_ago, today),
+        ).values('date').annotate(total=Sum('amount')),
+        'expenses by type': ProjectExpense.objects.filter(
+            date__range=(month_ago, today),
+        ).values('expense_type').annotate(total=Sum('amount')),
+        'dashboard chart': Transaction.objects.filter(date__gte=today - timedelta(days=180)).annotate(
+            month=TruncMonth('date'),
+        ).values('month').annotate(
+            income=Sum('amount', filter=Q(transaction_type='credit')),
+            expenses=Sum('amount', filter=Q(transaction_type='debit')),
+        ),
+        'balances since period close': Transaction.objects.filter(
+            date__gt=year_ago, date__lte=today,
+        ).values('account_id').annotate(total=Sum('amount')),
+        'account statement': Transaction.objects.filter(account_id=1, date__range=(year_ago, today)).order_by('date'),
+    }
+
+
+class Command(BaseCommand):
+    help = "Runs EXPLAIN on the hot report and dashboard queries and fails if any of them fully scans attendance, expenses or transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every query plan, not just the failing ones.")
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f"Query plans can only be checked on SQLite or PostgreSQL, not {connection.vendor}.")
+
+        failures = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Small development tables make sequential scans the cheapest plan; ask what the indexes
+                # allow. SET LOCAL ends with this transaction, so later queries are planned normally.
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            for name, queryset in hot_queries(date.today()).items():
+                plan = queryset.explain()
+                scanned = {table for pattern in FULL_SCAN_PATTERNS for table in pattern.findall(plan)} & WATCHED_TABLES
+                if scanned:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f"{name}: full scan of {', '.join(sorted(scanned))}"))
+                    self.stdout.write(plan)
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"{name}: uses an index"))
+                    if options['verbose_plans']:
+                        self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot quer{'y' if len(failures) == 1 else 'ies'} fell back to a full table scan.")
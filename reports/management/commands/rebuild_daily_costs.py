@@ -0,0 +1,19 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from reports.facts import rebuild_daily_costs
+
+class Command(BaseCommand):
+    help = "Rebuilds the DailyProjectCost fact table from ProjectExpense and WorkerAttendance."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help="First date to rebuild (YYYY-MM-DD). Defaults to the beginning.")
+        parser.add_argument('--end', type=date.fromisoformat, help="Last date to rebuild (YYYY-MM-DD). Defaults to the latest record.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start, end = options['start'], options['end']
+        if start and end and start > end:
+            raise CommandError("--start must be on or before --end.")
+
+        deleted, created = rebuild_daily_costs(start, end, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Replaced {deleted} daily cost row(s) with {created}."))
@@ -0,0 +1,147 @@
+import json
+import statistics
+import time
+from datetime import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from accounts.models import Account, CustomUser, Invoice
+from projects.models import Project
+from quotations.models import Quotation
+from workers.models import OutsourcedGroup, Worker
+
+
+def first_pk(model, **filters):
+    return model.objects.filter(**filters).order_by('pk').values_list('pk', flat=True).first()
+
+
+def benchmark_pages():
+    """
+    (label, url) for every read-only page worth timing. Detail pages use
+    the first matching row, so they are skipped on an empty database.
+    """
+    project, worker = first_pk(Project), first_pk(Worker)
+    group, invoice = first_pk(OutsourcedGroup), first_pk(Invoice)
+    account, quotation = first_pk(Account), first_pk(Quotation)
+    pages = [
+        ('dashboard', reverse('dashboard')),
+        ('payables', reverse('payable_list')),
+        ('reports', reverse('reports_dashboard')),
+        ('balance sheet', reverse('balance_sheet')),
+        ('trial balance', reverse('trial_balance')),
+        ('project list', reverse('project_list')),
+        ('worker list', reverse('worker_list')),
+        ('attendance list', reverse('attendance_list')),
+        ('invoice list', reverse('invoice_list')),
+        ('journal list', reverse('journal_list')),
+        ('account list', reverse('account_list')),
+        ('material list', reverse('material_list')),
+        ('quotation list', reverse('quotation_list')),
+        ('search', reverse('search') + '?q=bench supplier'),
+        ('daily report', reverse('daily_report')),
+        ('weekly report', reverse('weekly_report')),
+        ('monthly report', reverse('monthly_report')),
+        ('payslips', reverse('payslip_list')),
+    ]
+    if project:
+        pages += [('project detail', reverse('project_detail', args=[project])), ('project expenses', reverse('expense_list', args=[project]))]
+    if worker:
+        pages.append(('worker detail', reverse('worker_attendance_detail', args=[worker])))
+    if group:
+        pages.append(('group payments', reverse('group_payment_detail', args=[group])))
+    if invoice:
+        pages.append(('invoice detail', reverse('invoice_detail', args=[invoice])))
+    if account:
+        pages.append(('general ledger', reverse('general_ledger', args=[account])))
+    if quotation:
+        pages.append(('quotation detail', reverse('quotation_detail', args=[quotation])))
+    return pages
+
+
+class Command(BaseCommand):
+    help = (
+        "Requests every main page through the test client as an admin user and records status, "
+        "latency and query counts to a JSON file, optionally comparing against an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='benchmark.json', help="Where to write the results (default: benchmark.json).")
+        parser.add_argument('--compare', help="An earlier results file to compare against.")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed requests per page after the first (cold) one.")
+        parser.add_argument('--user', default='bench_admin', help="Username to request the pages as.")
+        parser.add_argument('--page', action='append', dest='pages', help="Only benchmark pages with this label (repeatable).")
+
+    def handle(self, *args, **options):
+        user = CustomUser.objects.filter(username=options['user']).first()
+        if not user:
+            raise CommandError(f"No user '{options['user']}'. Run seed_benchmark_data first or pass --user.")
+
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        pages = benchmark_pages()
+        if options['pages']:
+            pages = [(label, url) for label, url in pages if label in options['pages']]
+
+        results = {}
+        # DEBUG keeps every query in memory; the context managers below count them instead.
+        with override_settings(DEBUG=False):
+            for label, url in pages:
+                results[label] = self.measure(client, url, options['repeat'])
+                result = results[label]
+                style = self.style.SUCCESS if result['status'] == 200 else self.style.ERROR
+                self.stdout.write(style(
+                    f"{label:<18} {result['status']}  cold {result['cold_ms']:>8.1f} ms  "
+                    f"median {result['median_ms']:>8.1f} ms  {result['queries']:>4} queries"
+                ))
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)['pages']
+            self.compare(results, baseline)
+
+        with open(options['output'], 'w') as f:
+            json.dump({
+                'recorded_at': datetime.now().isoformat(timespec='seconds'),
+                'database': settings.DATABASES['default']['ENGINE'],
+                'repeat': options['repeat'],
+                'pages': results,
+            }, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} page result(s) to {options['output']}."))
+
+    def measure(self, client, url, repeat):
+        """Times one cold request and ``repeat`` warm ones, counting the queries of the last."""
+        timings = []
+        for _ in range(repeat + 1):
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                if hasattr(response, 'streaming_content'):
+                    b''.join(response.streaming_content)
+                timings.append((time.perf_counter() - started) * 1000)
+        return {
+            'url': url,
+            'status': response.status_code,
+            'cold_ms': round(timings[0], 1),
+            'median_ms': round(statistics.median(timings[1:] or timings), 1),
+            'max_ms': round(max(timings[1:] or timings), 1),
+            'queries': len(queries),
+            'sql_ms': round(sum(float(query['time']) for query in queries.captured_queries) * 1000, 1),
+        }
+
+    def compare(self, results, baseline):
+        self.stdout.write("\nChange against baseline (median latency, queries):")
+        for label, result in results.items():
+            before = baseline.get(label)
+            if not before:
+                self.stdout.write(f"{label:<18} new page")
+                continue
+            latency = result['median_ms'] - before['median_ms']
+            queries = result['queries'] - before['queries']
+            percent = (latency / before['median_ms'] * 100) if before['median_ms'] else 0
+            style = self.style.ERROR if percent > 20 or queries > 0 else self.style.SUCCESS
+            self.stdout.write(style(f"{label:<18} {latency:+8.1f} ms ({percent:+.0f}%)  {queries:+d} queries"))
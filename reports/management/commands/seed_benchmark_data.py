@@ -0,0 +1,316 @@
+import random
+from datetime import date, time, timedelta
+from decimal import Decimal
+from itertools import islice
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from accounts.dashboard import SOURCES, bump_dashboard_sources
+from accounts.models import (
+    Account, CustomUser, Invoice, InvoicePayment, Journal, JournalEntry, Material, Supplier, Transaction,
+)
+from projects.models import Project, ProjectExpense, Task
+from projects.rollups import deferred_project_rollups, mark_project_dirty
+from quotations.models import Quotation, QuotationFile
+from workers.models import OutsourcedGroup, Worker, WorkerAttendance
+
+PREFIX = 'Bench'
+
+# Row counts at --scale 1. Attendance is workers x days x ATTENDANCE_RATE, about 3M with the defaults.
+VOLUMES = {
+    'supervisors': 20, 'foremen': 40, 'suppliers': 300, 'materials': 500,
+    'projects': 500, 'tasks_per_project': 10, 'groups': 80, 'workers': 2000,
+    'expenses': 500_000, 'transactions': 1_000_000, 'journals': 200_000,
+    'invoices': 10_000, 'quotations': 3_000,
+}
+ATTENDANCE_RATE = 0.9
+OWN_WORKER_SHARE = 0.3
+
+ACCOUNTS = [
+    ('Bank', 'asset'), ('Cash', 'asset'), ('Receivables', 'receivable'), ('Payables', 'liability'),
+    ('Loan', 'liability'), ('Capital', 'equity'), ('Contract Revenue', 'income'), ('Materials Expense', 'expense'),
+    ('Wages Expense', 'expense'), ('Rent Expense', 'expense'), ('Fuel Expense', 'expense'), ('Food Expense', 'expense'),
+]
+IN_TIMES = [time(6, 30), time(7), time(7, 30), time(8)]
+OUT_TIMES = [time(15), time(16), time(17), time(18), time(19), time(20)]
+
+
+def money(rng, low, high):
+    return Decimal(rng.randint(low * 100, high * 100)) / 100
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the database with a deterministic, production-sized data set for benchmarking "
+        "(about 3M attendance rows, 500k expenses and 1M transactions at --scale 1). "
+        "Run it against an empty or throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help="Random seed; the same seed and options give the same data.")
+        parser.add_argument('--scale', type=float, default=1.0, help="Multiplier for every volume, e.g. 0.01 for a quick run.")
+        parser.add_argument('--days', type=int, default=1667, help="Days of history to generate.")
+        parser.add_argument('--end-date', type=date.fromisoformat, default=None, help="Last day of history (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows per bulk_create.")
+
+    def handle(self, *args, **options):
+        if Project.objects.filter(name__startswith=f'{PREFIX} ').exists():
+            raise CommandError("Benchmark data already exists. Seed a fresh database instead.")
+
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.end = options['end_date'] or date.today()
+        self.start = self.end - timedelta(days=options['days'] - 1)
+        self.counts = {name: max(1, round(count * options['scale'])) for name, count in VOLUMES.items()}
+
+        with deferred_project_rollups():
+            self.seed_people_and_reference_data()
+            self.seed_projects()
+            self.seed_workers()
+            self.seed_attendance()
+            self.seed_expenses()
+            self.seed_transactions()
+            self.seed_journals()
+            self.seed_invoices()
+            self.seed_quotations()
+            for pk in self.projects:
+                mark_project_dirty(pk)
+
+        # bulk_create skips signals, so rebuild everything the signals maintain.
+        self.stdout.write("Rebuilding derived data...")
+        call_command('reconcile_balances', fix=True, stdout=self.stdout)
+        call_command('rebuild_daily_costs', stdout=self.stdout)
+        call_command('build_ledger_snapshots', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        bump_dashboard_sources(*SOURCES)
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded benchmark data for {self.start} to {self.end}. Log in as '{PREFIX.lower()}_admin' with password '{PREFIX.lower()}'."
+        ))
+
+    # --- helpers ---
+
+    def bulk_insert(self, model, rows):
+        """Inserts a generator of unsaved instances in chunks and returns how many were written."""
+        total = 0
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            with transaction.atomic():
+                model.objects.bulk_create(chunk, batch_size=self.chunk_size)
+            total += len(chunk)
+        self.stdout.write(f"  {model._meta.verbose_name_plural}: {total}")
+        return total
+
+    def random_date(self, start=None):
+        start = start or self.start
+        return start + timedelta(days=self.rng.randrange((self.end - start).days + 1))
+
+    # --- generators ---
+
+    def seed_people_and_reference_data(self):
+        rng, password = self.rng, make_password(PREFIX.lower())
+        users = [CustomUser(username=f'{PREFIX.lower()}_admin', role='admin', password=password, is_staff=True)]
+        users += [CustomUser(username=f'{PREFIX.lower()}_supervisor_{i:03d}', role='supervisor', password=password) for i in range(self.counts['supervisors'])]
+        users += [CustomUser(username=f'{PREFIX.lower()}_foreman_{i:03d}', role='foreman', password=password) for i in range(self.counts['foremen'])]
+        self.bulk_insert(CustomUser, iter(users))
+        users = CustomUser.objects.filter(username__startswith=f'{PREFIX.lower()}_')
+        self.admin = users.get(role='admin')
+        self.supervisors = list(users.filter(role='supervisor').order_by('pk').values_list('pk', flat=True))
+        self.foremen = list(users.filter(role='foreman').order_by('pk').values_list('pk', flat=True))
+
+        self.bulk_insert(Account, iter([Account(name=f'{PREFIX} {name}', account_type=kind) for name, kind in ACCOUNTS]))
+        self.account_ids = list(Account.objects.filter(name__startswith=f'{PREFIX} ').order_by('pk').values_list('pk', flat=True))
+
+        categories = [key for key, _ in Supplier.SUPPLIER_TYPES]
+        self.bulk_insert(Supplier, (
+            Supplier(name=f'{PREFIX} Supplier {i:04d}', category=rng.choice(categories)) for i in range(self.counts['suppliers'])
+        ))
+        self.suppliers_by_category = {}
+        for pk, category in Supplier.objects.filter(name__startswith=f'{PREFIX} ').values_list('pk', 'category').order_by('pk'):
+            self.suppliers_by_category.setdefault(category, []).append(pk)
+
+        units = ['piece', 'kg', 'meter', 'bag', 'litre']
+        materials = []
+        for i in range(self.counts['materials']):
+            initial = Decimal(rng.randint(10, 5000))
+            materials.append(Material(
+                name=f'{PREFIX} Material {i:04d}', unit=rng.choice(units), initial_quantity=initial,
+                quantity_on_hand=initial - Decimal(rng.randint(0, int(initial))), price_per_unit=money(rng, 1, 500),
+                low_stock_threshold=Decimal(rng.randint(0, 50)),
+            ))
+        self.bulk_insert(Material, iter(materials))
+
+    def seed_projects(self):
+        rng = self.rng
+        statuses = ['active'] * 6 + ['completed'] * 3 + ['on_hold']
+        priorities = [key for key, _ in Project.PRIORITY_CHOICES]
+
+        def project(i):
+            start = self.random_date()
+            return Project(
+                name=f'{PREFIX} Project {i:04d}', start_date=start, end_date=start + timedelta(days=rng.randint(60, 720)),
+                budget=money(rng, 50_000, 5_000_000), supervisor_id=rng.choice(self.supervisors),
+                client_company=f'Client {rng.randint(1, 200):03d}', priority=rng.choice(priorities), status=rng.choice(statuses),
+            )
+        self.bulk_insert(Project, (project(i) for i in range(self.counts['projects'])))
+        self.projects = list(Project.objects.filter(name__startswith=f'{PREFIX} ').order_by('pk').values_list('pk', flat=True))
+
+        task_statuses = [key for key, _ in Task.STATUS_CHOICES]
+
+        def task(project_id, n):
+            start = self.random_date()
+            return Task(
+                project_id=project_id, title=f'Task {n + 1}', start_date=start,
+                due_date=start + timedelta(days=rng.randint(3, 60)), status=rng.choice(task_statuses),
+            )
+        self.bulk_insert(Task, (task(project_id, n) for project_id in self.projects for n in range(self.counts['tasks_per_project'])))
+
+    def seed_workers(self):
+        rng = self.rng
+        self.bulk_insert(OutsourcedGroup, iter([OutsourcedGroup(name=f'{PREFIX} Group {i:03d}') for i in range(self.counts['groups'])]))
+        groups = list(OutsourcedGroup.objects.filter(name__startswith=f'{PREFIX} ').order_by('pk').values_list('pk', flat=True))
+
+        workers = []
+        for i in range(self.counts['workers']):
+            if rng.random() < OWN_WORKER_SHARE:
+                workers.append(Worker(
+                    name=f'{PREFIX} Worker {i:05d}', worker_type='own', fixed_wage=money(rng, 1500, 4000),
+                    ot1_rate=money(rng, 8, 15), ot2_rate=money(rng, 12, 20),
+                    dob=date(rng.randint(1965, 2003), rng.randint(1, 12), rng.randint(1, 28)),
+                ))
+            else:
+                workers.append(Worker(
+                    name=f'{PREFIX} Worker {i:05d}', worker_type='outsourced', group_id=rng.choice(groups),
+                    daily_wage=money(rng, 80, 200), ot1_rate=money(rng, 10, 20), ot2_rate=money(rng, 15, 25),
+                ))
+        self.bulk_insert(Worker, iter(workers))
+        self.workers = list(Worker.objects.filter(name__startswith=f'{PREFIX} ').order_by('pk'))
+
+    def attendance_rows(self):
+        rng, wages = self.rng, {}
+        paid_through = self.end - timedelta(days=30)
+        days = (self.end - self.start).days + 1
+        for worker in self.workers:
+            project_id = rng.choice(self.projects)
+            for offset in range(days):
+                # Workers move to another site every couple of months on average.
+                if rng.random() < 1 / 60:
+                    project_id = rng.choice(self.projects)
+                if rng.random() >= ATTENDANCE_RATE:
+                    continue
+                day = self.start + timedelta(days=offset)
+                in_time, out_time = rng.choice(IN_TIMES), rng.choice(OUT_TIMES)
+                is_holiday = day.weekday() == 4 and rng.random() < 0.3
+                key = (worker.pk, in_time, out_time, is_holiday)
+                if key not in wages:
+                    sample = WorkerAttendance(worker=worker, date=day, in_time=in_time, out_time=out_time, is_holiday=is_holiday)
+                    sample.calculate_hours_and_wage()
+                    wages[key] = tuple(value.quantize(Decimal('0.01')) for value in (sample.hours_worked, sample.overtime_hours, sample.total_wage))
+                hours_worked, overtime_hours, total_wage = wages[key]
+                yield WorkerAttendance(
+                    worker_id=worker.pk, project_id=project_id, date=day, in_time=in_time, out_time=out_time,
+                    is_holiday=is_holiday, is_paid=day <= paid_through and rng.random() < 0.97,
+                    hours_worked=hours_worked, overtime_hours=overtime_hours, total_wage=total_wage,
+                    recorded_by_id=rng.choice(self.foremen),
+                )
+
+    def seed_attendance(self):
+        self.bulk_insert(WorkerAttendance, self.attendance_rows())
+
+    def seed_expenses(self):
+        rng = self.rng
+        types = [key for key, _ in ProjectExpense.EXPENSE_TYPES]
+
+        def expense():
+            kind = rng.choice(types)
+            return ProjectExpense(
+                project_id=rng.choice(self.projects), expense_type=kind,
+                supplier_id=rng.choice(self.suppliers_by_category.get(kind) or [None]),
+                amount=money(rng, 20, 20_000), date=self.random_date(), recorded_by_id=rng.choice(self.supervisors),
+            )
+        self.bulk_insert(ProjectExpense, (expense() for _ in range(self.counts['expenses'])))
+
+    def seed_transactions(self):
+        rng = self.rng
+        self.bulk_insert(Transaction, (
+            Transaction(
+                account_id=rng.choice(self.account_ids), transaction_type=rng.choice(['debit', 'credit']),
+                amount=money(rng, 10, 50_000), date=self.random_date(), description=f'Benchmark transaction {i}',
+                project_id=rng.choice(self.projects) if rng.random() < 0.6 else None, created_by_id=self.admin.pk,
+            )
+            for i in range(self.counts['transactions'])
+        ))
+
+    def seed_journals(self):
+        rng = self.rng
+        voucher_types = [key for key, _ in Journal.VOUCHER_TYPES]
+        remaining, total = self.counts['journals'], 0
+        while remaining:
+            size = min(remaining, self.chunk_size)
+            with transaction.atomic():
+                journals = Journal.objects.bulk_create([
+                    Journal(
+                        date=self.random_date(), description=f'Benchmark voucher {total + n}', voucher_type=rng.choice(voucher_types),
+                        project_id=rng.choice(self.projects) if rng.random() < 0.5 else None, created_by_id=self.admin.pk,
+                    )
+                    for n in range(size)
+                ])
+                entries = []
+                for journal in journals:
+                    debit_account, credit_account = rng.sample(self.account_ids, 2)
+                    amount = money(rng, 10, 50_000)
+                    entries += [
+                        JournalEntry(journal_id=journal.pk, account_id=debit_account, debit=amount),
+                        JournalEntry(journal_id=journal.pk, account_id=credit_account, credit=amount),
+                    ]
+                JournalEntry.objects.bulk_create(entries, batch_size=self.chunk_size)
+            remaining, total = remaining - size, total + size
+        self.stdout.write(f"  journals: {total}")
+
+    def seed_invoices(self):
+        rng = self.rng
+
+        def invoice(i):
+            issued = self.random_date()
+            return Invoice(
+                project_id=rng.choice(self.projects), title=f'Running bill {i + 1}', issue_date=issued,
+                due_date=issued + timedelta(days=30), total_amount=money(rng, 5_000, 500_000),
+            )
+        self.bulk_insert(Invoice, (invoice(i) for i in range(self.counts['invoices'])))
+
+        def payments():
+            for pk, issued, total in Invoice.objects.filter(project_id__in=self.projects).order_by('pk').values_list('pk', 'issue_date', 'total_amount'):
+                remaining = total
+                for _ in range(rng.choice([0, 1, 1, 2, 3])):
+                    amount = min(remaining, money(rng, 1_000, int(total)))
+                    if amount <= 0:
+                        break
+                    remaining -= amount
+                    yield InvoicePayment(
+                        invoice_id=pk, amount=amount, payment_date=min(self.end, issued + timedelta(days=rng.randint(5, 90))),
+                        created_by_id=self.admin.pk,
+                    )
+        self.bulk_insert(InvoicePayment, payments())
+
+    def seed_quotations(self):
+        rng = self.rng
+        statuses = [key for key, _ in Quotation.STATUS_CHOICES]
+        self.bulk_insert(Quotation, (
+            Quotation(title=f'{PREFIX} Quotation {i:05d}', client_name=f'Client {rng.randint(1, 200):03d}', status=rng.choice(statuses), uploaded_by_id=self.admin.pk)
+            for i in range(self.counts['quotations'])
+        ))
+        quotations = list(Quotation.objects.filter(title__startswith=f'{PREFIX} ').order_by('pk').values_list('pk', 'status'))
+        self.bulk_insert(QuotationFile, (
+            QuotationFile(
+                quotation_id=pk, file=f'quotations/{PREFIX.lower()}/{pk}_r{revision}.pdf',
+                caption='Original Quote' if revision == 0 else f'Revision {revision}', uploaded_by_id=self.admin.pk,
+            )
+            for pk, _ in quotations for revision in range(rng.randint(1, 4))
+        ))
+
+        # Approved quotations point at their latest revision.
+        latest = dict(QuotationFile.objects.filter(quotation_id__in=[pk for pk, status in quotations if status == 'approved']).order_by('pk').values_list('quotation_id', 'pk'))
+        approved = [Quotation(pk=pk, approved_file_id=file_pk) for pk, file_pk in latest.items()]
+        Quotation.objects.bulk_update(approved, ['approved_file'], batch_size=self.chunk_size)
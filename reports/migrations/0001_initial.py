@@ -0,0 +1,47 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_daily_costs(apps, schema_editor):
+    from reports.facts import aggregate_daily_costs
+    DailyProjectCost = apps.get_model('reports', 'DailyProjectCost')
+    rows = aggregate_daily_costs(
+        apps.get_model('projects', 'ProjectExpense').objects.all(),
+        apps.get_model('workers', 'WorkerAttendance').objects.all(),
+        model=DailyProjectCost,
+    )
+    DailyProjectCost.objects.bulk_create(rows.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('projects', '0004_projectexpense_supplier_and_more'),
+        ('workers', '0002_worker_dob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProjectCost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('category', models.CharField(max_length=50)),
+                ('expense_total', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('wage_total', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('hours_worked', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('overtime_hours', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_costs', to='projects.project')),
+            ],
+            options={
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['date', 'project'], name='reports_dai_date_2d8f16_idx')],
+                'unique_together': {('project', 'date', 'category')},
+            },
+        ),
+        migrations.RunPython(populate_daily_costs, migrations.RunPython.noop),
+    ]
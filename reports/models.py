@@ -1,3 +1,33 @@
 from django.db import models
 
-# Create your models here.
+
+class DailyProjectCost(models.Model):
+    """
+    Pre-aggregated project cost per day and category, maintained from the
+    ProjectExpense and WorkerAttendance save/delete paths so the reports
+    read a few hundred rows instead of scanning the source tables.
+
+    Expense rows use the ProjectExpense.expense_type as their category;
+    wages, hours and overtime are stored under the WAGES category.
+    """
+    WAGES = 'wages'
+
+    project = models.ForeignKey('projects.Project', on_delete=models.CASCADE, related_name='daily_costs')
+    date = models.DateField()
+    category = models.CharField(max_length=50)
+    expense_total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    wage_total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    hours_worked = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    overtime_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ['project', 'date', 'category']
+        indexes = [models.Index(fields=['date', 'project'])]
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.project_id} {self.date} {self.category}"
+
+    @property
+    def total_cost(self):
+        return self.expense_total + self.wage_total
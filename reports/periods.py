@@ -0,0 +1,155 @@
+"""
+Cost summaries for a day, ISO week or month.
+
+A summary is built from the DailyProjectCost fact table, which already
+holds expense totals per category and wages, hours and overtime per
+project and day, so any period is one query rolled up in Python. Results
+are cached per (period, project filter) under a key made from a version
+stamp of every day in the period. Re-aggregating a fact cell bumps only
+its day's version, so an edit recomputes the periods containing that day
+and closed past periods are served from the cache indefinitely.
+"""
+import calendar
+import hashlib
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import DailyProjectCost
+
+ZERO = Decimal('0')
+
+PERIOD_KINDS = ('day', 'week', 'month')
+
+# The days reports can be asked for, so every period has a previous and a next one.
+FIRST_DAY, LAST_DAY = date(1, 2, 1), date(9999, 11, 30)
+
+
+class Period(namedtuple('Period', ['kind', 'start', 'end'])):
+    """An inclusive date range that is one day, one ISO week (Monday to Sunday) or one month."""
+
+    @classmethod
+    def containing(cls, kind, day):
+        if kind == 'day':
+            return cls(kind, day, day)
+        if kind == 'week':
+            start = day - timedelta(days=day.weekday())
+            return cls(kind, start, start + timedelta(days=6))
+        if kind == 'month':
+            start = day.replace(day=1)
+            return cls(kind, start, start.replace(day=calendar.monthrange(day.year, day.month)[1]))
+        raise ValueError(f"Unknown period '{kind}'. Choose from: {', '.join(PERIOD_KINDS)}.")
+
+    @classmethod
+    def reportable(cls, kind, day):
+        """The period containing ``day``, which must lie between FIRST_DAY and LAST_DAY."""
+        if not FIRST_DAY <= day <= LAST_DAY:
+            raise ValueError(f"Reports cover dates from {FIRST_DAY.isoformat()} to {LAST_DAY.isoformat()}.")
+        return cls.containing(kind, day)
+
+    @property
+    def days(self):
+        return [self.start + timedelta(days=offset) for offset in range((self.end - self.start).days + 1)]
+
+    @property
+    def label(self):
+        if self.kind == 'day':
+            return f"{self.start:%A, %d %b %Y}"
+        if self.kind == 'week':
+            year, week, _ = self.start.isocalendar()
+            return f"Week {week}, {year} ({self.start:%d %b} - {self.end:%d %b %Y})"
+        return f"{self.start:%B %Y}"
+
+    @property
+    def previous(self):
+        return Period.containing(self.kind, self.start - timedelta(days=1))
+
+    @property
+    def next(self):
+        return Period.containing(self.kind, self.end + timedelta(days=1))
+
+    @property
+    def is_closed(self):
+        """Whether the whole period lies in the past."""
+        return self.end < date.today()
+
+
+def _version_key(day):
+    return f'reports:period-version:{day.isoformat()}'
+
+
+def bump_days(days):
+    """
+    Invalidates every cached summary of a period containing one of the
+    days. Runs after the surrounding transaction commits, like the
+    dashboard's version bumps.
+    """
+    keys = {_version_key(day) for day in days}
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, time.time_ns()), None))
+
+
+def _summary_key(period, project_ids):
+    keys = [_version_key(day) for day in period.days]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # A version the cache evicted gets a fresh one, so no summary stored under the old stamp can match.
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    stamp = ':'.join(str(versions[key]) for key in keys)
+    projects = 'all' if project_ids is None else ','.join(str(pk) for pk in sorted(project_ids))
+    digest = hashlib.sha1(f'{stamp}|{projects}'.encode()).hexdigest()
+    return f'reports:period:{period.kind}:{period.start.isoformat()}:{digest}'
+
+
+def _blank():
+    return {'expenses': ZERO, 'wages': ZERO, 'hours': ZERO, 'overtime': ZERO}
+
+
+def summarize(period, project_ids=None):
+    """
+    Expense, wage, hour and overtime totals of the period, overall and by
+    category, day and project. ``project_ids`` limits it to those projects;
+    None means every project.
+    """
+    key = _summary_key(period, project_ids)
+    summary = cache.get(key)
+    if summary is None:
+        summary = _compute(period, project_ids)
+        cache.set(key, summary, getattr(settings, 'REPORT_PERIOD_CACHE_TIMEOUT', None))
+    return summary
+
+
+def _compute(period, project_ids):
+    costs = DailyProjectCost.objects.filter(date__range=(period.start, period.end))
+    if project_ids is not None:
+        costs = costs.filter(project_id__in=project_ids)
+
+    totals, by_category = _blank(), {}
+    by_day = {day: _blank() for day in period.days}
+    by_project = {}
+    rows = costs.values_list('project_id', 'date', 'category', 'expense_total', 'wage_total', 'hours_worked', 'overtime_hours')
+    for project_id, day, category, expenses, wages, hours, overtime in rows.order_by():
+        if category != DailyProjectCost.WAGES:
+            by_category[category] = by_category.get(category, ZERO) + expenses
+        for bucket in (totals, by_day[day], by_project.setdefault(project_id, _blank())):
+            bucket['expenses'] += expenses
+            bucket['wages'] += wages
+            bucket['hours'] += hours
+            bucket['overtime'] += overtime
+
+    for bucket in [totals, *by_day.values(), *by_project.values()]:
+        bucket['total'] = bucket['expenses'] + bucket['wages']
+    return {
+        'totals': totals,
+        'by_category': sorted(by_category.items(), key=lambda item: item[1], reverse=True),
+        'by_day': [dict(bucket, date=day) for day, bucket in by_day.items()],
+        'by_project': sorted(
+            (dict(bucket, project_id=project_id) for project_id, bucket in by_project.items()),
+            key=lambda bucket: bucket['total'], reverse=True,
+        ),
+    }
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from projects.models import ProjectExpense
+from workers.models import WorkerAttendance
+from .facts import mark_cost_cell_dirty
+
+
+@receiver([post_save, post_delete], sender=ProjectExpense)
+@receiver([post_save, post_delete], sender=WorkerAttendance)
+def refresh_daily_cost_on_change(sender, instance, raw=False, **kwargs):
+    """
+    Schedules the DailyProjectCost cell of a changed expense or attendance
+    record for re-aggregation, along with the cell it was moved out of.
+    """
+    if raw:
+        return
+    mark_cost_cell_dirty(instance.project_id, instance.date)
+    previous_cell = getattr(instance, '_previous_cost_cell', None)
+    if previous_cell:
+        mark_cost_cell_dirty(*previous_cell)
@@ -0,0 +1,30 @@
+import tempfile
+from datetime import date
+from celery import shared_task
+from django.core.files import File
+from accounts.jobs import track
+from . import facts
+from .exports import DATASETS, export_filename, export_rows, write_csv, write_xlsx
+
+
+@shared_task
+def build_export(job_id, dataset, params, file_format='csv'):
+    """Writes an export (see exports.DATASETS) to a file attached to the job."""
+    with track(job_id) as job:
+        export = DATASETS[dataset]
+        extension, write = ('xlsx', write_xlsx) if file_format == 'xlsx' else ('csv', write_csv)
+        with tempfile.TemporaryFile() as output:
+            count = write(export, export_rows(export, params), output)
+            output.seek(0)
+            job.file.save(f'{export_filename(dataset)}.{extension}', File(output), save=False)
+        job.result = f"Exported {count} row(s)."
+
+
+@shared_task
+def rebuild_daily_costs(job_id, start=None, end=None):
+    """Rebuilds the DailyProjectCost fact table, optionally for a date range only."""
+    with track(job_id) as job:
+        deleted, created = facts.rebuild_daily_costs(
+            date.fromisoformat(start) if start else None, date.fromisoformat(end) if end else None,
+        )
+        job.result = f"Replaced {deleted} daily cost row(s) with {created}."
@@ -1,3 +1,17 @@
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # A small but representative data set, with planner statistics, so plans are chosen as in production.
+        call_command('seed_benchmark_data', scale=0.002, days=90, stdout=StringIO())
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_hot_queries_use_indexes(self):
+        # check_query_plans raises CommandError if any hot query fully scans a watched table.
+        call_command('check_query_plans', stdout=StringIO())
@@ -4,5 +4,9 @@ from . import views
 urlpatterns = [
     path('', views.expense_analysis_view, name='reports_dashboard'),
     path('expenses/', views.expense_report_view, name='expense_report'),
+    path('daily/', views.daily_report_view, name='daily_report'),
+    path('weekly/', views.weekly_report_view, name='weekly_report'),
+    path('monthly/', views.monthly_report_view, name='monthly_report'),
     path('balance-sheet/', views.balance_sheet_view, name='balance_sheet'),
+    path('export/<str:dataset>/', views.export_view, name='export'),
 ]
@@ -1,14 +1,26 @@
-from django.shortcuts import render
-from django.contrib.auth.decorators import login_required
+from django.shortcuts import render, redirect
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.contrib import messages
+from django.http import Http404, HttpResponseBadRequest
+from accounts.views import is_admin_or_owner, can_manage_projects
 from projects.models import Project, ProjectExpense
 from workers.models import WorkerAttendance
-from accounts.models import Account
+from accounts.models import Account, PeriodClose
+from accounts.closing import balances_as_of
+from accounts.ledger import on_normal_side
+from accounts.jobs import enqueue
+from .models import DailyProjectCost
+from .exports import DATASETS, export_filename, export_rows, csv_response, xlsx_response
+from .tasks import build_export
+from .periods import Period, summarize
+from accounts.pdf import company_data, pdf_response
 from django.db.models import Sum, Q, F
 from django.db.models.functions import TruncMonth, TruncWeek, TruncDay
 from datetime import datetime, timedelta
 from calendar import month_name
 from collections import defaultdict
 from datetime import date, timedelta
+from decimal import Decimal
 import json
 
 @login_required
@@ -33,41 +45,38 @@ def expense_analysis_view(request):
     start_date = date.fromisoformat(start_date_str)
     end_date = date.fromisoformat(end_date_str)
 
-    # Filter the main querysets based on the selected date range
-    expenses = ProjectExpense.objects.filter(date__range=[start_date, end_date])
-    attendances = WorkerAttendance.objects.filter(date__range=[start_date, end_date])
+    # All figures come from the pre-aggregated DailyProjectCost fact table
+    costs = DailyProjectCost.objects.filter(date__range=[start_date, end_date])
 
     # --- Chart Data Calculation ---
-    daily_expenses_qs = expenses.values('date').annotate(total=Sum('amount')).order_by('date')
-    daily_wages_qs = attendances.values('date').annotate(total=Sum('total_wage')).order_by('date')
+    daily_totals = {
+        item['date']: item
+        for item in costs.values('date').annotate(expenses=Sum('expense_total'), wages=Sum('wage_total')).order_by()
+    }
 
-    # Combine data in Python for a continuous chart
-    chart_data = defaultdict(lambda: {'expenses': 0, 'wages': 0})
+    # Walk the range so the chart is continuous even on days without costs
+    sorted_chart_data = []
     current_date = start_date
     while current_date <= end_date:
-        chart_data[current_date.strftime('%b %d')] # Ensure all dates in range are present
+        item = daily_totals.get(current_date, {})
+        sorted_chart_data.append((current_date.strftime('%b %d'), {
+            'expenses': float(item.get('expenses') or 0),
+            'wages': float(item.get('wages') or 0),
+        }))
         current_date += timedelta(days=1)
 
-    for item in daily_expenses_qs:
-        chart_data[item['date'].strftime('%b %d')]['expenses'] = float(item['total'])
-    for item in daily_wages_qs:
-        chart_data[item['date'].strftime('%b %d')]['wages'] = float(item['total'])
-    
-    sorted_chart_data = sorted(chart_data.items(), key=lambda x: datetime.strptime(f"{x[0]} {today.year}", "%b %d %Y"))
-
     # --- Top Categories Calculation ---
-    top_categories_qs = expenses.values('expense_type').annotate(total=Sum('amount')).order_by('-total')[:5]
+    top_categories_qs = costs.exclude(category=DailyProjectCost.WAGES).values('category').annotate(total=Sum('expense_total')).order_by('-total')[:5]
     expense_type_map = dict(ProjectExpense.EXPENSE_TYPES)
-    top_categories = [{'name': expense_type_map.get(cat['expense_type']), 'total': cat['total']} for cat in top_categories_qs]
+    top_categories = [{'name': expense_type_map.get(cat['category']), 'total': cat['total']} for cat in top_categories_qs]
 
     # --- Top Projects Calculation (Expenses + Wages) ---
-    project_costs = defaultdict(float)
-    for item in expenses.values('project__name').annotate(total=Sum('amount')):
-        if item['project__name']: project_costs[item['project__name']] += float(item['total'])
-    for item in attendances.values('project__name').annotate(total=Sum('total_wage')):
-        if item['project__name']: project_costs[item['project__name']] += float(item['total'])
-    
-    top_projects = sorted(project_costs.items(), key=lambda x: x[1], reverse=True)[:5]
+    top_projects = [
+        (item['project__name'], float(item['total']))
+        for item in costs.values('project__name').annotate(
+            total=Sum(F('expense_total') + F('wage_total'))
+        ).order_by('-total')[:5]
+    ]
 
     context = {
         'start_date': start_date,
@@ -100,50 +109,45 @@ def expense_report_view(request):
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
 
 
-    # Base Querysets
-    expenses = ProjectExpense.objects.filter(date__range=[start_date, end_date])
-    wages = WorkerAttendance.objects.filter(date__range=[start_date, end_date])
+    # Base Queryset over the pre-aggregated fact table
+    costs = DailyProjectCost.objects.filter(date__range=[start_date, end_date])
+    expense_costs = costs.exclude(category=DailyProjectCost.WAGES)
 
     # Top expense categories
-    top_categories = expenses.values('expense_type').annotate(
-        total=Sum('amount')
-    ).order_by('-total')
+    top_categories = expense_costs.values('category').annotate(
+        total=Sum('expense_total')
+    ).values('total', expense_type=F('category')).order_by('-total')
 
     # Projects with highest expenses
-    expensive_projects = Project.objects.filter(expenses__in=expenses).distinct().annotate(
-        total_project_expenses=Sum('expenses__amount')
+    # Wage rows carry no expense_total, so filtering on it keeps only expense categories
+    expensive_projects = Project.objects.filter(
+        daily_costs__date__range=[start_date, end_date], daily_costs__expense_total__gt=0
+    ).annotate(
+        total_project_expenses=Sum('daily_costs__expense_total')
     ).order_by('-total_project_expenses')[:10]
 
-    # Daily breakdown (optimized)
-    daily_expense_data = expenses.annotate(day=TruncDay('date')).values('day').annotate(total=Sum('amount')).order_by('day')
-    daily_wage_data = wages.annotate(day=TruncDay('date')).values('day').annotate(total=Sum('total_wage')).order_by('day')
-    
+    # Daily breakdown, one grouped query for both series
+    daily_data = costs.values('date').annotate(expenses=Sum('expense_total'), wages=Sum('wage_total')).order_by('date')
+
     # Process for charting
     chart_labels = [(start_date + timedelta(days=i)).strftime('%b %d') for i in range((end_date - start_date).days + 1)]
     chart_expense_values = [0] * len(chart_labels)
     chart_wage_values = [0] * len(chart_labels)
 
-    for item in daily_expense_data:
-        try:
-            idx = (item['day'].date() - start_date).days
-            chart_expense_values[idx] = item['total']
-        except IndexError:
-            pass
+    for item in daily_data:
+        idx = (item['date'] - start_date).days
+        chart_expense_values[idx] = item['expenses']
+        chart_wage_values[idx] = item['wages']
 
-    for item in daily_wage_data:
-        try:
-            idx = (item['day'].date() - start_date).days
-            chart_wage_values[idx] = item['total']
-        except IndexError:
-            pass
+    totals = costs.aggregate(total_expenses=Sum('expense_total', default=0), total_wages=Sum('wage_total', default=0))
 
     context = {
         'start_date': start_date,
         'end_date': end_date,
         'top_categories': top_categories,
         'expensive_projects': expensive_projects,
-        'total_expenses': expenses.aggregate(total=Sum('amount'))['total'] or 0,
-        'total_wages': wages.aggregate(total=Sum('total_wage'))['total'] or 0,
+        'total_expenses': totals['total_expenses'],
+        'total_wages': totals['total_wages'],
         'chart_labels': chart_labels,
         'chart_expense_values': chart_expense_values,
         'chart_wage_values': chart_wage_values,
@@ -153,22 +157,231 @@ def expense_report_view(request):
 
 @login_required
 def balance_sheet_view(request):
-    # This is a simplified balance sheet based on account balances
-    assets = Account.objects.filter(account_type='asset').order_by('name')
-    liabilities = Account.objects.filter(account_type='liability').order_by('name')
-    equity = Account.objects.filter(account_type='equity').order_by('name')
+    """
+    Balance sheet as of a date (?as_of=, default today), built from the
+    nearest period close plus the transactions since, so past dates cost
+    the same as today. Income less expenses is shown as retained earnings.
+    ?format=pdf returns it as a PDF.
+    """
+    try:
+        as_of = date.fromisoformat(request.GET.get('as_of') or date.today().isoformat())
+    except ValueError:
+        return HttpResponseBadRequest("Dates must be in YYYY-MM-DD format.")
 
-    total_assets = assets.aggregate(total=Sum('balance'))['total'] or 0
-    total_liabilities = liabilities.aggregate(total=Sum('balance'))['total'] or 0
-    total_equity = equity.aggregate(total=Sum('balance'))['total'] or 0
+    net_debits = balances_as_of(as_of)
+    sections = defaultdict(list)
+    totals = defaultdict(lambda: Decimal('0.00'))
+    for account in Account.objects.order_by('name'):
+        balance = on_normal_side(account.account_type, net_debits.get(account.pk, 0))
+        section = 'assets' if account.account_type in ('asset', 'receivable') else account.account_type
+        if balance:
+            sections[section].append((account, balance))
+        totals[section] += balance
 
+    retained_earnings = totals['income'] - totals['expense']
+    total_equity = totals['equity'] + retained_earnings
+    close = PeriodClose.objects.filter(period_end__lte=as_of).order_by('-period_end').first()
     context = {
-        'assets': assets,
-        'liabilities': liabilities,
-        'equity': equity,
-        'total_assets': total_assets,
-        'total_liabilities': total_liabilities,
+        'as_of': as_of,
+        'period_close': close,
+        'assets': sections['assets'],
+        'liabilities': sections['liability'],
+        'equity': sections['equity'],
+        'total_assets': totals['assets'],
+        'total_liabilities': totals['liability'],
+        'retained_earnings': retained_earnings,
         'total_equity': total_equity,
-        'total_liabilities_and_equity': total_liabilities + total_equity,
+        'total_liabilities_and_equity': totals['liability'] + total_equity,
     }
+    if request.GET.get('format') == 'pdf':
+        data = dict(context, company=company_data(), period_close=close.period_end if close else None)
+        for section in ('assets', 'liabilities', 'equity'):
+            data[section] = [(account.name, balance) for account, balance in context[section]]
+        return pdf_response(request, 'pdf/balance_sheet.html', data, f'balance-sheet-{as_of}.pdf')
     return render(request, 'reports/balance_sheet.html', context)
+
+
+@login_required
+@user_passes_test(is_admin_or_owner)
+def export_view(request, dataset):
+    """
+    Streams attendance, expenses, transactions or journal entries as CSV
+    (default) or XLSX (?format=xlsx), filtered by start_date/end_date and
+    the dataset's own filters (e.g. ?worker=, ?project=, ?account=). A POST
+    with the same query string prepares the file in a background job instead.
+    """
+    if dataset not in DATASETS:
+        raise Http404("Unknown export.")
+    export = DATASETS[dataset]
+    try:
+        rows = export_rows(export, request.GET)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    file_format = 'xlsx' if request.GET.get('format') == 'xlsx' else 'csv'
+    if request.method == 'POST':
+        enqueue(build_export, f"{export.title} export ({file_format.upper()})", dataset, request.GET.dict(), file_format, user=request.user)
+        messages.success(request, f"The {export.title.lower()} export is being prepared. Download it here when it has finished.")
+        return redirect('job_list')
+
+    filename = export_filename(dataset)
+    if file_format == 'xlsx':
+        return xlsx_response(export, rows, filename)
+    return csv_response(export, rows, filename)
+
+
+def _report_projects(request):
+    """
+    The project ids a period report covers (None for every project) and
+    the projects offered in its filter, limited to those the user can see.
+    """
+    visible = Project.objects.filter_for_user(request.user).order_by('name')
+    choices = list(visible.values_list('pk', 'name'))
+    selected = request.GET.get('project')
+    if selected and selected.isdigit() and int(selected) in dict(choices):
+        return [int(selected)], choices
+    if request.user.role in ['admin', 'owner']:
+        return None, choices
+    return [pk for pk, _ in choices], choices
+
+
+# PDF titles of the period reports by Period.kind.
+REPORT_TITLES = {'day': 'Daily Report', 'week': 'Weekly Report', 'month': 'Monthly Report'}
+
+
+def _report_pdf(request, context):
+    """The period report as a PDF, built from the plain values of its context."""
+    period = context['period']
+    keys = (
+        'total_expenses', 'total_wages', 'total_hours', 'total_overtime', 'grand_total',
+        'expenses_by_category', 'daily_totals', 'project_totals',
+    )
+    data = {key: context[key] for key in keys}
+    data.update({
+        'company': company_data(),
+        'title': REPORT_TITLES[period.kind],
+        'period_label': period.label,
+        'project': dict(context['projects']).get(int(context['selected_project'])) if context['selected_project'].isdigit() else '',
+        'expenses': [
+            {'project': expense.project.name, 'type': expense.get_expense_type_display(), 'description': expense.description, 'amount': expense.amount}
+            for expense in context.get('expenses', ())
+        ],
+        'attendance': [
+            {'worker': record.worker.name, 'project': record.project.name, 'hours': record.hours_worked, 'overtime': record.overtime_hours, 'wage': record.total_wage}
+            for record in context.get('attendance', ())
+        ],
+    })
+    return pdf_response(request, 'pdf/period_report.html', data, f'{period.kind}-report-{period.start}.pdf')
+
+
+def _period_report(request, period, template, **extra):
+    """
+    Renders a day, week or month report from its cached period summary, or
+    with ?format=pdf the same figures as a PDF.
+    """
+    project_ids, project_choices = _report_projects(request)
+    summary = summarize(period, project_ids)
+    totals = summary['totals']
+    expense_type_map = dict(ProjectExpense.EXPENSE_TYPES)
+    project_names = dict(project_choices)
+    if len(project_names) < len(summary['by_project']):
+        project_names.update(Project.objects.filter(pk__in=[row['project_id'] for row in summary['by_project']]).values_list('pk', 'name'))
+
+    context = {
+        'period': period,
+        'projects': project_choices,
+        'selected_project': request.GET.get('project', ''),
+        'total_expenses': totals['expenses'],
+        'total_wages': totals['wages'],
+        'total_hours': totals['hours'],
+        'total_overtime': totals['overtime'],
+        'grand_total': totals['total'],
+        'expenses_by_category': [
+            {
+                'expense_type': expense_type_map.get(category, category),
+                'total': total,
+                'percentage': total / totals['expenses'] * 100 if totals['expenses'] else 0,
+            }
+            for category, total in summary['by_category']
+        ],
+        'daily_totals': summary['by_day'],
+        'project_totals': [dict(row, name=project_names.get(row['project_id'], '')) for row in summary['by_project']],
+        'chart_labels': json.dumps([row['date'].strftime('%a %d') for row in summary['by_day']]),
+        'chart_expense_values': json.dumps([float(row['expenses']) for row in summary['by_day']]),
+        'chart_wage_values': json.dumps([float(row['wages']) for row in summary['by_day']]),
+    }
+    context.update(extra)
+    if request.GET.get('format') == 'pdf':
+        return _report_pdf(request, context)
+    return render(request, template, context)
+
+
+@login_required
+@user_passes_test(can_manage_projects)
+def daily_report_view(request):
+    """
+    Costs of one day (?date=, default today): totals and expenses by
+    category from the period summary, plus that day's expense and
+    attendance records.
+    """
+    try:
+        day = date.fromisoformat(request.GET.get('date') or date.today().isoformat())
+    except ValueError:
+        return HttpResponseBadRequest("Dates must be in YYYY-MM-DD format.")
+    try:
+        period = Period.reportable('day', day)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    project_ids, _ = _report_projects(request)
+    expenses = ProjectExpense.objects.filter(date=day).select_related('project').order_by('project__name', 'pk')
+    attendance = WorkerAttendance.objects.filter(date=day).select_related('worker', 'project').order_by('project__name', 'worker__name')
+    if project_ids is not None:
+        expenses = expenses.filter(project_id__in=project_ids)
+        attendance = attendance.filter(project_id__in=project_ids)
+    return _period_report(
+        request, period, 'reports/daily_report.html',
+        date=day.isoformat(), expenses=expenses, attendance=attendance,
+    )
+
+
+def _iso_week(period):
+    """The period's first day as an HTML week input value, e.g. 2025-W07."""
+    return '%04d-W%02d' % period.start.isocalendar()[:2]
+
+
+@login_required
+@user_passes_test(can_manage_projects)
+def weekly_report_view(request):
+    """ Costs of one ISO week (?week=YYYY-Www, default this week), by category, day and project. """
+    week = request.GET.get('week')
+    try:
+        day = date.fromisocalendar(int(week[:4]), int(week[6:]), 1) if week else date.today()
+    except ValueError:
+        return HttpResponseBadRequest("Weeks must be in YYYY-Www format, e.g. 2025-W07.")
+    try:
+        period = Period.reportable('week', day)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    return _period_report(
+        request, period, 'reports/weekly_report.html',
+        week=_iso_week(period), previous=_iso_week(period.previous), next=_iso_week(period.next),
+    )
+
+
+@login_required
+@user_passes_test(can_manage_projects)
+def monthly_report_view(request):
+    """ Costs of one month (?month=YYYY-MM, default this month), by category, day and project. """
+    month = request.GET.get('month')
+    try:
+        day = date.fromisoformat(f'{month}-01') if month else date.today()
+    except ValueError:
+        return HttpResponseBadRequest("Months must be in YYYY-MM format.")
+    try:
+        period = Period.reportable('month', day)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    return _period_report(
+        request, period, 'reports/monthly_report.html',
+        month=f'{period.start:%Y-%m}', previous=f'{period.previous.start:%Y-%m}', next=f'{period.next.start:%Y-%m}',
+    )
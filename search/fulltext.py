@@ -0,0 +1,104 @@
+"""
+Ranked full-text queries over SearchDocument.
+
+SQLite matches against the FTS5 table and ranks with bm25(); PostgreSQL
+matches the tsvector column and ranks with ts_rank(). Both weight the
+title above the body and match every word of the query as a prefix, so
+"marb cornic" finds "Marble ... Corniche". Other databases fall back to
+a case-insensitive scan. Snippets come back as safe HTML with the
+matched words in <mark>.
+"""
+import re
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from .models import SearchDocument
+
+MAX_TERMS = 8
+
+# Control characters mark the matches, so the rest of the snippet can be escaped.
+_START, _STOP = '\x02', '\x03'
+
+_SQLITE_SQL = f"""
+    SELECT d.kind, d.object_id, d.title, d.project_id,
+           snippet(search_fts, 1, '{_START}', '{_STOP}', '…', 16)
+    FROM search_fts JOIN search_searchdocument d ON d.id = search_fts.rowid
+    WHERE search_fts MATCH %s AND ({{visibility}})
+    ORDER BY bm25(search_fts, 5.0, 1.0)
+    LIMIT %s
+"""
+
+_POSTGRES_SQL = f"""
+    SELECT d.kind, d.object_id, d.title, d.project_id,
+           ts_headline('simple', d.body, query, 'StartSel={_START}, StopSel={_STOP}, MaxWords=20, MinWords=8')
+    FROM search_searchdocument d, to_tsquery('simple', %s) query
+    WHERE d.search_vector @@ query AND ({{visibility}})
+    ORDER BY ts_rank(d.search_vector, query) DESC
+    LIMIT %s
+"""
+
+
+def terms(text):
+    return re.findall(r'\w+', text.lower())[:MAX_TERMS]
+
+
+def _visibility_sql(visible):
+    """
+    SQL restricting documents to ``visible``: {kind: None for every record
+    of that kind, or a Project queryset limiting it to those projects}.
+    """
+    clauses, params = [], []
+    for kind, projects in visible.items():
+        if projects is None:
+            clauses.append('d.kind = %s')
+            params.append(kind)
+        else:
+            project_sql, project_params = projects.values('pk').query.sql_with_params()
+            clauses.append(f'(d.kind = %s AND d.project_id IN ({project_sql}))')
+            params += [kind, *project_params]
+    return ' OR '.join(clauses) or '1 = 0', params
+
+
+def _snippet(text):
+    return mark_safe(escape(text or '').replace(_START, '<mark>').replace(_STOP, '</mark>'))
+
+
+def search(text, visible, limit=50):
+    """
+    The best ``limit`` matches for ``text`` among the visible documents, as
+    dicts of kind, object_id, title, project_id and an HTML snippet.
+    """
+    words = terms(text)
+    if not words or not visible:
+        return []
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        return _scan(words, visible, limit)
+
+    if connection.vendor == 'sqlite':
+        sql, match = _SQLITE_SQL, ' '.join(f'"{word}"*' for word in words)
+    else:
+        sql, match = _POSTGRES_SQL, ' & '.join(f'{word}:*' for word in words)
+    visibility, visibility_params = _visibility_sql(visible)
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(visibility=visibility), [match, *visibility_params, limit])
+        rows = cursor.fetchall()
+    return [
+        {'kind': kind, 'object_id': object_id, 'title': title, 'project_id': project_id, 'snippet': _snippet(snippet)}
+        for kind, object_id, title, project_id, snippet in rows
+    ]
+
+
+def _scan(words, visible, limit):
+    documents = SearchDocument.objects.none()
+    for kind, projects in visible.items():
+        rows = SearchDocument.objects.filter(kind=kind)
+        if projects is not None:
+            rows = rows.filter(project__in=projects)
+        documents |= rows
+    for word in words:
+        documents = documents.filter(Q(title__icontains=word) | Q(body__icontains=word))
+    return [
+        {'kind': kind, 'object_id': object_id, 'title': title, 'project_id': project_id, 'snippet': escape(body[:160])}
+        for kind, object_id, title, project_id, body in documents.values_list('kind', 'object_id', 'title', 'project_id', 'body')[:limit]
+    ]
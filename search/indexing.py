@@ -0,0 +1,101 @@
+"""
+What the search index holds for each indexed model.
+
+Each builder turns a record into the fields of its SearchDocument. The
+builders only read model fields, so migrations can run them on
+historical models.
+"""
+from django.apps import apps
+from django.db import transaction
+
+
+def _text(*parts):
+    return '\n'.join(part for part in parts if part)
+
+
+def project_document(project):
+    return {
+        'title': project.name,
+        'body': _text(project.client_company, project.description, project.client_comments, project.remarks),
+        'project_id': project.pk,
+    }
+
+
+def task_document(task):
+    return {
+        'title': task.title,
+        'body': _text(task.description, task.client_comments, task.completion_notes),
+        'project_id': task.project_id,
+    }
+
+
+def quotation_document(quotation):
+    return {'title': quotation.title, 'body': _text(quotation.client_name, quotation.status_notes), 'project_id': None}
+
+
+def supplier_document(supplier):
+    return {
+        'title': supplier.name,
+        'body': _text(supplier.get_category_display(), supplier.contact_person, supplier.phone, supplier.email),
+        'project_id': None,
+    }
+
+
+def journal_document(journal):
+    return {
+        'title': f"{journal.get_voucher_type_display()} #{journal.pk} on {journal.date}",
+        'body': journal.description,
+        'project_id': journal.project_id,
+    }
+
+
+# Indexed models: label -> (SearchDocument kind, document builder).
+SEARCHABLE = {
+    'projects.Project': ('project', project_document),
+    'projects.Task': ('task', task_document),
+    'quotations.Quotation': ('quotation', quotation_document),
+    'accounts.Supplier': ('supplier', supplier_document),
+    'accounts.Journal': ('journal', journal_document),
+}
+
+
+def build_document(instance):
+    kind, builder = SEARCHABLE[instance._meta.label]
+    fields = builder(instance)
+    fields['title'] = fields['title'][:255]
+    return kind, fields
+
+
+def index(instance):
+    """Adds or refreshes the record's SearchDocument."""
+    from .models import SearchDocument
+    kind, fields = build_document(instance)
+    SearchDocument.objects.update_or_create(kind=kind, object_id=instance.pk, defaults=fields)
+
+
+def unindex(instance):
+    from .models import SearchDocument
+    kind, _ = SEARCHABLE[instance._meta.label]
+    SearchDocument.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+def rebuild(labels=None, get_model=apps.get_model, chunk_size=500):
+    """
+    Replaces the SearchDocuments of the given model labels (all by default)
+    and returns how many were written. Migrations pass their own get_model.
+    """
+    document_model = get_model('search', 'SearchDocument')
+    written = 0
+    with transaction.atomic():
+        for label in labels or SEARCHABLE:
+            kind, _ = SEARCHABLE[label]
+            document_model.objects.filter(kind=kind).delete()
+            batch = []
+            for instance in get_model(*label.split('.')).objects.order_by('pk').iterator(chunk_size=chunk_size):
+                batch.append(document_model(kind=kind, object_id=instance.pk, **build_document(instance)[1]))
+                if len(batch) >= chunk_size:
+                    document_model.objects.bulk_create(batch)
+                    written, batch = written + len(batch), []
+            document_model.objects.bulk_create(batch)
+            written += len(batch)
+    return written
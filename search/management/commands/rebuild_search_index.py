@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from search.indexing import SEARCHABLE, rebuild
+
+class Command(BaseCommand):
+    help = "Rebuilds the search index from projects, tasks, quotations, suppliers and journals, e.g. after bulk imports."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', dest='labels', help=f"Only rebuild this model (repeatable): {', '.join(SEARCHABLE)}.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['labels'] or []) - set(SEARCHABLE)
+        if unknown:
+            raise CommandError(f"Not an indexed model: {', '.join(sorted(unknown))}.")
+        written = rebuild(options['labels'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {written} record(s)."))
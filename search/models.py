@@ -0,0 +1,30 @@
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """
+    The searchable text of one project, task, quotation, supplier or journal.
+
+    The full-text index over ``title`` and ``body`` is kept by the database
+    itself (see migration 0002): an FTS5 table filled by triggers on SQLite,
+    a weighted, generated tsvector column with a GIN index on PostgreSQL.
+    SQLite drops the triggers whenever Django rebuilds this table, so a
+    migration that alters it must create them again.
+    """
+    KIND_CHOICES = (
+        ('project', 'Project'), ('task', 'Task'), ('quotation', 'Quotation'),
+        ('supplier', 'Supplier'), ('journal', 'Journal'),
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    # The project the record belongs to, for filtering results by the user's projects.
+    project = models.ForeignKey('projects.Project', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['kind', 'object_id']
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.title}"
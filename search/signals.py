@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save, post_delete
+from .indexing import SEARCHABLE, index, unindex
+
+def index_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index(instance)
+
+def unindex_on_delete(sender, instance, **kwargs):
+    unindex(instance)
+
+for label in SEARCHABLE:
+    post_save.connect(index_on_save, sender=label, dispatch_uid=f'search_{label}_save')
+    post_delete.connect(unindex_on_delete, sender=label, dispatch_uid=f'search_{label}_delete')
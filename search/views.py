@@ -0,0 +1,55 @@
+import time
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.urls import reverse
+from accounts.views import is_admin_or_owner, can_manage_projects
+from projects.models import Project
+from .fulltext import search
+from .models import SearchDocument
+
+# Who sees each kind of result: (role check, whether it is limited to the user's projects).
+VISIBILITY = {
+    'project': (can_manage_projects, True),
+    'task': (can_manage_projects, True),
+    'quotation': (is_admin_or_owner, False),
+    'supplier': (can_manage_projects, False),
+    'journal': (is_admin_or_owner, False),
+}
+
+# Page each kind of result links to; suppliers have no page of their own.
+RESULT_URLS = {
+    'project': 'project_detail',
+    'task': 'task_detail',
+    'quotation': 'quotation_detail',
+    'journal': 'journal_update',
+}
+
+def visible_kinds(user):
+    """ {kind: None, or the Project queryset its results are limited to} for the kinds the user may see. """
+    projects = None if is_admin_or_owner(user) else Project.objects.filter_for_user(user)
+    return {kind: projects if scoped else None for kind, (check, scoped) in VISIBILITY.items() if check(user)}
+
+@login_required
+def search_view(request):
+    """
+    Ranked full-text search across projects, tasks, quotations, suppliers
+    and journals, limited to what the user's role may see. Returns JSON,
+    with the query time, with ?format=json.
+    """
+    query = request.GET.get('q', '').strip()
+    started = time.perf_counter()
+    results = search(query, visible_kinds(request.user)) if query else []
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    kind_labels = dict(SearchDocument.KIND_CHOICES)
+    for result in results:
+        url_name = RESULT_URLS.get(result['kind'])
+        result['url'] = reverse(url_name, args=[result['object_id']]) if url_name else ''
+        result['kind_label'] = kind_labels[result['kind']]
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'query': query, 'elapsed_ms': round(elapsed_ms, 1), 'results': [
+            {key: result[key] for key in ('kind', 'object_id', 'title', 'url', 'snippet')} for result in results
+        ]})
+    return render(request, 'search/results.html', {'query': query, 'results': results, 'elapsed_ms': elapsed_ms})
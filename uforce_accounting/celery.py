@@ -0,0 +1,24 @@
+"""
+Celery application for background jobs.
+
+Configuration comes from the CELERY_* Django settings. Start a worker
+with ``celery -A uforce_accounting worker``; with the default filesystem
+broker it only needs to run on the same box as the web processes.
+"""
+import os
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'uforce_accounting.settings')
+
+app = Celery('uforce_accounting')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
+
+
+@app.on_after_configure.connect
+def create_queue_folders(sender, **kwargs):
+    """The filesystem broker expects its queue folders to exist already."""
+    options = sender.conf.broker_transport_options or {}
+    for key in ('data_folder_in', 'data_folder_out', 'processed_folder', 'control_folder'):
+        if options.get(key):
+            os.makedirs(options[key], exist_ok=True)
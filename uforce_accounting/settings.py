@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,13 +45,25 @@ INSTALLED_APPS = [
     'expenses',
     'reports',
     'quotations',
+    'search.apps.SearchConfig',
 ]
 
+# Media is only served to users allowed to see its project or quotation
+# (accounts.views.media_view). Once a download is authorised the front-end
+# server can send the file: 'nginx' answers with X-Accel-Redirect to
+# MEDIA_ACCEL_REDIRECT_LOCATION, which nginx must map onto MEDIA_ROOT:
+#     location /protected-media/ { internal; alias /path/to/media/; }
+# 'apache' answers with X-Sendfile (mod_xsendfile). Left empty, Django
+# streams the file itself and honours Range requests.
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE', '')
+MEDIA_ACCEL_REDIRECT_LOCATION = '/protected-media/'
+
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
 X_FRAME_OPTIONS = 'SAMEORIGIN'
 
 MIDDLEWARE = [
+    'accounts.middleware.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,6 +71,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'projects.middleware.ProjectRollupMiddleware',
 ]
 
 ROOT_URLCONF = 'uforce_accounting.urls'
@@ -92,6 +106,33 @@ DATABASES = {
 }
 
 
+# Cache
+# A file-based cache is shared by every worker process on the box, so a
+# dashboard invalidation in one process is seen by all of them. Once full
+# it culls a random third of its entries, so MAX_ENTRIES leaves room for
+# every dashboard tile, report summary and version stamp; a culled version
+# is re-seeded rather than read as zero.
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Rendered PDFs (accounts.pdf), kept apart so a bulk render culls only other PDFs.
+    'pdf': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'pdf',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Upper bound on how long a dashboard tile is cached; tiles are normally
+# invalidated as soon as their source data changes.
+DASHBOARD_CACHE_TIMEOUT = 60 * 60
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -142,6 +183,34 @@ LOGOUT_REDIRECT_URL = 'login'
 WORK_DAYS_PER_MONTH = 26
 STANDARD_WORK_HOURS_PER_DAY = 8
 
+# Query instrumentation (accounts.middleware.QueryStatsMiddleware): the share
+# of requests recorded (0 disables it), the recent requests kept per view and
+# the number of slowest statements kept per view.
+QUERY_STATS_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+QUERY_STATS_WINDOW = 200
+QUERY_STATS_SLOWEST = 5
+
+# Background jobs (uforce_accounting.celery). Any kombu broker URL works,
+# e.g. redis://localhost:6379/0; the default filesystem broker needs no extra
+# service, only a worker on the same box. Jobs stay queued until a worker
+# (celery -A uforce_accounting worker) picks them up, which keeps thumbnails,
+# PDF batches and rebuilds off the request. CELERY_TASK_ALWAYS_EAGER=1 runs
+# each job inline in the process that queued it instead, for development
+# without a worker; it is never on unless asked for, whatever DEBUG says.
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'filesystem://')
+if CELERY_BROKER_URL == 'filesystem://':
+    CELERY_BROKER_TRANSPORT_OPTIONS = {
+        'data_folder_in': str(BASE_DIR / 'var' / 'celery' / 'queue'),
+        'data_folder_out': str(BASE_DIR / 'var' / 'celery' / 'queue'),
+        'processed_folder': str(BASE_DIR / 'var' / 'celery' / 'processed'),
+        'control_folder': str(BASE_DIR / 'var' / 'celery' / 'control'),
+    }
+CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', '0') == '1'
+# Job outcomes are kept on accounts.BackgroundJob, so no result backend is needed.
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_TIMEZONE = TIME_ZONE
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -4,7 +4,6 @@ from django.contrib.auth import views as auth_views
 from accounts import views as account_views
 from accounts.views import dashboard_view
 from django.conf import settings
-from django.conf.urls.static import static
 urlpatterns = [
 
     
@@ -16,8 +15,11 @@ urlpatterns = [
     path('projects/', include('projects.urls')),
     path('reports/', include('reports.urls')),
     path('quotations/', include('quotations.urls')),
+    path('search/', include('search.urls')),
     
 
 ]
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Uploads are served through a permission check in every environment.
+urlpatterns += [
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", account_views.media_view, name='media'),
+]
\ No newline at end of file
@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import Worker, WorkerAttendance, OutsourcedGroup
+from .models import Worker, WorkerAttendance, OutsourcedGroup, WorkerRate
+
+class WorkerRateInline(admin.TabularInline):
+    model = WorkerRate
+    fields = ('effective_from', 'fixed_wage', 'daily_wage', 'ot1_rate', 'ot2_rate', 'created_at')
+    readonly_fields = ('created_at',)
+    extra = 0
 
 @admin.register(Worker)
 class WorkerAdmin(admin.ModelAdmin):
@@ -16,6 +22,7 @@ class WorkerAdmin(admin.ModelAdmin):
     list_filter = ('worker_type', 'is_active', 'group')
     search_fields = ('name', 'contact')
     ordering = ('name',)
+    inlines = [WorkerRateInline]
 
 @admin.register(WorkerAttendance)
 class WorkerAttendanceAdmin(admin.ModelAdmin):
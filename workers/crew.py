@@ -0,0 +1,85 @@
+"""
+Crew-sheet attendance: records a whole crew's attendance for one project
+and date in a single round trip.
+"""
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from projects.rollups import mark_project_dirty, COST
+from reports.facts import mark_cost_cell_dirty
+from accounts.dashboard import bump_dashboard_sources
+from .models import Worker, WorkerAttendance
+from .wages import price
+
+
+def _already_recorded(date, worker_ids):
+    names = WorkerAttendance.objects.filter(date=date, worker_id__in=worker_ids).values_list('worker__name', flat=True)
+    return [f"{name} already has attendance recorded on {date}." for name in names]
+
+
+def record_crew_attendance(project, date, rows, recorded_by, is_holiday=False, batch_size=500):
+    """
+    Validates and inserts one WorkerAttendance per row for the given project
+    and date.
+
+    Each row is a dict with ``worker_id``, ``in_time`` and ``out_time`` and
+    optionally ``is_holiday`` and ``notes``. All workers are loaded in one
+    query, the ``(worker, date)`` uniqueness is checked up front for the
+    whole sheet, wages are priced in one batch, and the rows are
+    written with ``bulk_create`` followed by one project cost rollup and one
+    daily cost refresh.
+    Raises ValidationError listing every problem if any row is invalid.
+    """
+    rows = list(rows)
+    errors = []
+    if not rows:
+        raise ValidationError("Select at least one worker.")
+
+    worker_ids = [row['worker_id'] for row in rows]
+    seen, duplicates = set(), set()
+    for worker_id in worker_ids:
+        (duplicates if worker_id in seen else seen).add(worker_id)
+
+    workers = Worker.objects.in_bulk(seen)
+    for worker_id in sorted(seen - workers.keys()):
+        errors.append(f"Worker #{worker_id} does not exist.")
+    for worker_id in sorted(duplicates & workers.keys()):
+        errors.append(f"{workers[worker_id].name} appears more than once on the sheet.")
+    for worker in workers.values():
+        if not worker.is_active:
+            errors.append(f"{worker.name} is not an active worker.")
+
+    errors += _already_recorded(date, seen)
+
+    for row in rows:
+        if row['out_time'] <= row['in_time'] and row['worker_id'] in workers:
+            errors.append(f"{workers[row['worker_id']].name}: out time must be after in time.")
+
+    if errors:
+        raise ValidationError(errors)
+
+    attendances = []
+    for row in rows:
+        attendance = WorkerAttendance(
+            worker=workers[row['worker_id']],
+            project=project,
+            date=date,
+            in_time=row['in_time'],
+            out_time=row['out_time'],
+            is_holiday=row.get('is_holiday', is_holiday),
+            notes=row.get('notes', ''),
+            recorded_by=recorded_by,
+        )
+        attendances.append(attendance)
+    for attendance, (hours_worked, overtime_hours, total_wage) in zip(attendances, price(attendances)):
+        attendance.hours_worked, attendance.overtime_hours, attendance.total_wage = hours_worked, overtime_hours, total_wage
+
+    try:
+        with transaction.atomic():
+            WorkerAttendance.objects.bulk_create(attendances, batch_size=batch_size)
+            mark_project_dirty(project.pk, COST)
+            mark_cost_cell_dirty(project.pk, date)
+            bump_dashboard_sources('attendance')
+    except IntegrityError:
+        # Someone recorded one of these workers since the check above.
+        raise ValidationError(_already_recorded(date, seen) or [f"Attendance on {date} changed meanwhile; submit the sheet again."])
+    return attendances
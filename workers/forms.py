@@ -1,5 +1,6 @@
 from django import forms
 from .models import Worker, WorkerAttendance, OutsourcedGroup
+from projects.models import Project
 
 class WorkerForm(forms.ModelForm):
     # New fields to handle group creation and leader assignment dynamically
@@ -12,6 +13,12 @@ class WorkerForm(forms.ModelForm):
         required=False,
         label="Set this worker as the leader of their group"
     )
+    rates_effective_from = forms.DateField(
+        required=False,
+        label="Rate changes apply from",
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        help_text="If the wage or OT rates change: the first day they apply to. Defaults to today."
+    )
 
     class Meta:
         model = Worker
@@ -73,6 +80,9 @@ class WorkerForm(forms.ModelForm):
         is_leader = self.cleaned_data.get('is_leader')
         group = self.cleaned_data.get('group')
 
+        # Read by the workers.signals receiver that records rate changes
+        worker.rates_effective_from = self.cleaned_data.get('rates_effective_from')
+
         created_group = None
         if new_group_name:
             # Create the new group if a name was provided
@@ -111,3 +121,56 @@ class WorkerAttendanceForm(forms.ModelForm):
             raise forms.ValidationError("Out time must be after in time.")
         return cleaned_data
 
+
+class CrewSheetForm(forms.Form):
+    """
+    Header of a crew attendance sheet: the project, date and default times
+    shared by every worker on the sheet. Per-worker rows are read from the
+    posted ``worker`` checkboxes and their ``in_time_<id>``/``out_time_<id>``
+    inputs, or passed in directly as ``rows`` for JSON submissions.
+    """
+    project = forms.ModelChoiceField(queryset=Project.objects.filter(status='active'))
+    date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    in_time = forms.TimeField(label="Default In Time", widget=forms.TimeInput(attrs={'type': 'time'}))
+    out_time = forms.TimeField(label="Default Out Time", widget=forms.TimeInput(attrs={'type': 'time'}))
+    is_holiday = forms.BooleanField(required=False, label="Mark as Holiday Attendance")
+
+    def __init__(self, *args, rows=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.raw_rows = rows
+
+    def _posted_rows(self):
+        rows = []
+        for worker_id in self.data.getlist('worker'):
+            rows.append({
+                'worker': worker_id,
+                'in_time': self.data.get(f'in_time_{worker_id}'),
+                'out_time': self.data.get(f'out_time_{worker_id}'),
+                'notes': self.data.get(f'notes_{worker_id}', ''),
+            })
+        return rows
+
+    def clean(self):
+        cleaned_data = super().clean()
+        raw_rows = self.raw_rows if self.raw_rows is not None else self._posted_rows()
+        time_field = forms.TimeField(required=False)
+        if not isinstance(raw_rows, list):
+            raise forms.ValidationError("Attendance rows must be a list.")
+        rows = []
+        for raw in raw_rows:
+            if not isinstance(raw, dict):
+                raise forms.ValidationError(f"Invalid attendance row: {raw}")
+            try:
+                worker_id = int(raw.get('worker'))
+                in_time = time_field.clean(raw.get('in_time')) or cleaned_data.get('in_time')
+                out_time = time_field.clean(raw.get('out_time')) or cleaned_data.get('out_time')
+            except (TypeError, ValueError, forms.ValidationError):
+                raise forms.ValidationError(f"Invalid attendance row: {raw}")
+            if not (in_time and out_time):
+                continue
+            row = {'worker_id': worker_id, 'in_time': in_time, 'out_time': out_time, 'notes': raw.get('notes') or ''}
+            if 'is_holiday' in raw:
+                row['is_holiday'] = bool(raw['is_holiday'])
+            rows.append(row)
+        cleaned_data['rows'] = rows
+        return cleaned_data
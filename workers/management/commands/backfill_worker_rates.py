@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from workers.models import Worker, WorkerRate
+from workers.rates import backfill_rates
+
+class Command(BaseCommand):
+    help = (
+        "Builds the rate history of workers who have none, reconstructed from the wages stored on their "
+        "attendance. Run once after migrating, before recalculating any wages."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--worker', type=int, action='append', help="Only this worker (id, repeatable).")
+        parser.add_argument('--rebuild', action='store_true', help="Delete the existing history of the workers and reconstruct it.")
+
+    def handle(self, *args, **options):
+        workers = Worker.objects.order_by('pk')
+        if options['worker']:
+            missing = set(options['worker']) - set(Worker.objects.filter(pk__in=options['worker']).values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f"No worker with id {', '.join(map(str, sorted(missing)))}.")
+            workers = workers.filter(pk__in=options['worker'])
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            if options['rebuild']:
+                WorkerRate.objects.filter(worker__in=workers).delete()
+            else:
+                workers = workers.exclude(pk__in=WorkerRate.objects.values('worker_id'))
+            workers = list(workers)
+            created = backfill_rates(workers)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Created {created} rate(s) for {len(workers)} worker(s) in {elapsed:.2f}s."))
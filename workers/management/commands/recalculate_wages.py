@@ -0,0 +1,45 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from workers.models import OutsourcedGroup, Worker, WorkerAttendance
+from workers.wages import recalculate_wages
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the hours, overtime and wage of attendance records from their times and the workers' "
+        "rates on each date, e.g. after a rate change, and refreshes the affected project costs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--worker', type=int, action='append', help="Only this worker's records (id, repeatable).")
+        parser.add_argument('--group', type=int, action='append', help="Only records of this outsourced group's members (id, repeatable).")
+        parser.add_argument('--start', type=date.fromisoformat, help="First attendance date to recalculate (YYYY-MM-DD).")
+        parser.add_argument('--end', type=date.fromisoformat, help="Last attendance date to recalculate (YYYY-MM-DD).")
+        parser.add_argument('--include-paid', action='store_true', help="Also recalculate records already marked paid.")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Records priced per batch (default: 2000).")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the records whose values would change.")
+
+    def handle(self, *args, **options):
+        attendances = WorkerAttendance.objects.all()
+        if options['worker']:
+            missing = set(options['worker']) - set(Worker.objects.filter(pk__in=options['worker']).values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f"No worker with id {', '.join(map(str, sorted(missing)))}.")
+            attendances = attendances.filter(worker_id__in=options['worker'])
+        if options['group']:
+            missing = set(options['group']) - set(OutsourcedGroup.objects.filter(pk__in=options['group']).values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f"No group with id {', '.join(map(str, sorted(missing)))}.")
+            attendances = attendances.filter(worker__group_id__in=options['group'])
+        if options['start']:
+            attendances = attendances.filter(date__gte=options['start'])
+        if options['end']:
+            attendances = attendances.filter(date__lte=options['end'])
+        if not options['include_paid']:
+            attendances = attendances.filter(is_paid=False)
+
+        started = time.perf_counter()
+        examined, changed = recalculate_wages(attendances, batch_size=options['batch_size'], write=not options['dry_run'])
+        elapsed = time.perf_counter() - started
+        verb = "would change" if options['dry_run'] else "changed"
+        self.stdout.write(self.style.SUCCESS(f"Checked {examined} attendance record(s); {changed} {verb} in {elapsed:.2f}s."))
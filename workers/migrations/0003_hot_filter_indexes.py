@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0002_worker_dob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workerattendance',
+            index=models.Index(fields=['project', 'date', 'total_wage'], name='attendance_project_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workerattendance',
+            index=models.Index(fields=['date', 'total_wage'], name='attendance_date_wage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workerattendance',
+            index=models.Index(condition=models.Q(('is_paid', False)), fields=['worker', 'date', 'total_wage'], name='attendance_unpaid_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-17 01:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0003_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkerRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('effective_from', models.DateField()),
+                ('fixed_wage', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('daily_wage', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('ot1_rate', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='OT1 Rate')),
+                ('ot2_rate', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='OT2 Rate')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rates', to='workers.worker')),
+            ],
+            options={
+                'ordering': ['worker', '-effective_from'],
+                'unique_together': {('worker', 'effective_from')},
+            },
+        ),
+    ]
@@ -1,7 +1,7 @@
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
-from decimal import Decimal
-from datetime import datetime, time, date, timedelta
+from .wages import attendance_pay
 
 class OutsourcedGroup(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -43,6 +43,29 @@ class Worker(models.Model):
     def __str__(self):
         return f"{self.name} ({self.get_worker_type_display()})"
 
+class WorkerRate(models.Model):
+    """
+    A worker's rates from ``effective_from`` until the next WorkerRate of
+    the same worker, so attendance is priced at the rates of its own date
+    (see workers.rates). Dates before a worker's first rate use that rate.
+    """
+    worker = models.ForeignKey(Worker, on_delete=models.CASCADE, related_name='rates')
+    effective_from = models.DateField()
+    fixed_wage = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    daily_wage = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    ot1_rate = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="OT1 Rate")
+    ot2_rate = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="OT2 Rate")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # The (worker, effective_from) index doubles as the interval index:
+        # the rate on a date is the worker's latest row on or before it.
+        unique_together = ['worker', 'effective_from']
+        ordering = ['worker', '-effective_from']
+
+    def __str__(self):
+        return f"Rates of {self.worker_id} from {self.effective_from}"
+
 class WorkerAttendance(models.Model):
     worker = models.ForeignKey(Worker, on_delete=models.CASCADE, related_name='attendances')
     project = models.ForeignKey('projects.Project', on_delete=models.CASCADE, related_name='attendances')
@@ -66,38 +89,17 @@ class WorkerAttendance(models.Model):
         verbose_name_plural = "Worker Attendances"
         unique_together = ['worker', 'date']
         ordering = ['-date']
+        # unique_together already indexes (worker, date). Trailing total_wage
+        # columns let wage sums be answered from the index alone.
+        indexes = [
+            models.Index(fields=['project', 'date', 'total_wage'], name='attendance_project_date_idx'),
+            models.Index(fields=['date', 'total_wage'], name='attendance_date_wage_idx'),
+            models.Index(fields=['worker', 'date', 'total_wage'], name='attendance_unpaid_idx', condition=Q(is_paid=False)),
+        ]
 
     def calculate_hours_and_wage(self):
-        """Calculates total hours, overtime, and wage based on in/out times."""
-        start_dt = datetime.combine(self.date, self.in_time)
-        end_dt = datetime.combine(self.date, self.out_time)
-        
-        duration = end_dt - start_dt if end_dt > start_dt else timedelta()
-        total_hours = Decimal(duration.total_seconds() / 3600)
-        self.hours_worked = total_hours
-
-        standard_hours = Decimal(getattr(settings, 'STANDARD_WORK_HOURS_PER_DAY', 8))
-
-        if self.is_holiday:
-            self.overtime_hours = total_hours
-            self.total_wage = total_hours * self.worker.ot2_rate
-        else:
-            regular_hours = min(total_hours, standard_hours)
-            ot_hours = max(total_hours - standard_hours, Decimal(0))
-            self.overtime_hours = ot_hours
-
-            if self.worker.worker_type == 'own':
-                work_days_per_month = Decimal(getattr(settings, 'WORK_DAYS_PER_MONTH', 30))
-                if work_days_per_month > 0 and standard_hours > 0:
-                    hourly_rate = (self.worker.fixed_wage / work_days_per_month) / standard_hours
-                    regular_wage = regular_hours * hourly_rate
-                    overtime_wage = ot_hours * self.worker.ot1_rate
-                    self.total_wage = regular_wage + overtime_wage
-                else:
-                    self.total_wage = 0
-            else: # Outsourced
-                overtime_wage = ot_hours * self.worker.ot1_rate
-                self.total_wage = self.worker.daily_wage + overtime_wage
+        """Calculates total hours, overtime, and wage from the in/out times with the exact rules in workers.wages."""
+        self.hours_worked, self.overtime_hours, self.total_wage = attendance_pay(self)
 
     def save(self, *args, **kwargs):
         self.calculate_hours_and_wage()
@@ -0,0 +1,263 @@
+"""
+Effective-dated wage rates.
+
+Every change to a worker's rates is kept as a WorkerRate, so attendance is
+priced at the rates of its own date however the worker's current rates
+have changed since. ``RateBook`` loads the history of a set of workers in
+one query and resolves the rates of a (worker, date) by binary search over
+that worker's effective dates, which is how wages.price prices a batch.
+Workers with no history yet fall back to their current rates until
+``backfill_rates`` reconstructs it from the wages already stored on their
+attendance.
+"""
+import bisect
+from collections import namedtuple
+from datetime import date, timedelta
+import numpy as np
+
+RATE_FIELDS = ('fixed_wage', 'daily_wage', 'ot1_rate', 'ot2_rate')
+
+
+class Rate(namedtuple('Rate', RATE_FIELDS)):
+    """A worker's monthly salary, daily wage and OT1/OT2 hourly rates."""
+
+    @classmethod
+    def of(cls, record):
+        """The rates on a Worker or WorkerRate."""
+        return cls(*(getattr(record, field) for field in RATE_FIELDS))
+
+
+class RateBook:
+    """The rate history of a set of workers, looked up by (worker, date)."""
+
+    def __init__(self, history, current):
+        # {worker id: (effective dates ascending, Rate for each)}
+        self._history = history
+        # {worker id: Rate} for workers without any history.
+        self._current = current
+
+    @classmethod
+    def for_workers(cls, workers):
+        """The rate book of the given Worker instances, loaded with one query."""
+        from .models import WorkerRate
+
+        workers = {worker.pk: worker for worker in workers}
+        history = {}
+        rows = WorkerRate.objects.filter(worker_id__in=list(workers)).order_by('worker_id', 'effective_from').values_list(
+            'worker_id', 'effective_from', *RATE_FIELDS,
+        )
+        for worker_id, effective_from, *rates in rows:
+            dates, values = history.setdefault(worker_id, ([], []))
+            dates.append(effective_from)
+            values.append(Rate(*rates))
+        return cls(history, {pk: Rate.of(worker) for pk, worker in workers.items()})
+
+    def rate(self, worker_id, day):
+        """
+        The worker's rates on ``day``: those of their latest change on or
+        before it, or of their first one for earlier days.
+        """
+        if worker_id not in self._history:
+            return self._current[worker_id]
+        dates, values = self._history[worker_id]
+        return values[max(bisect.bisect_right(dates, day) - 1, 0)]
+
+
+def _priced_rates(worker_type, rate):
+    """The rates that price a worker of the type: the daily wage does not matter to own workers, nor the salary to outsourced ones."""
+    base = rate.fixed_wage if worker_type == 'own' else rate.daily_wage
+    return base, rate.ot1_rate, rate.ot2_rate
+
+
+def merge_conflict(worker, duplicate_pks):
+    """
+    Why the attendance of the duplicate workers cannot move onto
+    ``worker`` (see accounts.dedupe.merge), or None: it would be repriced
+    wherever their rates on its date differ from ``worker``'s.
+    """
+    from .models import Worker, WorkerAttendance
+
+    duplicates = Worker.objects.in_bulk(duplicate_pks)
+    rates = RateBook.for_workers([worker, *duplicates.values()])
+    moved = WorkerAttendance.objects.filter(worker_id__in=duplicate_pks).values_list('worker_id', 'date').distinct().order_by('date')
+    for worker_id, day in moved:
+        if _priced_rates(worker.worker_type, rates.rate(worker_id, day)) != _priced_rates(worker.worker_type, rates.rate(worker.pk, day)):
+            return (
+                f"{duplicates[worker_id].name}'s rates on {day} differ from {worker.name}'s, so their attendance would be "
+                f"repriced. Give both workers the same rates for the dates they worked first."
+            )
+    return None
+
+
+def _opening_date(worker, before):
+    """The date a worker's first recorded rates apply from: their first attendance or creation, and before ``before``."""
+    candidates = [worker.attendances.order_by('date').values_list('date', flat=True).first()]
+    if worker.created_at:
+        candidates.append(worker.created_at.date())
+    opening = min((day for day in candidates if day), default=before)
+    return min(opening, before - timedelta(days=1))
+
+
+def record_rates(worker, effective_from=None, previous=None):
+    """
+    Stores the worker's current rates as applying from ``effective_from``
+    (default today) on, replacing any change recorded for that date or
+    later, so the latest rates in the history are always the current ones.
+    If nothing is recorded before that date, ``previous`` (the rates
+    before this change) is recorded first, so earlier attendance keeps them.
+    """
+    from .models import WorkerRate
+
+    effective_from = effective_from or date.today()
+    history = WorkerRate.objects.filter(worker=worker)
+    if previous is not None and not history.filter(effective_from__lt=effective_from).exists():
+        WorkerRate.objects.create(worker=worker, effective_from=_opening_date(worker, effective_from), **previous._asdict())
+    history.filter(effective_from__gt=effective_from).delete()
+    WorkerRate.objects.update_or_create(worker=worker, effective_from=effective_from, defaults=Rate.of(worker)._asdict())
+    return effective_from
+
+
+def _row_minutes(rows, rules):
+    """(worked, regular, overtime) minute arrays of attendance rows, split the way wages.compute splits them."""
+    from .wages import minutes_of, split_minutes
+
+    return split_minutes(
+        np.array([minutes_of(row[1]) for row in rows], dtype=np.int64),
+        np.array([minutes_of(row[2]) for row in rows], dtype=np.int64),
+        np.array([row[3] for row in rows], dtype=bool),
+        rules,
+    )
+
+
+def _signed_round_div(numerator, denominator):
+    """numerator / denominator rounded half up, or None if negative."""
+    if denominator < 0:
+        numerator, denominator = -numerator, -denominator
+    return (2 * numerator + denominator) // (2 * denominator) if numerator >= 0 else None
+
+
+def _implied_rates(is_own, holiday, worked, regular, overtime, stored, i, j, base, rules):
+    """
+    Rates that price the attendance row ``i`` at its stored wage (cents),
+    most likely first. A normal day's wage is base x A + OT1 x B over one
+    denominator, two unknowns: solved together with row ``j`` when the two
+    rows are independent, otherwise the base wage and then the OT1 rate
+    alone, with the other taken from ``base``. A holiday's wage depends on the OT2 rate alone.
+    """
+    from .wages import MINUTES_PER_HOUR, from_hundredths, to_cents
+
+    fixed, daily, ot1, ot2 = (to_cents(value) for value in base)
+    month_minutes = rules.work_days * rules.standard_minutes
+    denominator = MINUTES_PER_HOUR * month_minutes
+    as_rate = lambda *values: Rate(*(from_hundredths(value) for value in values))
+
+    if holiday[i]:
+        solved = _signed_round_div(stored[i] * MINUTES_PER_HOUR, int(worked[i])) if worked[i] else None
+        return [as_rate(fixed, daily, ot1, solved)] if solved is not None else []
+
+    def terms(k):
+        return int(regular[k]) * MINUTES_PER_HOUR if is_own else denominator, int(overtime[k]) * month_minutes, stored[k] * denominator
+
+    def with_base(value, ot1_value):
+        return as_rate(value, daily, ot1_value, ot2) if is_own else as_rate(fixed, value, ot1_value, ot2)
+
+    a_i, b_i, total_i = terms(i)
+    solutions = []
+    if j is not None and not holiday[j]:
+        a_j, b_j, total_j = terms(j)
+        determinant = a_i * b_j - a_j * b_i
+        if determinant:
+            solutions.append((_signed_round_div(total_i * b_j - total_j * b_i, determinant), _signed_round_div(a_i * total_j - a_j * total_i, determinant)))
+    if a_i:
+        solutions.append((_signed_round_div(total_i - ot1 * b_i, a_i), ot1))
+    if b_i:
+        solutions.append((fixed if is_own else daily, _signed_round_div(total_i - (fixed if is_own else daily) * a_i, b_i)))
+    return [with_base(*solution) for solution in solutions if None not in solution]
+
+
+def reconstruct_rates(worker, rows, rules):
+    """
+    [(effective from, Rate)] explaining the stored wages of the worker's
+    attendance ``rows`` of (date, in time, out time, is holiday, wage), in
+    date order.
+
+    The rows are priced in bulk under the rates in force; at the first one
+    whose wage is more than a cent off, a new period starts with the first
+    rates that price it and the row after it correctly: ones seen before,
+    the worker's current rates, or rates implied by the two records (see
+    _implied_rates). Rows nothing explains (hand-edited wages) are skipped.
+    If the last rates found are not the worker's current ones, the current
+    ones start the day after the last attendance.
+    """
+    from .wages import compute, to_cents
+
+    current = Rate.of(worker)
+    if not rows:
+        opening = worker.created_at.date() if worker.created_at else date.today()
+        return [(opening, current)]
+
+    is_own = worker.worker_type == 'own'
+    worked, regular, overtime = _row_minutes(rows, rules)
+    # Rows are priced from their worked minutes, as if each started at midnight.
+    in_minutes = np.zeros(len(rows), dtype=np.int64)
+    holiday = np.array([row[3] for row in rows], dtype=bool)
+    stored = [to_cents(row[4]) for row in rows]
+    stored_array = np.array(stored, dtype=object)
+
+    def explained(rate, start, stop=None):
+        count = len(rows[start:stop])
+        constant = lambda value: np.full(count, to_cents(value), dtype=object)
+        _, _, priced = compute(
+            in_minutes[start:stop], worked[start:stop], holiday[start:stop], np.full(count, is_own),
+            constant(rate.fixed_wage if is_own else rate.daily_wage), constant(rate.ot1_rate), constant(rate.ot2_rate), rules,
+        )
+        return (np.abs(priced - stored_array[start:stop]) <= 1).astype(bool)
+
+    history, known = [], [current]
+    start = 0
+    while start < len(rows):
+        rate = history[-1][1] if history else None
+        if rate is not None:
+            misses = np.flatnonzero(~explained(rate, start))
+            if not len(misses):
+                break
+            start += int(misses[0])
+
+        following = start + 1 if start + 1 < len(rows) else None
+        implied = _implied_rates(is_own, holiday, worked, regular, overtime, stored, start, following, rate or current, rules)
+        candidates = [*reversed(known), *implied]
+        # A new rate has to explain the next row too, so one hand-edited wage does not start a period.
+        chosen = next((
+            candidate for candidate in candidates
+            if candidate != rate and explained(candidate, start, start + 1)[0]
+            and (candidate in known or following is None or explained(candidate, following, following + 1)[0])
+        ), None)
+        if chosen:
+            history.append((rows[start][0], chosen))
+            if chosen not in known:
+                known.append(chosen)
+        start += 1
+
+    if not history:
+        history.append((rows[0][0], current))
+    if history[-1][1] != current:
+        history.append((rows[-1][0] + timedelta(days=1), current))
+    return history
+
+
+def backfill_rates(workers, rules=None):
+    """
+    Reconstructs (see reconstruct_rates) and saves the rate history of each
+    worker, who should have none yet. Returns the number of rates created.
+    """
+    from .models import WorkerRate
+    from .wages import WageRules
+
+    rules = rules or WageRules.from_settings()
+    created = 0
+    for worker in workers:
+        rows = list(worker.attendances.order_by('date').values_list('date', 'in_time', 'out_time', 'is_holiday', 'total_wage'))
+        history = reconstruct_rates(worker, rows, rules)
+        WorkerRate.objects.bulk_create([WorkerRate(worker=worker, effective_from=day, **rate._asdict()) for day, rate in history])
+        created += len(history)
+    return created
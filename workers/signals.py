@@ -1,20 +1,27 @@
-from django.apps import AppConfig
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
-from .models import WorkerAttendance
-class WorkersConfig(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'workers'
+from .models import Worker
+from .rates import RATE_FIELDS, Rate, record_rates
 
-    def ready(self):
-        import workers.signals
 
+@receiver(pre_save, sender=Worker)
+def snapshot_rates_before_save(sender, instance, raw=False, **kwargs):
+    """Remembers an existing worker's stored rates, so a change can be added to their rate history."""
+    instance._previous_rates = None
+    if instance.pk and not raw:
+        stored = Worker.objects.filter(pk=instance.pk).values_list(*RATE_FIELDS).first()
+        instance._previous_rates = Rate(*stored) if stored else None
 
-
-@receiver([post_save, post_delete], sender=WorkerAttendance)
-def update_project_cost_on_attendance_change(sender, instance, **kwargs):
+@receiver(post_save, sender=Worker)
+def record_rate_change(sender, instance, created, raw=False, **kwargs):
     """
-    Updates the project's actual_cost whenever attendance is saved or deleted.
+    Adds a new worker's rates, or changed rates, to their history, effective
+    from ``rates_effective_from`` if the caller set it and today otherwise.
+    ``rates_recorded_from`` tells the caller the date used.
     """
-    if instance.project:
-        instance.project.update_actual_cost()
+    instance.rates_recorded_from = None
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rates', None)
+    if created or (previous is not None and previous != Rate.of(instance)):
+        instance.rates_recorded_from = record_rates(instance, getattr(instance, 'rates_effective_from', None), previous)
@@ -0,0 +1,14 @@
+from datetime import date
+from celery import shared_task
+from accounts.jobs import track
+from .models import WorkerAttendance
+from .wages import recalculate_wages
+
+
+@shared_task
+def reprice_attendance(job_id, worker_id, start):
+    """Recalculates a worker's unpaid attendance from ``start`` on, after their rates changed."""
+    with track(job_id) as job:
+        attendances = WorkerAttendance.objects.filter(worker_id=worker_id, date__gte=date.fromisoformat(start), is_paid=False)
+        examined, changed = recalculate_wages(attendances)
+        job.result = f"Repriced {changed} of {examined} unpaid attendance record(s)."
@@ -1,3 +1,132 @@
-from django.test import TestCase
+from datetime import date, time
+from decimal import Decimal
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from accounts.models import CustomUser
+from projects.models import Project
+from .models import Worker, WorkerAttendance
+from .wages import WageRules, compute, recalculate_wages, round_div, split_minutes
 
-# Create your tests here.
+# 8-hour days and 26 work days: a month is 12,480 standard minutes.
+RULES = WageRules(standard_minutes=480, work_days=26)
+
+
+def wages(shifts, is_own=True, base=260000, ot1=1500, ot2=2000):
+    """compute() for (in minutes, out minutes, is holiday) shifts of one worker, as lists of hundredths."""
+    count = len(shifts)
+    in_minutes, out_minutes, holidays = zip(*shifts)
+    results = compute(
+        np.array(in_minutes, dtype=np.int64), np.array(out_minutes, dtype=np.int64), np.array(holidays, dtype=bool),
+        np.full(count, is_own, dtype=bool), np.full(count, base, dtype=object),
+        np.full(count, ot1, dtype=object), np.full(count, ot2, dtype=object), RULES,
+    )
+    return [[int(value) for value in values] for values in results]
+
+
+class RoundingTests(SimpleTestCase):
+    def test_round_div_rounds_half_up(self):
+        self.assertEqual([round_div(n, 2) for n in range(5)], [0, 1, 1, 2, 2])
+        self.assertEqual(round_div(1, 3), 0)
+        self.assertEqual(round_div(2, 3), 1)
+
+    def test_round_div_on_arrays(self):
+        self.assertEqual(round_div(np.array([5, 15, 14]), 10).tolist(), [1, 2, 1])
+
+    def test_hours_round_to_the_hundredth(self):
+        # 7 minutes are 0.1166... hours; 1 minute is 0.0166... hours.
+        hours, overtime, _ = wages([(480, 487, False), (480, 481, False)])
+        self.assertEqual(hours, [12, 2])
+        self.assertEqual(overtime, [0, 0])
+
+    def test_wage_is_rounded_once(self):
+        # Own worker on 2,600.00 a month: 7 minutes earn 260000 x 7 / 12480 = 145.83 cents.
+        _, _, wage = wages([(480, 487, False)])
+        self.assertEqual(wage, [146])
+
+    def test_overtime_half_cent_rounds_up(self):
+        # 30 overtime minutes at 0.01 an hour are half a cent.
+        _, overtime, wage = wages([(480, 990, False)], is_own=False, base=0, ot1=1)
+        self.assertEqual(overtime, [50])
+        self.assertEqual(wage, [1])
+
+    def test_large_rates_are_exact(self):
+        # Rates this large are computed with Python integers instead of int64.
+        _, _, wage = wages([(480, 960, False)], base=10 ** 12)
+        self.assertEqual(wage, [round_div(10 ** 12 * 480, 12480)])
+
+
+class SplitMinutesTests(SimpleTestCase):
+    def split(self, in_minutes, out_minutes, is_holiday):
+        return [
+            values.tolist() for values in
+            split_minutes(np.array(in_minutes), np.array(out_minutes), np.array(is_holiday), RULES)
+        ]
+
+    def test_standard_day_then_overtime(self):
+        self.assertEqual(self.split([480, 480], [960, 1080], [False, False]), [[480, 600], [480, 480], [0, 120]])
+
+    def test_holiday_minutes_are_all_overtime(self):
+        self.assertEqual(self.split([480], [1080], [True]), [[600], [0], [600]])
+
+    def test_overnight_and_zero_length_shifts_have_no_minutes(self):
+        # Out times are on the same day, so a shift ending before it starts counts nothing.
+        self.assertEqual(self.split([1320, 480], [360, 480], [False, True]), [[0, 0], [0, 0], [0, 0]])
+
+
+class ComputeTests(SimpleTestCase):
+    def test_own_worker_regular_day_and_overtime(self):
+        # 10 hours: a standard day (100.00) and 2 hours of OT1 at 15.00.
+        self.assertEqual(wages([(480, 1080, False)]), [[1000], [200], [13000]])
+
+    def test_outsourced_worker_earns_the_daily_wage_plus_overtime(self):
+        self.assertEqual(wages([(480, 1080, False)], is_own=False, base=12000), [[1000], [200], [15000]])
+
+    def test_holiday_is_paid_at_ot2_only(self):
+        # 4 hours at OT2 (20.00), no regular pay for either worker type.
+        self.assertEqual(wages([(480, 720, True)]), [[400], [400], [8000]])
+        self.assertEqual(wages([(480, 720, True)], is_own=False, base=12000), [[400], [400], [8000]])
+
+    def test_overnight_and_zero_length_shifts(self):
+        self.assertEqual(wages([(1320, 360, False), (480, 480, False), (480, 480, True)]), [[0, 0, 0], [0, 0, 0], [0, 0, 0]])
+        # Outsourced workers are paid their daily wage for the record whatever its hours.
+        self.assertEqual(wages([(480, 480, False)], is_own=False, base=12000), [[0], [0], [12000]])
+
+
+@override_settings(STANDARD_WORK_HOURS_PER_DAY=8, WORK_DAYS_PER_MONTH=26)
+class AttendanceWageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username='supervisor', role='supervisor')
+        cls.project = Project.objects.create(name="Tower", start_date=date(2025, 1, 1))
+        cls.worker = Worker.objects.create(
+            name="Ravi", worker_type='own', fixed_wage=Decimal('2600.00'),
+            ot1_rate=Decimal('15.00'), ot2_rate=Decimal('20.00'),
+        )
+
+    def attend(self, day, in_time, out_time, is_holiday=False):
+        return WorkerAttendance.objects.create(
+            worker=self.worker, project=self.project, date=day, in_time=in_time, out_time=out_time,
+            is_holiday=is_holiday, recorded_by=self.user,
+        )
+
+    def test_save_prices_the_record(self):
+        attendance = self.attend(date(2025, 1, 6), time(8, 0), time(18, 0))
+        self.assertEqual(
+            (attendance.hours_worked, attendance.overtime_hours, attendance.total_wage),
+            (Decimal('10.00'), Decimal('2.00'), Decimal('130.00')),
+        )
+
+    def test_holiday_record(self):
+        attendance = self.attend(date(2025, 1, 7), time(8, 0), time(12, 0), is_holiday=True)
+        self.assertEqual((attendance.overtime_hours, attendance.total_wage), (Decimal('4.00'), Decimal('80.00')))
+
+    def test_recalculate_wages_writes_only_changed_records(self):
+        first = self.attend(date(2025, 1, 6), time(8, 0), time(18, 0))
+        self.attend(date(2025, 1, 7), time(8, 0), time(16, 0))
+        WorkerAttendance.objects.filter(pk=first.pk).update(total_wage=0)
+
+        self.assertEqual(recalculate_wages(WorkerAttendance.objects.all(), write=False), (2, 1))
+        self.assertEqual(WorkerAttendance.objects.get(pk=first.pk).total_wage, 0)
+        self.assertEqual(recalculate_wages(WorkerAttendance.objects.all(), batch_size=1), (2, 1))
+        self.assertEqual(WorkerAttendance.objects.get(pk=first.pk).total_wage, Decimal('130.00'))
+        self.assertEqual(recalculate_wages(WorkerAttendance.objects.all()), (2, 0))
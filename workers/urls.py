@@ -11,4 +11,6 @@ urlpatterns = [
     path('attendance/', views.attendance_list_view, name='attendance_list'),
     path('attendance/create/', views.attendance_create_view, name='attendance_create'),
     path('<int:project_id>/attendance/create/', views.attendance_create_view, name='attendance_create_for_project'),
+    path('attendance/crew/', views.crew_attendance_view, name='crew_attendance'),
+    path('<int:project_id>/attendance/crew/', views.crew_attendance_view, name='crew_attendance_for_project'),
 ]
@@ -1,13 +1,19 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from .models import Worker, WorkerAttendance
-from .forms import WorkerForm, WorkerAttendanceForm
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from .models import Worker, WorkerAttendance, OutsourcedGroup
+from .forms import WorkerForm, WorkerAttendanceForm, CrewSheetForm
+from .crew import record_crew_attendance
+from .tasks import reprice_attendance
+from accounts.jobs import enqueue
 from accounts.views import is_admin_or_owner, can_manage_projects, can_add_attendance
 from projects.models import Project
 from django.db.models import Sum, Count, Q
 from datetime import date
 from calendar import monthrange
+import json
 
 @login_required
 def worker_list_view(request):
@@ -61,8 +67,12 @@ def worker_update_view(request, pk):
     if request.method == 'POST':
         form = WorkerForm(request.POST, instance=worker)
         if form.is_valid():
-            form.save()
+            worker = form.save()
             messages.success(request, 'Worker updated successfully.')
+            start = worker.rates_recorded_from
+            if start and worker.attendances.filter(date__gte=start, is_paid=False).exists():
+                enqueue(reprice_attendance, f"Reprice attendance of {worker.name}", worker.pk, start.isoformat(), user=request.user)
+                messages.info(request, f"Unpaid attendance from {start:%d %b %Y} is being repriced at the new rates.")
             return redirect('worker_list')
     else:
         form = WorkerForm(instance=worker)
@@ -142,6 +152,7 @@ def worker_detail_view(request, pk):
         'filter_description': filter_description,
         'month_year_filter': f"{start_date.year}-{start_date.month:02d}",
         'totals': totals,
+        'payslips': worker.payslips.all()[:12] if worker.worker_type == 'own' else [],
     }
     return render(request, 'workers/worker_detail.html', context)
 
@@ -173,3 +184,67 @@ def attendance_create_view(request, project_id=None):
 
     return render(request, 'workers/attendance_form.html', {'form': form, 'title': 'Add Attendance Record'})
 
+@login_required
+@user_passes_test(can_add_attendance)
+def crew_attendance_view(request, project_id=None):
+    """
+    Records a whole crew's attendance for one project and date in a single
+    submission. Accepts the crew-sheet form or a JSON payload of the form
+    {"project": id, "date": "YYYY-MM-DD", "in_time": "HH:MM", "out_time": "HH:MM",
+    "is_holiday": false, "rows": [{"worker": id, "in_time": ..., "out_time": ..., "notes": ...}]}.
+    """
+    is_json = request.content_type == 'application/json'
+
+    if request.method == 'POST' and is_json:
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            return JsonResponse({'errors': ['Invalid JSON payload.']}, status=400)
+        form = CrewSheetForm(payload, rows=payload.get('rows', []))
+    elif request.method == 'POST':
+        form = CrewSheetForm(request.POST)
+    else:
+        form = CrewSheetForm(initial={'project': project_id, 'date': date.today()})
+
+    if not is_admin_or_owner(request.user):
+        form.fields['project'].queryset = Project.objects.filter(supervisor=request.user, status='active')
+
+    if request.method == 'POST':
+        errors = []
+        if form.is_valid():
+            data = form.cleaned_data
+            try:
+                attendances = record_crew_attendance(
+                    data['project'], data['date'], data['rows'], request.user, is_holiday=data['is_holiday']
+                )
+            except ValidationError as e:
+                errors = e.messages
+            else:
+                if is_json:
+                    return JsonResponse({'created': len(attendances)}, status=201)
+                messages.success(request, f'Attendance recorded for {len(attendances)} workers.')
+                return redirect('project_detail', pk=data['project'].pk)
+        else:
+            errors = [error for field_errors in form.errors.values() for error in field_errors]
+
+        if is_json:
+            return JsonResponse({'errors': errors}, status=400)
+        for error in errors:
+            messages.error(request, error)
+
+    group_filter = request.GET.get('group')
+    workers = Worker.objects.filter(is_active=True).select_related('group').order_by('name')
+    if group_filter:
+        workers = workers.filter(group_id=group_filter)
+
+    context = {
+        'form': form,
+        'workers': workers,
+        'groups': OutsourcedGroup.objects.order_by('name'),
+        'current_group': group_filter,
+        'selected_workers': request.POST.getlist('worker'),
+        'title': 'Crew Attendance Sheet',
+    }
+    return render(request, 'workers/crew_attendance_form.html', context)
@@ -0,0 +1,219 @@
+"""
+Exact wage arithmetic for attendance records.
+
+Everything is done in integers: times are whole minutes since midnight
+(seconds are ignored), money is whole cents, and the settings become whole
+minutes per standard day and whole work days per month. Each stored value
+is one integer fraction rounded once, half up:
+
+- ``hours_worked`` and ``overtime_hours`` are minutes / 60 to the
+  hundredth of an hour;
+- ``total_wage`` is, to the cent, the regular pay (own workers: fixed wage
+  x regular minutes / (work days x standard minutes); outsourced workers:
+  the daily wage) plus OT1 rate x overtime minutes / 60. On a holiday
+  every minute is overtime paid at the OT2 rate, with no regular pay.
+
+Rates are those in force on the record's date (see workers.rates).
+``compute`` prices whole numpy arrays of records at once, which is how
+``recalculate_wages`` reprices thousands of rows per batch;
+``attendance_pay`` is the single-record form used when one is saved.
+"""
+from collections import namedtuple
+from decimal import Decimal
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router, transaction
+from .rates import RateBook
+
+MINUTES_PER_HOUR = 60
+MINUTES_PER_DAY = 24 * MINUTES_PER_HOUR
+# Intermediate products above this are computed with Python integers
+# instead of int64, so very large rates cannot overflow.
+INT64_SAFE_LIMIT = 2 ** 62
+
+RECALCULATED_FIELDS = ['hours_worked', 'overtime_hours', 'total_wage']
+
+
+class WageRules(namedtuple('WageRules', ['standard_minutes', 'work_days'])):
+    """The standard working day (in minutes) and the working days in a month that own workers' pay is based on."""
+
+    @classmethod
+    def from_settings(cls):
+        standard_hours = Decimal(str(getattr(settings, 'STANDARD_WORK_HOURS_PER_DAY', 8)))
+        rules = cls(int(standard_hours * MINUTES_PER_HOUR), int(getattr(settings, 'WORK_DAYS_PER_MONTH', 30)))
+        if rules.standard_minutes <= 0 or rules.work_days <= 0:
+            raise ImproperlyConfigured("STANDARD_WORK_HOURS_PER_DAY and WORK_DAYS_PER_MONTH must be positive.")
+        return rules
+
+
+def minutes_of(value):
+    """Whole minutes since midnight of a time."""
+    return value.hour * MINUTES_PER_HOUR + value.minute
+
+
+def to_cents(amount):
+    return int((amount or 0) * 100)
+
+
+def from_hundredths(value):
+    return Decimal(int(value)).scaleb(-2)
+
+
+def round_div(numerator, denominator):
+    """numerator / denominator rounded half up, for non-negative integers or arrays of them."""
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def split_minutes(in_minutes, out_minutes, is_holiday, rules):
+    """
+    (worked, regular, overtime) minute arrays of records: up to a standard
+    day of a normal day's minutes are regular and the rest overtime, and
+    every minute of a holiday is overtime. A record whose out time is not
+    after its in time has none.
+    """
+    worked = np.maximum(out_minutes - in_minutes, 0)
+    regular = np.where(is_holiday, 0, np.minimum(worked, rules.standard_minutes))
+    return worked, regular, worked - regular
+
+
+def compute(in_minutes, out_minutes, is_holiday, is_own, base_cents, ot1_cents, ot2_cents, rules):
+    """
+    Returns (hours worked, overtime hours, wage) arrays in hundredths for
+    attendance records given as equal-length arrays. ``base_cents`` is the
+    monthly salary of own workers and the daily wage of outsourced ones.
+    A record whose out time is not after its in time has no hours.
+    """
+    month_minutes = rules.work_days * rules.standard_minutes
+    # Every wage term over one denominator, so the only rounding is the final one.
+    denominator = MINUTES_PER_HOUR * month_minutes
+    largest_rate = max(int(array.max(initial=0)) for array in (base_cents, ot1_cents, ot2_cents))
+    dtype = np.int64 if 2 * largest_rate * MINUTES_PER_DAY * denominator < INT64_SAFE_LIMIT else object
+
+    in_minutes, out_minutes = np.asarray(in_minutes, dtype=dtype), np.asarray(out_minutes, dtype=dtype)
+    base_cents, ot1_cents, ot2_cents = (np.asarray(array, dtype=dtype) for array in (base_cents, ot1_cents, ot2_cents))
+    is_holiday, is_own = np.asarray(is_holiday, dtype=bool), np.asarray(is_own, dtype=bool)
+
+    worked, regular, overtime = split_minutes(in_minutes, out_minutes, is_holiday, rules)
+
+    regular_pay = np.where(is_own, base_cents * regular * MINUTES_PER_HOUR, base_cents * denominator)
+    regular_pay = np.where(is_holiday, 0, regular_pay)
+    overtime_pay = np.where(is_holiday, ot2_cents, ot1_cents) * overtime * month_minutes
+
+    return (
+        round_div(worked * 100, MINUTES_PER_HOUR),
+        round_div(overtime * 100, MINUTES_PER_HOUR),
+        round_div(regular_pay + overtime_pay, denominator),
+    )
+
+
+def _rate_arrays(is_own, rates):
+    """(base_cents, ot1_cents, ot2_cents) arrays for rows with the given worker types and Rates."""
+    base = [to_cents(rate.fixed_wage if own else rate.daily_wage) for own, rate in zip(is_own, rates)]
+    ot1 = [to_cents(rate.ot1_rate) for rate in rates]
+    ot2 = [to_cents(rate.ot2_rate) for rate in rates]
+    return (np.array(values, dtype=object) for values in (base, ot1, ot2))
+
+
+def price(attendances, rules=None, rates=None):
+    """
+    (hours worked, overtime hours, wage) Decimals for each attendance,
+    each loaded with its worker, at the worker's rates on its date.
+    ``rates`` is a RateBook covering the workers; one is loaded if omitted.
+    """
+    if not attendances:
+        return []
+    rates = rates or RateBook.for_workers({attendance.worker_id: attendance.worker for attendance in attendances}.values())
+    is_own = np.array([attendance.worker.worker_type == 'own' for attendance in attendances], dtype=bool)
+    hours, overtime, wages = compute(
+        np.array([minutes_of(attendance.in_time) for attendance in attendances], dtype=np.int64),
+        np.array([minutes_of(attendance.out_time) for attendance in attendances], dtype=np.int64),
+        np.array([attendance.is_holiday for attendance in attendances], dtype=bool),
+        is_own,
+        *_rate_arrays(is_own, [rates.rate(attendance.worker_id, attendance.date) for attendance in attendances]),
+        rules or WageRules.from_settings(),
+    )
+    return [
+        (from_hundredths(hours_worked), from_hundredths(overtime_hours), from_hundredths(wage))
+        for hours_worked, overtime_hours, wage in zip(hours, overtime, wages)
+    ]
+
+
+def attendance_pay(attendance, rules=None):
+    """(hours worked, overtime hours, wage) of one attendance record."""
+    return price([attendance], rules)[0]
+
+
+def _write(attendances):
+    """
+    Saves the recalculated fields of the attendances with one prepared
+    UPDATE executed per row. bulk_update would build a CASE expression per
+    row and field, which costs more to compile than the update itself.
+    """
+    from .models import WorkerAttendance
+
+    meta = WorkerAttendance._meta
+    connection = connections[router.db_for_write(WorkerAttendance)]
+    fields = [meta.get_field(name) for name in RECALCULATED_FIELDS]
+    quote = connection.ops.quote_name
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote(meta.db_table), ', '.join(f'{quote(field.column)} = %s' for field in fields), quote(meta.pk.column),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            [field.get_db_prep_save(getattr(attendance, field.attname), connection) for field in fields] + [attendance.pk]
+            for attendance in attendances
+        ])
+
+
+def recalculate_wages(attendances, batch_size=2000, write=True):
+    """
+    Recomputes the hours, overtime and wage of every record in the
+    ``attendances`` queryset from its times and its worker's rates on its
+    date (see workers.rates).
+
+    Records are read in primary-key batches with their workers joined, each
+    batch is priced with one rate-history query and one ``compute`` call,
+    and only records whose values change are written, with one prepared
+    UPDATE per row sent in a single executemany (see _write). Afterwards
+    every affected project's cost and (project, day) cost cell is rolled
+    up once. With ``write=False`` nothing is saved. Returns (records
+    examined, records changed).
+    """
+    from accounts.dashboard import bump_dashboard_sources
+    from projects.rollups import COST, mark_project_dirty
+    from reports.facts import mark_cost_cell_dirty
+
+    rules = WageRules.from_settings()
+    rows = attendances.select_related('worker').only(
+        'worker', 'project', 'date', 'in_time', 'out_time', 'is_holiday', *RECALCULATED_FIELDS,
+        'worker__worker_type', 'worker__fixed_wage', 'worker__daily_wage', 'worker__ot1_rate', 'worker__ot2_rate',
+    ).order_by('pk')
+
+    examined = updated = last_pk = 0
+    cells = set()
+    with transaction.atomic():
+        while True:
+            batch = list(rows.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            examined += len(batch)
+
+            changed = []
+            for attendance, values in zip(batch, price(batch, rules)):
+                if values != tuple(getattr(attendance, field) for field in RECALCULATED_FIELDS):
+                    attendance.hours_worked, attendance.overtime_hours, attendance.total_wage = values
+                    changed.append(attendance)
+            if write and changed:
+                _write(changed)
+            updated += len(changed)
+            cells.update((attendance.project_id, attendance.date) for attendance in changed)
+
+        if write and cells:
+            for project_id, day in cells:
+                mark_cost_cell_dirty(project_id, day)
+            for project_id in {project_id for project_id, _ in cells}:
+                mark_project_dirty(project_id, COST)
+            bump_dashboard_sources('attendance')
+    return examined, updated